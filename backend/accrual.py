@@ -0,0 +1,334 @@
+from fastapi import HTTPException
+from sqlalchemy import func, bindparam
+from sqlalchemy.orm import Session
+from models import User, Wallet, WalletLedger, WalletSnapshot, AccrualBatch
+from ledger import OPENING_POINTS, SNAPSHOT_INTERVAL, get_ledger_balance
+from rollups import record_activity_bulk
+from file_rows import file_checksum, iter_file_rows
+from database import group_by_shard
+from push import queue_push
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+import json
+import os
+import time
+
+# =====================================
+# ACCRUAL RULES (FROM ENVIRONMENT VARIABLES)
+# =====================================
+
+# Points per ₹100 of sales, by User.slab, e.g. {"1.0-2.50": 1.5, "2.50-5.0": 2}
+SLAB_RATES = json.loads(os.getenv("ACCRUAL_SLAB_RATES", "{}"))
+DEFAULT_RATE = float(os.getenv("ACCRUAL_DEFAULT_RATE", "1.0"))
+
+CHUNK_SIZE = int(os.getenv("ACCRUAL_CHUNK_SIZE", "5000"))
+MAX_REPORTED_ERRORS = int(os.getenv("ACCRUAL_MAX_ERRORS", "1000"))
+
+AMOUNT_COLUMNS = ("sales_amount", "amount", "sales")
+
+
+def points_for(amount: Decimal, slab: str) -> int:
+    rate = SLAB_RATES.get(slab, DEFAULT_RATE) if slab else DEFAULT_RATE
+    return int(amount * Decimal(str(rate)) / 100)
+
+
+# ============================================================
+# VALIDATION
+# ============================================================
+def load_ham_index(db: Session) -> dict:
+    """ham_code -> (user_id, slab, distributor_name, region), streamed from users"""
+    index = {}
+    rows = db.query(
+        User.ham_code, User.id, User.slab, User.distributor_name, User.region
+    ).filter(User.ham_code.isnot(None)).execution_options(yield_per=10000)
+
+    for ham_code, user_id, slab, distributor_name, region in rows:
+        index[ham_code.upper()] = (user_id, slab, distributor_name, region)
+    return index
+
+
+def _parse_row(row: dict, index: dict, row_number: int):
+    """Returns (item, None) or (None, error message)"""
+    ham_code = str(row.get("ham_code") or "").strip().upper()
+    if not ham_code:
+        return None, "ham_code missing"
+
+    owner = index.get(ham_code)
+    if not owner:
+        return None, f"Unknown ham_code {ham_code}"
+    user_id, slab, distributor_name, region = owner
+
+    raw_points = row.get("points")
+    raw_amount = next((row.get(c) for c in AMOUNT_COLUMNS if row.get(c) not in (None, "")), None)
+
+    try:
+        if raw_points not in (None, ""):
+            points = int(Decimal(str(raw_points).replace(",", "")))
+        elif raw_amount is not None:
+            amount = Decimal(str(raw_amount).replace(",", ""))
+            if amount <= 0:
+                return None, "sales_amount must be positive"
+            points = points_for(amount, slab)
+        else:
+            return None, "sales_amount or points required"
+    except (InvalidOperation, ValueError):
+        return None, "Invalid number"
+
+    if points <= 0:
+        return None, "No points to credit"
+
+    # The sale date dates the ledger entry and the rollups; undated rows count as today
+    raw_date = row.get("date")
+    if isinstance(raw_date, datetime):
+        when = datetime.combine(raw_date.date(), datetime.min.time())
+    elif isinstance(raw_date, date):
+        when = datetime.combine(raw_date, datetime.min.time())
+    elif raw_date:
+        try:
+            when = datetime.combine(date.fromisoformat(str(raw_date).strip()[:10]), datetime.min.time())
+        except ValueError:
+            return None, f"Invalid date {raw_date}"
+    else:
+        when = datetime.now()
+
+    return (user_id, distributor_name, region, when, points, row_number), None
+
+
+# ============================================================
+# CHUNKED BULK WRITE
+# ============================================================
+def _row_reference(batch_id: int, row_number: int) -> str:
+    return f"ACR{batch_id}:{row_number}"
+
+
+def _already_credited(db: Session, batch_id: int, items: list) -> set:
+    """Row numbers of these items credited by an earlier run of the batch"""
+    references = db.query(WalletLedger.reference).filter(
+        WalletLedger.user_id.in_({item[0] for item in items}),
+        WalletLedger.reference.like(f"ACR{batch_id}:%")
+    ).all()
+    return {int(reference.split(":")[1]) for reference, in references}
+
+
+def _apply_chunk(db: Session, batch_id: int, items: list, resuming: bool = False):
+    """
+    Credit one chunk: wallets (insert/update), ledger entries, snapshots, rollups - one commit.
+    When resuming a failed batch, rows whose ledger entry exists are skipped (counted as credited).
+    """
+    # Lock the chunk's wallets (in user_id order, so concurrent chunks can't deadlock) before reading
+    # counters and seqs: checkout / redeem / transfer for these users wait until this commit instead
+    # of taking the same seq
+    user_ids = sorted({item[0] for item in items})
+    wallets = {
+        row.user_id: row for row in db.query(Wallet.user_id, Wallet.points, Wallet.redeemed).filter(
+            Wallet.user_id.in_(user_ids)
+        ).order_by(Wallet.user_id).with_for_update().all()
+    }
+
+    credited_before = 0
+    if resuming:
+        done = _already_credited(db, batch_id, items)
+        credited_before = sum(item[4] for item in items if item[5] in done)
+        items = [item for item in items if item[5] not in done]
+        if not items:
+            db.rollback()
+            return credited_before
+        user_ids = sorted({item[0] for item in items})
+
+    last_seqs = dict(db.query(WalletLedger.user_id, func.max(WalletLedger.seq)).filter(
+        WalletLedger.user_id.in_(user_ids)
+    ).group_by(WalletLedger.user_id).all())
+
+    totals = {}
+    ledger_rows = []
+    seqs = {}
+    for user_id, _, _, when, points, row_number in items:
+        if user_id not in seqs:
+            seqs[user_id] = last_seqs.get(user_id) or 0
+            wallet = wallets.get(user_id)
+            # Same as apply_wallet_change / add-money: open pre-ledger wallets with their current
+            # counters, new wallets with OPENING_POINTS
+            opening = (wallet.points or 0, wallet.redeemed or 0) if wallet else (OPENING_POINTS, 0)
+            if seqs[user_id] == 0 and any(opening):
+                seqs[user_id] = 1
+                ledger_rows.append({
+                    "user_id": user_id, "seq": 1, "entry_type": "OPENING_BALANCE",
+                    "points_delta": opening[0], "redeemed_delta": opening[1],
+                    "reference": None, "created_at": datetime.now()
+                })
+
+        seqs[user_id] += 1
+        totals[user_id] = totals.get(user_id, 0) + points
+        ledger_rows.append({
+            "user_id": user_id, "seq": seqs[user_id], "entry_type": "ACCRUAL",
+            "points_delta": points, "redeemed_delta": 0,
+            "reference": _row_reference(batch_id, row_number), "created_at": when
+        })
+
+    wallet_table = Wallet.__table__
+    new_wallets = [
+        {"user_id": user_id, "points": OPENING_POINTS + total, "redeemed": 0}
+        for user_id, total in totals.items() if user_id not in wallets
+    ]
+    if new_wallets:
+        db.execute(wallet_table.insert(), new_wallets)
+
+    existing = [
+        {"b_user_id": user_id, "b_points": total}
+        for user_id, total in totals.items() if user_id in wallets
+    ]
+    if existing:
+        db.execute(
+            wallet_table.update()
+            .where(wallet_table.c.user_id == bindparam("b_user_id"))
+            .values(points=wallet_table.c.points + bindparam("b_points")),
+            existing
+        )
+
+    db.execute(WalletLedger.__table__.insert(), ledger_rows)
+
+    # Snapshot users whose sequence crossed a multiple of SNAPSHOT_INTERVAL
+    for user_id, seq in seqs.items():
+        if seq // SNAPSHOT_INTERVAL > (last_seqs.get(user_id) or 0) // SNAPSHOT_INTERVAL:
+            points, redeemed = get_ledger_balance(db, user_id)
+            db.add(WalletSnapshot(user_id=user_id, seq=seq, points=points, redeemed=redeemed))
+
+    record_activity_bulk(db, [
+        (user_id, distributor_name, region, when.date(), {"points_earned": points})
+        for user_id, distributor_name, region, when, points, _ in items
+    ])
+
+    # Core UPDATEs skip the push flush hook: queue the new balances here
+    for user_id, total in totals.items():
+        wallet = wallets.get(user_id)
+        points = (wallet.points or 0) + total if wallet else OPENING_POINTS + total
+        queue_push(db, user_id, "wallet", {
+            "points": points, "redeemed": (wallet.redeemed or 0) if wallet else 0, "balance": points,
+            "delta": total, "entry_type": "ACCRUAL", "reference": f"ACR{batch_id}"
+        })
+
+    db.commit()
+    return credited_before + sum(totals.values())
+
+
+def _apply_by_shard(db: Session, batch_id: int, items: list, resuming: bool = False):
+    """_apply_chunk once per user shard - wallets and ledger rows live on the user's shard"""
+    credited = 0
+    for shard, user_ids in group_by_shard({item[0] for item in items}).items():
+        on_shard = set(user_ids)
+        db.info["shard"] = shard
+        credited += _apply_chunk(db, batch_id, [item for item in items if item[0] in on_shard], resuming)
+    return credited
+
+
+def ingest_accruals(db: Session, fileobj, filename: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Stream a CSV/XLSX sales file and credit points.
+    Columns: ham_code, sales_amount (or amount / points), optional date.
+    Each chunk commits on its own; the batch row records progress.
+    Uploading the file of a FAILED batch again resumes it: rows already credited are skipped.
+    """
+    started = time.perf_counter()
+    checksum = file_checksum(fileobj)
+    rows = iter_file_rows(fileobj, filename)
+
+    existing = db.query(AccrualBatch.id, AccrualBatch.status).filter(AccrualBatch.checksum == checksum).first()
+    resuming = existing is not None and existing.status == "FAILED"
+    if resuming:
+        # Only one upload may take the batch over
+        resuming = db.query(AccrualBatch).filter(
+            AccrualBatch.id == existing.id, AccrualBatch.status == "FAILED"
+        ).update({"status": "RUNNING", "finished_at": None}, synchronize_session=False) == 1
+        db.commit()
+    if existing is not None and not resuming:
+        raise HTTPException(
+            status_code=409,
+            detail=f"File already imported as batch {existing.id} ({existing.status})"
+        )
+
+    index = load_ham_index(db)
+    # End the read: each chunk's transaction must start at its wallet lock, so its plain reads
+    # (max seq, counters) are not served from an older snapshot
+    db.rollback()
+
+    if resuming:
+        batch_id = existing.id
+        print(f"🔁 Resuming accrual batch {batch_id}")
+    else:
+        batch = AccrualBatch(filename=filename, checksum=checksum, status="RUNNING")
+        db.add(batch)
+        db.commit()
+        batch_id = batch.id
+
+    errors = []
+    rows_total = rows_accepted = points_credited = 0
+    chunk = []
+
+    try:
+        # Row 1 is the header
+        for row_number, row in enumerate(rows, start=2):
+            rows_total += 1
+            item, error = _parse_row(row, index, row_number)
+            if error:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": row_number, "ham_code": row.get("ham_code"), "error": error})
+                continue
+
+            chunk.append(item)
+            rows_accepted += 1
+            if len(chunk) >= chunk_size:
+                points_credited += _apply_by_shard(db, batch_id, chunk, resuming)
+                chunk = []
+
+        if chunk:
+            points_credited += _apply_by_shard(db, batch_id, chunk, resuming)
+        status = "COMPLETED"
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Accrual batch {batch_id} failed at row {rows_total + 1}: {e}")
+        status = "FAILED"
+
+    elapsed = time.perf_counter() - started
+
+    batch = db.query(AccrualBatch).filter(AccrualBatch.id == batch_id).first()
+    batch.status = status
+    batch.rows_total = rows_total
+    batch.rows_accepted = rows_accepted
+    batch.rows_rejected = rows_total - rows_accepted
+    batch.points_credited = points_credited
+    batch.finished_at = datetime.now()
+    db.commit()
+
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "resumed": resuming,
+        "rows_total": rows_total,
+        "rows_accepted": rows_accepted,
+        "rows_rejected": rows_total - rows_accepted,
+        "points_credited": points_credited,
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round(rows_total / elapsed) if elapsed else rows_total,
+        "errors": errors
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    from database import SessionLocal
+
+    if len(sys.argv) != 2:
+        print("Usage: python accrual.py <sales.csv|sales.xlsx>")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            report = ingest_accruals(db, f, os.path.basename(path))
+        errors = report.pop("errors")
+        print(json.dumps(report, indent=2))
+        for error in errors[:50]:
+            print(f"   row {error['row']}: {error['error']}")
+    finally:
+        db.close()
@@ -0,0 +1,53 @@
+"""
+Re-validate saved payout details in bulk.
+
+    python bank_revalidate.py [--status FAILED,VALIDATED] [--limit 1000] [--drain]
+
+Matching bank_details rows are queued again (validation_status PENDING) on every shard in
+parallel; the validation workers (bank_validation) pick them up. --drain processes the queue in
+this process instead of waiting for the workers. Run it after changing the match thresholds or
+the reference data.
+"""
+from sqlalchemy import update
+from database import fan_out
+from models import Bank
+from bank_validation import drain, PENDING
+import argparse
+import sys
+
+
+def requeue_shard(db, statuses: list, limit: int) -> int:
+    bank_ids = [
+        row.id for row in db.query(Bank.id).filter(
+            Bank.validation_status.in_(statuses)
+        ).order_by(Bank.id).limit(limit)
+    ]
+    if bank_ids:
+        db.execute(
+            update(Bank).where(Bank.id.in_(bank_ids)).values(
+                is_validated=False, validation_status=PENDING, validation_reason=None,
+                validation_claimed_at=None, validation_attempts=0
+            )
+        )
+        db.commit()
+    return len(bank_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-validate bank / UPI details in bulk")
+    parser.add_argument("--status", default="FAILED", help="Comma-separated validation statuses")
+    parser.add_argument("--limit", type=int, default=1000, help="Rows per shard")
+    parser.add_argument("--drain", action="store_true", help="Process the queue here instead of in the workers")
+    args = parser.parse_args()
+
+    statuses = [status.strip().upper() for status in args.status.split(",") if status.strip()]
+    results = fan_out(lambda db: requeue_shard(db, statuses, args.limit))
+    print(f"🔄 {sum(results.values())} rows queued for validation")
+
+    if args.drain:
+        print(f"✅ {drain()} rows processed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
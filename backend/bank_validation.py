@@ -0,0 +1,263 @@
+"""
+Background validation of saved payout details.
+
+POST /api/bank/validate only queues the row (validation_status PENDING). Worker threads claim
+queued rows in batches with SELECT ... FOR UPDATE SKIP LOCKED, so workers in several app
+processes never take the same row, mark them PROCESSING and validate them outside any
+transaction: local checks, then cheque OCR (at most BANK_OCR_CONCURRENCY calls at once per
+process) and fuzzy matching. The result is written back only if the row is still the one that
+was claimed; details edited meanwhile are queued again by /add and picked up on the next pass.
+
+    python bank_validation.py [--once]     run the workers outside the web process
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.orm import undefer_group
+from database import SessionLocal, shard_engines
+from models import Bank
+from payment_validation import check_bank_details, check_upi_id
+from fuzzy_match import match_bank_details
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+WORKERS = int(os.getenv("BANK_VALIDATION_WORKERS", "2"))
+BATCH_SIZE = int(os.getenv("BANK_VALIDATION_BATCH", "10"))
+POLL_SECONDS = float(os.getenv("BANK_VALIDATION_POLL_SECONDS", "2"))
+# A PROCESSING row older than this belongs to a worker that died: claim it again
+CLAIM_TIMEOUT_SECONDS = int(os.getenv("BANK_VALIDATION_CLAIM_TIMEOUT", "300"))
+# OCR / network failures before a row is marked FAILED
+MAX_ATTEMPTS = int(os.getenv("BANK_VALIDATION_MAX_ATTEMPTS", "3"))
+
+# openai: GPT-4o vision. stub: echo the stored details after OCR_STUB_DELAY_SECONDS (dev, load tests)
+OCR_BACKEND = os.getenv("BANK_OCR_BACKEND", "openai")
+OCR_CONCURRENCY = int(os.getenv("BANK_OCR_CONCURRENCY", "4"))
+OCR_STUB_DELAY_SECONDS = float(os.getenv("BANK_OCR_STUB_DELAY", "0.5"))
+
+PENDING, PROCESSING, VALIDATED, FAILED = "PENDING", "PROCESSING", "VALIDATED", "FAILED"
+
+
+# ============================================================
+# QUEUE
+# ============================================================
+_wake = threading.Event()
+
+
+def enqueue(bank: Bank):
+    """Queue the row for validation (caller commits); idle workers are woken up"""
+    bank.is_validated = False
+    bank.validation_status = PENDING
+    bank.validation_reason = None
+    bank.validation_claimed_at = None
+    bank.validation_attempts = 0
+    _wake.set()
+
+
+def claim_batch(db, limit: int = BATCH_SIZE):
+    """
+    Mark up to `limit` queued (or abandoned) rows of this session's shard PROCESSING.
+    Returns (ids, claimed_at); claimed_at identifies this claim when writing results back.
+    """
+    # Whole seconds: DATETIME columns without fractional precision compare equal afterwards
+    claimed_at = datetime.utcnow().replace(microsecond=0)
+    stale = claimed_at - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)
+
+    ids = [row.id for row in db.query(Bank.id).filter(
+        or_(
+            Bank.validation_status == PENDING,
+            (Bank.validation_status == PROCESSING) & (Bank.validation_claimed_at < stale)
+        )
+    ).order_by(Bank.id).limit(limit).with_for_update(skip_locked=True)]
+
+    if ids:
+        db.execute(
+            update(Bank).where(Bank.id.in_(ids)).values(
+                validation_status=PROCESSING, validation_claimed_at=claimed_at
+            )
+        )
+    db.commit()
+    return ids, claimed_at
+
+
+# ============================================================
+# OCR
+# ============================================================
+_ocr_slots = threading.BoundedSemaphore(max(1, OCR_CONCURRENCY))
+
+
+def read_cheque(base64_image: str) -> dict:
+    """GPT-4o vision call (blocking)"""
+    from routers.kyc_ocr import get_openai_client
+
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "Extract bank details from this cheque and return JSON only."},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                ]
+            }
+        ],
+        max_tokens=500,
+        temperature=0
+    )
+
+    content = response.choices[0].message.content
+    return json.loads(content[content.find("{"):content.rfind("}") + 1])
+
+
+def extract_cheque_details(details: dict) -> dict:
+    with _ocr_slots:
+        if OCR_BACKEND == "stub":
+            time.sleep(OCR_STUB_DELAY_SECONDS)
+            return {field: details[field] for field in ("account_holder_name", "account_number", "ifsc")}
+
+        image = details["cheque_image"]
+        return read_cheque(image.split(",")[1] if image.startswith("data:image") else image)
+
+
+# ============================================================
+# VALIDATION
+# ============================================================
+def validate_details(details: dict) -> dict:
+    """{"is_valid", "reason"} for one row's details; raises on OCR / network errors"""
+    if details["payment_method"] != "BANK":
+        if not details["upi_id"]:
+            return {"is_valid": False, "reason": "UPI ID missing"}
+        return check_upi_id(details["upi_id"])
+
+    if not details["cheque_image"]:
+        return {"is_valid": False, "reason": "Cheque image required"}
+
+    # Local checks first: details that can't be right never reach the OCR call
+    checks = check_bank_details(details["account_holder_name"], details["account_number"], details["ifsc"])
+    if not checks["is_valid"]:
+        return checks
+
+    return match_bank_details(extract_cheque_details(details), details)
+
+
+def process_row(db, bank_id: int, claimed_at: datetime) -> str:
+    """Validate one claimed row; returns the status written, or None if the claim was lost"""
+    claimed = (Bank.id == bank_id) & (Bank.validation_status == PROCESSING) & (Bank.validation_claimed_at == claimed_at)
+
+    bank = db.query(Bank).options(undefer_group("images")).filter(claimed).first()
+    if bank is None:
+        db.rollback()
+        return None
+    details = {
+        column: getattr(bank, column) for column in (
+            "payment_method", "account_holder_name", "account_number", "ifsc", "cheque_image", "upi_id"
+        )
+    }
+    attempts = bank.validation_attempts or 0
+    # No transaction held while OCR runs
+    db.rollback()
+
+    try:
+        result = validate_details(details)
+        status = VALIDATED if result["is_valid"] else FAILED
+        values = {"is_validated": result["is_valid"], "validation_reason": result["reason"] or None}
+    except Exception as e:
+        attempts += 1
+        status = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+        values = {"is_validated": False, "validation_reason": f"Validation error: {e}"[:500]}
+        print(f"⚠️ Bank validation {bank_id} (attempt {attempts}): {e}")
+
+    written = db.execute(
+        update(Bank).where(claimed).values(
+            validation_status=status, validation_claimed_at=None, validation_attempts=attempts, **values
+        )
+    ).rowcount
+    db.commit()
+    return status if written else None
+
+
+def run_once(shard: str, limit: int = BATCH_SIZE) -> int:
+    """Claim and process one batch on a shard; returns the number of rows claimed"""
+    db = SessionLocal()
+    db.info["shard"] = shard
+    try:
+        ids, claimed_at = claim_batch(db, limit)
+        for bank_id in ids:
+            process_row(db, bank_id, claimed_at)
+        return len(ids)
+    finally:
+        db.close()
+
+
+def drain() -> int:
+    """Process until every shard's queue is empty; returns the rows processed"""
+    total = 0
+    while True:
+        claimed = sum(run_once(shard) for shard in shard_engines)
+        if not claimed:
+            return total
+        total += claimed
+
+
+# ============================================================
+# WORKER THREADS
+# ============================================================
+_workers_stop = threading.Event()
+
+
+def _worker_loop():
+    while not _workers_stop.is_set():
+        try:
+            claimed = sum(run_once(shard) for shard in shard_engines)
+        except Exception as e:
+            print(f"❌ Bank validation worker error: {e}")
+            claimed = 0
+
+        if not claimed:
+            # Idle: sleep until the next poll or an enqueue in this process
+            _wake.wait(POLL_SECONDS)
+            _wake.clear()
+
+
+def start_workers(count: int = WORKERS):
+    """Start the validation worker threads (BANK_VALIDATION_WORKERS=0 disables them)"""
+    if count <= 0:
+        return []
+
+    _workers_stop.clear()
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(target=_worker_loop, name=f"bank-validation-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def stop_workers():
+    _workers_stop.set()
+    _wake.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bank / UPI validation workers")
+    parser.add_argument("--once", action="store_true", help="Process the current queue and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        print(f"✅ {drain()} rows processed")
+        return 0
+
+    threads = start_workers(max(1, WORKERS))
+    print(f"🏦 {len(threads)} bank validation workers, OCR backend {OCR_BACKEND}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_workers()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Frontend asset build.
+
+    python build_assets.py [--source ../frontend] [--output ../frontend/dist]
+
+- Fingerprints every asset (css, js, images, data/*.json) as name.<hash>.ext and rewrites the
+  references in pages, styles, scripts and the catalog JSON. Pages keep their names.
+- Pre-compresses text files as .gz and, when the brotli package is installed, .br.
+- Writes manifest.json: {original path: fingerprinted path}.
+
+The output is served by static_assets.PrecompressedStaticFiles (see main.py).
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(HERE, "..", "frontend")
+OUTPUT_DIR = os.path.join(SOURCE_DIR, "dist")
+
+PAGE_EXTENSIONS = {".html"}
+# Text files: references inside are rewritten, and they are pre-compressed
+TEXT_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt"}
+# Smaller files are not worth a compressed variant
+MIN_COMPRESS_BYTES = 1024
+HASH_LENGTH = 10
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _walk(source: str, output: str) -> list:
+    paths = []
+    for root, dirs, files in os.walk(source):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != output and not d.startswith(".")]
+        for name in files:
+            paths.append(os.path.relpath(os.path.join(root, name), source).replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def _build_order(path: str) -> int:
+    """Binary assets first, then text assets (they may reference them), pages last"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PAGE_EXTENSIONS:
+        return 2
+    return 1 if ext in TEXT_EXTENSIONS else 0
+
+
+def _rewrite(text: str, manifest: dict) -> str:
+    """Replace quoted / url()-wrapped references to known assets with their fingerprinted paths"""
+    if not manifest:
+        return text
+    names = "|".join(re.escape(path) for path in sorted(manifest, key=len, reverse=True))
+    pattern = re.compile(r"""(["'(])(\./)?(""" + names + r""")(["')])""")
+    return pattern.sub(lambda m: m.group(1) + manifest[m.group(3)] + m.group(4), text)
+
+
+def _fingerprinted(path: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _compress(path: str, data: bytes, brotli) -> int:
+    """Write .gz / .br next to the file; returns compressed variants written"""
+    if len(data) < MIN_COMPRESS_BYTES:
+        return 0
+
+    written = 0
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        with open(path + ".gz", "wb") as f:
+            f.write(gz)
+        written += 1
+
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            with open(path + ".br", "wb") as f:
+                f.write(br)
+            written += 1
+    return written
+
+
+def build(source: str = SOURCE_DIR, output: str = OUTPUT_DIR) -> dict:
+    source, output = os.path.abspath(source), os.path.abspath(output)
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("⚠️ brotli not installed: only gzip variants will be written")
+
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+
+    manifest = {}
+    pages = assets = variants = 0
+
+    for path in sorted(_walk(source, output), key=lambda p: (_build_order(p), p)):
+        with open(os.path.join(source, path), "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(path)[1].lower()
+
+        if ext in TEXT_EXTENSIONS:
+            data = _rewrite(data.decode("utf-8"), manifest).encode("utf-8")
+
+        if ext in PAGE_EXTENSIONS:
+            target = path
+            pages += 1
+        else:
+            target = _fingerprinted(path, data)
+            manifest[path] = target
+            assets += 1
+
+        out_path = os.path.join(output, target)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(data)
+
+        if ext in TEXT_EXTENSIONS:
+            variants += _compress(out_path, data, brotli)
+
+    with open(os.path.join(output, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return {
+        "pages": pages,
+        "assets": assets,
+        "compressed_variants": variants,
+        "output": output
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint and pre-compress the frontend")
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    report = build(args.source, args.output)
+    print(json.dumps(report, indent=2))
+    sys.exit(0)
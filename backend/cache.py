@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Small in-process cache for expensive read-mostly results (dashboards, summaries).
+    get_or_set() computes a missing/expired value once even when many requests arrive together.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            return None
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                # Drop the entry closest to expiry
+                oldest = min(self._data, key=lambda k: self._data[k][1])
+                del self._data[oldest]
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def get_or_set(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another request may have filled it while we waited
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                self.set(key, value)
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
@@ -0,0 +1,67 @@
+"""
+Negotiated response compression: brotli when the client accepts it (and the brotli package is
+installed), else gzip. Bodies under COMPRESSION_MIN_BYTES, event streams and responses that are
+already encoded (pre-compressed static files) pass through untouched.
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import Receive, Scope, Send
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Dynamic responses: favour speed over ratio (static files are pre-compressed at max level)
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip().replace(" ", "")
+        try:
+            if q.startswith("q=") and float(q[2:] or 0) == 0:
+                continue
+        except ValueError:
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        # Streaming: push what we have so the client gets rows as they are produced
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, compresslevel: int = GZIP_LEVEL):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
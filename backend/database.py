@@ -1,44 +1,503 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, text, Insert, Update, Delete
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.sql.util import find_tables
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect
+import hashlib
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import threading
+import time
+from fastapi import HTTPException, Request
+from settings import settings
 
 # =====================================
 # DATABASE CONFIG (FROM ENVIRONMENT VARIABLES)
 # =====================================
 
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "ayanq123")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "3306")
-DB_NAME = os.getenv("DB_NAME", "rspl_demo")
-
-# Debug: Print connection info (remove password for security)
-print(f"🔌 Connecting to MySQL at {DB_HOST}:{DB_PORT}/{DB_NAME} as {DB_USER}")
+DB_USER = settings.db_user
+DB_HOST = settings.db_host
+DB_PORT = settings.db_port
+DB_NAME = settings.db_name
 
-DATABASE_URL = (
-    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+DATABASE_URL = settings.database_url
 
+# No connection is made here; warm_up() opens the pool at startup
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=3600
 )
 
+# =====================================
+# READ REPLICAS (OPTIONAL)
+# =====================================
+
+# Comma-separated SQLAlchemy URLs, e.g. mysql+pymysql://ro:pw@replica1:3306/rspl_demo
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+
+# Replicas further behind than this are skipped; lag is re-checked every DB_REPLICA_CHECK_SECONDS
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_SECONDS", "10"))
+
+# After a user's own write their reads stay on the primary this long (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", str(REPLICA_MAX_LAG_SECONDS + 1)))
+# Where recent writers are remembered so every worker sees them; defaults to the OTP Redis
+READ_YOUR_WRITES_REDIS_URL = os.getenv("DB_READ_YOUR_WRITES_REDIS_URL") or os.getenv("OTP_REDIS_URL")
+
+replica_engines = [
+    create_engine(url, pool_pre_ping=True, pool_recycle=3600)
+    for url in DB_REPLICA_URLS
+]
+
+
+class ReplicaSet:
+    """
+    Round-robin over replicas whose last measured lag is within REPLICA_MAX_LAG_SECONDS.
+    Lag is measured by the monitor thread (start_replica_monitor), never on a request: until the
+    first check, or when the checks stop, reads use the primary.
+    """
+
+    def __init__(self, engines: list):
+        self.engines = engines
+        self._lags = {}
+        self._checked_at = float("-inf")
+        self._next = 0
+
+    @staticmethod
+    def measure_lag(engine):
+        """Seconds behind the primary; None when unreachable or replication is broken"""
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name != "mysql":
+                    conn.execute(text("SELECT 1"))
+                    return 0.0
+
+                for statement, column in (
+                    ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                    ("SHOW SLAVE STATUS", "Seconds_Behind_Master")
+                ):
+                    try:
+                        row = conn.execute(text(statement)).mappings().first()
+                        break
+                    except Exception:
+                        continue
+                else:
+                    return None
+
+                # Not configured as a replica (e.g. a local stand-in): treat as current
+                if row is None:
+                    return 0.0
+                return None if row.get(column) is None else float(row[column])
+        except Exception as e:
+            print(f"⚠️ Replica {engine.url.host} unreachable: {e}")
+            return None
+
+    def refresh(self):
+        self._lags = {engine: self.measure_lag(engine) for engine in self.engines}
+        self._checked_at = time.monotonic()
+
+    def healthy(self) -> list:
+        # Measurements this old say nothing about the lag now (monitor stopped or stuck)
+        if time.monotonic() - self._checked_at > 3 * REPLICA_CHECK_SECONDS:
+            return []
+
+        return [
+            engine for engine in self.engines
+            if self._lags.get(engine) is not None and self._lags[engine] <= REPLICA_MAX_LAG_SECONDS
+        ]
+
+    def pick(self):
+        """A healthy replica engine, or None (= use the primary)"""
+        if not self.engines:
+            return None
+
+        healthy = self.healthy()
+        if not healthy:
+            return None
+
+        self._next = (self._next + 1) % len(healthy)
+        return healthy[self._next]
+
+
+replicas = ReplicaSet(replica_engines)
+
+_replica_monitor_stop = threading.Event()
+
+
+def _replica_monitor_loop(interval: float):
+    while True:
+        try:
+            replicas.refresh()
+        except Exception as e:
+            print(f"❌ Replica monitor error: {e}")
+        if _replica_monitor_stop.wait(interval):
+            return
+
+
+def start_replica_monitor():
+    """Measure replica lag every DB_REPLICA_CHECK_SECONDS in the background (no-op without replicas)"""
+    if not replicas.engines:
+        return None
+
+    _replica_monitor_stop.clear()
+    thread = threading.Thread(
+        target=_replica_monitor_loop,
+        args=(REPLICA_CHECK_SECONDS,),
+        name="replica-monitor",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_replica_monitor():
+    _replica_monitor_stop.set()
+
+
+# =====================================
+# READ-YOUR-WRITES
+# =====================================
+def _recent_writes_backend():
+    from otp_store import MemoryBackend, RedisBackend
+
+    if READ_YOUR_WRITES_REDIS_URL:
+        try:
+            return RedisBackend(READ_YOUR_WRITES_REDIS_URL)
+        except ImportError:
+            print("⚠️ Redis URL set but redis is not installed - read-your-writes stays per process")
+    return MemoryBackend()
+
+
+# Shared between workers when Redis is configured; per process otherwise
+_recent_writes = _recent_writes_backend() if replica_engines else None
+
+
+def mark_user_write(user_id: int):
+    """Keep this user's reads on the primary until replicas have caught up"""
+    if _recent_writes is None or user_id is None:
+        return
+    try:
+        _recent_writes.set(f"rw:{int(user_id)}", {"user_id": int(user_id)}, READ_YOUR_WRITES_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Could not record write for user {user_id}: {e}")
+
+
+def has_recent_write(user_id: int) -> bool:
+    if _recent_writes is None:
+        return False
+    try:
+        return _recent_writes.get(f"rw:{int(user_id)}") is not None
+    except Exception:
+        # Store unreachable: the primary is always current
+        return True
+
+
+# =====================================
+# USER SHARDS (OPTIONAL)
+# =====================================
+
+# Comma-separated name=url pairs, e.g. s0=mysql+pymysql://...,s1=mysql+pymysql://...
+# Names place shards on the hash ring - keep them stable. Unset = one shard, the primary.
+DB_SHARD_URLS = os.getenv("DB_SHARD_URLS", "")
+SHARD_VIRTUAL_NODES = int(os.getenv("DB_SHARD_VIRTUAL_NODES", "64"))
+SHARD_FANOUT_WORKERS = int(os.getenv("DB_SHARD_FANOUT_WORKERS", "8"))
+
+# Per-user tables that live on the user's shard. users and the global tables stay on the primary.
+SHARDED_TABLES = {
+    "wallet", "wallet_ledger", "wallet_snapshots", "carts", "orders", "order_items",
+    "transactions", "kyc", "bank_details", "outbox_events"
+}
+
+
+def parse_shard_urls(value: str) -> dict:
+    shards = {}
+    for position, item in enumerate(part.strip() for part in value.split(",") if part.strip()):
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = f"shard{position}", item
+        shards[name.strip()] = url.strip()
+    return shards
+
+
+class ShardRing:
+    """Consistent hashing: adding a shard moves only ~1/N of the users"""
+
+    def __init__(self, names, virtual_nodes: int = SHARD_VIRTUAL_NODES):
+        self.names = sorted(names)
+        points = sorted(
+            (self._hash(f"{name}#{i}"), name)
+            for name in self.names
+            for i in range(virtual_nodes)
+        )
+        self._keys = [key for key, _ in points]
+        self._owners = [name for _, name in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+    def shard_for(self, user_id: int) -> str:
+        if len(self.names) == 1:
+            return self.names[0]
+        index = bisect(self._keys, self._hash(str(user_id))) % len(self._keys)
+        return self._owners[index]
+
+
+shard_urls = parse_shard_urls(DB_SHARD_URLS)
+shard_engines = {
+    name: create_engine(url, pool_pre_ping=True, pool_recycle=3600)
+    for name, url in shard_urls.items()
+} or {"default": engine}
+SHARDED = len(shard_engines) > 1
+shard_ring = ShardRing(shard_engines)
+
+
+def shard_for_user(user_id: int) -> str:
+    return shard_ring.shard_for(int(user_id))
+
+
+def group_by_shard(user_ids) -> dict:
+    """shard name -> the given user ids living there"""
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(shard_for_user(user_id), []).append(user_id)
+    return groups
+
+
+def use_user_shard(db: Session, user_id: int):
+    """Point the session's per-user tables at this user's shard (for user ids that arrive in a body/form)"""
+    db.info["shard"] = shard_for_user(user_id)
+
+
+# =====================================
+# WRITE FREEZE (RESHARDING)
+# =====================================
+# reshard.py move freezes writes to per-user tables from the copy until the restart on the new
+# layout (see reshard.py). The flag lives on the primary; each process re-reads it this often.
+WRITE_FREEZE_CHECK_SECONDS = float(os.getenv("DB_WRITE_FREEZE_CHECK_SECONDS", "2"))
+SHARD_WRITE_FREEZE = "shard_writes_frozen"
+
+_freeze_state = {"frozen": False, "checked_at": float("-inf")}
+_freeze_lock = threading.Lock()
+
+
+def writes_frozen() -> bool:
+    if time.monotonic() - _freeze_state["checked_at"] < WRITE_FREEZE_CHECK_SECONDS:
+        return _freeze_state["frozen"]
+
+    with _freeze_lock:
+        now = time.monotonic()
+        if now - _freeze_state["checked_at"] >= WRITE_FREEZE_CHECK_SECONDS:
+            try:
+                with engine.connect() as conn:
+                    frozen = bool(conn.execute(
+                        text("SELECT enabled FROM maintenance_flags WHERE name = :name"),
+                        {"name": SHARD_WRITE_FREEZE}
+                    ).scalar())
+            except Exception:
+                # Table not migrated yet (or primary down, which the write itself will report)
+                frozen = False
+            _freeze_state.update(frozen=frozen, checked_at=now)
+        return _freeze_state["frozen"]
+
+
+def _statement_tables(mapper, clause) -> set:
+    if mapper is not None:
+        return {table.name for table in mapper.tables}
+    if clause is None:
+        return set()
+
+    # INSERT / UPDATE / DELETE
+    table = getattr(clause, "table", None)
+    if table is not None and hasattr(table, "name"):
+        return {table.name}
+
+    froms = getattr(clause, "get_final_froms", None)
+    if froms is None:
+        return set()
+    return {table.name for from_ in froms() for table in find_tables(from_)}
+
+
+# =====================================
+# SESSIONS
+# =====================================
+class RoutingSession(Session):
+    """
+    With shards configured, per-user tables go to the shard named in info["shard"].
+    Sessions from get_read_db carry a replica in info["replica"]: their SELECTs go there.
+    Flushes and INSERT/UPDATE/DELETE always go to the primary, and pin the session to it.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        writing = self._flushing or isinstance(clause, (Insert, Update, Delete))
+        per_user = (SHARDED or writing) and bool(_statement_tables(mapper, clause) & SHARDED_TABLES)
+
+        if per_user and writing and writes_frozen():
+            raise HTTPException(status_code=503, detail="Maintenance in progress, please try again in a few minutes")
+
+        if SHARDED and per_user:
+            name = self.info.get("shard")
+            if name is None:
+                raise RuntimeError("Per-user table used without choosing a shard (see use_user_shard / fan_out)")
+            return shard_engines[name]
+
+        replica = self.info.get("replica")
+        if replica is None:
+            return engine
+
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["replica"] = None
+            return engine
+
+        return replica
+
+
 SessionLocal = sessionmaker(
+    class_=RoutingSession,
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_written_users(session, flush_context):
+    # Rows with a user_id (wallet, orders, cart ...) and User rows themselves
+    written = session.info.setdefault("written_users", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        user_id = getattr(obj, "user_id", None)
+        if user_id is None and obj.__class__.__name__ == "User":
+            user_id = obj.id
+        if user_id is not None:
+            written.add(user_id)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _mark_written_users(session):
+    for user_id in session.info.pop("written_users", ()):
+        mark_user_write(user_id)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_written_users(session):
+    session.info.pop("written_users", None)
+
+
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request):
+    db = SessionLocal()
+
+    # Per-user tables follow the request's user (?user_id=, path or Bearer token)
+    user_id = _request_user_id(request)
+    if user_id is not None:
+        use_user_shard(db, user_id)
+
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _request_user_id(request):
+    user_id = request.query_params.get("user_id") or request.path_params.get("user_id")
+    if user_id:
+        try:
+            return int(user_id)
+        except ValueError:
+            return None
+
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        from security import decode_access_token
+        try:
+            return decode_access_token(authorization[7:]).user_id
+        except Exception:
+            return None
+    return None
+
+
+def get_read_db(request: Request):
+    """
+    Session for read-only endpoints: served by a healthy replica when one is configured,
+    otherwise (no replicas, all lagging, or the user just wrote something) by the primary.
+    """
     db = SessionLocal()
+
+    user_id = _request_user_id(request)
+    if user_id is not None:
+        use_user_shard(db, user_id)
+    if not (user_id is not None and has_recent_write(user_id)):
+        db.info["replica"] = replicas.pick()
+
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def fan_out(fn, shards=None) -> dict:
+    """
+    Run fn(session) on every shard (or the given ones) in parallel, one session each.
+    Returns {shard name: result}; callers merge. With a single shard it just runs fn once.
+    """
+    names = list(shards or shard_engines)
+
+    def run(name):
+        db = SessionLocal()
+        db.info["shard"] = name
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    if len(names) == 1:
+        return {names[0]: run(names[0])}
+
+    with ThreadPoolExecutor(max_workers=min(len(names), SHARD_FANOUT_WORKERS)) as pool:
+        return dict(zip(names, pool.map(run, names)))
+
+
+def dispose_engines():
+    """
+    After fork: drop pooled connections inherited from the parent without closing them
+    (the parent still owns the sockets). The child opens fresh ones on first use.
+    """
+    for target in {id(e): e for e in [engine, *shard_engines.values(), *replica_engines]}.values():
+        target.dispose(close=False)
+
+
+def warm_up(connections: int = None):
+    """
+    Open pool connections on the primary (and every shard / replica) before traffic arrives.
+    Failures are logged, not raised: the app still starts and pre_ping retries on first use.
+    """
+    connections = settings.db_warmup_connections if connections is None else connections
+    if connections <= 0:
+        return
+
+    started = time.perf_counter()
+    engines = {id(e): e for e in [engine, *shard_engines.values(), *replica_engines]}.values()
+    failed = 0
+
+    for target in engines:
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = target.connect()
+                opened.append(conn)
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            failed += 1
+            print(f"⚠️ DB warm-up failed for {target.url.host or target.url.database}: {e}")
+        finally:
+            # Back to the pool, still open
+            for conn in opened:
+                conn.close()
+
+    # First lag check now rather than on the first read request
+    if replicas.engines:
+        replicas.refresh()
+
+    if not failed:
+        print(f"🔌 DB pool warmed in {time.perf_counter() - started:.2f}s ({DB_HOST}:{DB_PORT}/{DB_NAME} as {DB_USER})")
@@ -0,0 +1,52 @@
+from fastapi import HTTPException
+import csv
+import hashlib
+import io
+
+
+# ============================================================
+# UPLOADED CSV / XLSX FILES, READ ROW BY ROW (NEVER THE WHOLE FILE)
+# ============================================================
+def file_checksum(fileobj) -> str:
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(1024 * 1024), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def _normalize_header(header) -> list:
+    return [str(h).strip().lower().replace(" ", "_") if h is not None else "" for h in header]
+
+
+def iter_csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = _normalize_header(next(reader, []))
+    for values in reader:
+        yield dict(zip(header, values))
+    text.detach()
+
+
+def iter_xlsx_rows(fileobj):
+    # Only needed for Excel uploads
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _normalize_header(next(rows, []))
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(fileobj, filename: str):
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return iter_xlsx_rows(fileobj)
+    if filename.lower().endswith(".csv"):
+        return iter_csv_rows(fileobj)
+    raise HTTPException(status_code=400, detail="Unsupported file type. Upload CSV or XLSX only.")
@@ -0,0 +1,190 @@
+"""
+Fuzzy matching of cheque OCR output against the stored bank details.
+
+- levenshtein(): bit-parallel edit distance (Myers / Hyyrö), one pass over the longer string
+  with the shorter one held as bit masks in a Python int: O(n) big-int operations instead of
+  the O(n·m) table.
+- name_similarity(): honorifics dropped, initials expanded against the other name, then scored
+  word by word (the weakest pair), so one different word fails the name whatever its length;
+  only inner (middle) words may be missing.
+- match_bank_details(): per-field similarity against FIELD_THRESHOLDS.
+"""
+import os
+import re
+
+# Minimum similarity (0-1) for each field to count as matched
+FIELD_THRESHOLDS = {
+    "account_holder_name": float(os.getenv("MATCH_NAME_THRESHOLD", "0.85")),
+    # Money goes to this account: exact (after OCR digit clean-up) unless configured otherwise
+    "account_number": float(os.getenv("MATCH_ACCOUNT_THRESHOLD", "1.0")),
+    "ifsc": float(os.getenv("MATCH_IFSC_THRESHOLD", "1.0")),
+}
+
+FIELD_LABELS = {
+    "account_holder_name": "Account holder name",
+    "account_number": "Account number",
+    "ifsc": "IFSC",
+}
+
+HONORIFICS = {
+    "MR", "MRS", "MS", "MISS", "MASTER", "DR", "PROF", "SHRI", "SHREE", "SRI", "SMT",
+    "KUM", "KUMARI", "MESSRS", "MS/S", "M/S",
+}
+
+# Letters OCR reads in place of digits
+DIGIT_LOOKALIKES = str.maketrans({"O": "0", "D": "0", "Q": "0", "I": "1", "L": "1", "Z": "2", "S": "5", "B": "8"})
+
+
+# ============================================================
+# EDIT DISTANCE
+# ============================================================
+def levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    m = len(a)
+    if m == 0:
+        return len(b)
+
+    # Bit i of peq[c] is set where a[i] == c
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+
+    return score
+
+
+def similarity(s1: str, s2: str) -> float:
+    """1 - distance / longer length; 0.0 when either is empty"""
+    if not s1 or not s2:
+        return 0.0
+    return 1 - levenshtein(s1, s2) / max(len(s1), len(s2))
+
+
+# ============================================================
+# FIELDS
+# ============================================================
+def name_tokens(name: str) -> list:
+    words = re.sub(r"[^A-Z/ ]", " ", (name or "").upper()).split()
+    return [token for word in words if word not in HONORIFICS for token in word.split("/") if token]
+
+
+def _expand_initials(tokens: list, other: list) -> list:
+    """Replace single letters with an unused full word of the other name starting with that letter"""
+    available = [token for token in other if len(token) > 1 and token not in tokens]
+    expanded = []
+    for token in tokens:
+        if len(token) == 1:
+            full = next((word for word in available if word[0] == token), None)
+            if full is not None:
+                available.remove(full)
+                token = full
+        expanded.append(token)
+    return expanded
+
+
+def _pair_tokens(shorter: list, longer: list) -> list:
+    """Pair every token of the shorter name with a distinct token of the other, most similar pairs first"""
+    candidates = sorted(
+        ((similarity(x, y), i, j) for i, x in enumerate(shorter) for j, y in enumerate(longer)),
+        reverse=True
+    )
+    used_x, used_y, scores = set(), set(), []
+    for score, i, j in candidates:
+        if i not in used_x and j not in used_y:
+            used_x.add(i)
+            used_y.add(j)
+            scores.append(score)
+    return scores
+
+
+def name_similarity(a: str, b: str) -> float:
+    """
+    Similarity of the least similar word pair, so the threshold applies to every word:
+    "RAJESH SHARMA" / "RAMESH SHARMA" scores 0.833, not the 0.92 of the whole strings.
+    """
+    ta, tb = name_tokens(a), name_tokens(b)
+    if not ta or not tb:
+        return 0.0
+    # Initials only count once a full word matches ("R K SHARMA" / "RAJESH KUMAR SHARMA", not "A" / "ANIL")
+    if {t for t in ta if len(t) > 1} & {t for t in tb if len(t) > 1}:
+        ta, tb = _expand_initials(ta, tb), _expand_initials(tb, ta)
+
+    # Words run together or split differently ("RAMKUMAR" / "RAM KUMAR"): same letters only
+    if "".join(ta) == "".join(tb):
+        return 1.0
+
+    shorter, longer = sorted((ta, tb), key=len)
+    if len(shorter) == len(longer):
+        return min(_pair_tokens(shorter, longer))
+
+    # Middle names missing on one side: only inner words may be missing, the first and last words
+    # pair with the other name's (either way round, for surname-first). "RAVI KUMAR" is not
+    # "RAVI KUMAR SHARMA": the extra surname is scored like any other mismatch.
+    if len(shorter) < 2:
+        return 0.0
+    ends = max(
+        [similarity(shorter[0], longer[0]), similarity(shorter[-1], longer[-1])],
+        [similarity(shorter[0], longer[-1]), similarity(shorter[-1], longer[0])],
+        key=min
+    )
+    return min(ends + _pair_tokens(shorter[1:-1], longer[1:-1]))
+
+
+def normalize_account_number(value: str) -> str:
+    return re.sub(r"[^0-9]", "", (value or "").upper().translate(DIGIT_LOOKALIKES))
+
+
+def normalize_ifsc(value: str) -> str:
+    ifsc = re.sub(r"[^A-Z0-9]", "", (value or "").upper())
+    # The 5th character is always 0
+    return ifsc[:4] + "0" + ifsc[5:] if len(ifsc) == 11 and ifsc[4] == "O" else ifsc
+
+
+def field_similarity(field: str, extracted: str, stored: str) -> float:
+    if field == "account_holder_name":
+        return name_similarity(extracted, stored)
+    if field == "account_number":
+        return similarity(normalize_account_number(extracted), normalize_account_number(stored))
+    return similarity(normalize_ifsc(extracted), normalize_ifsc(stored))
+
+
+def match_bank_details(extracted: dict, stored: dict, thresholds: dict = None) -> dict:
+    """{is_valid, matched_fields, reason} plus per-field scores"""
+    thresholds = {**FIELD_THRESHOLDS, **(thresholds or {})}
+    errors, matched, scores = [], [], {}
+
+    for field, label in FIELD_LABELS.items():
+        score = field_similarity(field, extracted.get(field), stored.get(field))
+        scores[field] = round(score, 3)
+        if score >= thresholds[field]:
+            matched.append(f"{label} matched")
+        else:
+            errors.append(f"{label} mismatch")
+
+    return {
+        "is_valid": len(errors) == 0,
+        "matched_fields": matched,
+        "reason": "\n".join(errors),
+        "scores": scores
+    }
@@ -0,0 +1,60 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Sizing: WEB_CONCURRENCY workers (default 2 x CPUs + 1, at most 8); `python worker_bench.py` compares counts.
+More than one worker needs JWT_SECRET_KEY, OTP_REDIS_URL and OTP_SECRET (see SHARED_SETTINGS).
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+
+# Import the app once in the master; workers fork with the modules already loaded
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# Recycle workers to bound memory growth from Pillow / PDF rasterization (jitter staggers restarts)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# OCR requests wait on OpenAI; give them time before the worker is considered stuck
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+# Per-process state that breaks with several workers unless it is shared:
+# tokens signed in one worker must verify in the others; an OTP sent by one must be checked by another
+SHARED_SETTINGS = {
+    "JWT_SECRET_KEY": "session tokens are signed with a random per-process key",
+    "OTP_REDIS_URL": "OTPs and send limits are kept in each worker's memory",
+    "OTP_SECRET": "OTPs are hashed with a random per-process key",
+}
+
+
+def on_starting(server):
+    if workers <= 1:
+        return
+    missing = [f"{name} ({reason})" for name, reason in SHARED_SETTINGS.items() if not os.getenv(name)]
+    if missing:
+        for item in missing:
+            server.log.error(f"Not set: {item}")
+        server.log.error(f"Refusing to start {workers} workers; set the above or run with WEB_CONCURRENCY=1")
+        raise SystemExit(1)
+    if not os.getenv("PUSH_REDIS_URL"):
+        server.log.warning(
+            "PUSH_REDIS_URL not set: live updates only reach streams held by the worker that made the change"
+        )
+
+
+def post_fork(server, worker):
+    # Pools created in the master must not be shared: each worker opens its own connections
+    import database
+    database.dispose_engines()
+    server.log.info(f"Worker {worker.pid}: DB pools reset after fork")
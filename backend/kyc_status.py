@@ -0,0 +1,86 @@
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from models import User, KYC
+from database import group_by_shard
+
+# Address, PAN, GST
+REQUIRED_DOCUMENTS = 3
+
+
+def kyc_status_from_count(documents_count: int) -> str:
+    """Address, PAN, GST all submitted = COMPLETED"""
+    if not documents_count:
+        return "PENDING"
+    elif documents_count >= REQUIRED_DOCUMENTS:
+        return "COMPLETED"
+    return "PARTIAL"
+
+
+def adjust_kyc_doc_count(db: Session, user_id: int, delta: int):
+    """
+    Atomically move users.kyc_doc_count by delta and recompute users.kyc_status.
+    Runs in the caller's transaction, next to the kyc INSERT/DELETE. Caller commits.
+    """
+    new_count = User.kyc_doc_count + delta
+
+    db.query(User).filter(User.id == user_id).update(
+        {
+            User.kyc_doc_count: new_count,
+            User.kyc_status: case(
+                (new_count <= 0, "PENDING"),
+                (new_count >= REQUIRED_DOCUMENTS, "COMPLETED"),
+                else_="PARTIAL"
+            )
+        },
+        synchronize_session=False
+    )
+
+
+def backfill_kyc_status(db: Session, chunk_size: int = 1000) -> int:
+    """Populate users.kyc_status / kyc_doc_count from the kyc table, chunk by chunk"""
+
+    updated = 0
+    last_id = 0
+
+    while True:
+        user_ids = [row.id for row in db.query(User.id).filter(
+            User.id > last_id
+        ).order_by(User.id).limit(chunk_size).all()]
+
+        if not user_ids:
+            break
+
+        # KYC rows live on each user's shard
+        counts = {}
+        for shard, shard_user_ids in group_by_shard(user_ids).items():
+            db.info["shard"] = shard
+            counts.update(db.query(KYC.user_id, func.count(KYC.id)).filter(
+                KYC.user_id.in_(shard_user_ids)
+            ).group_by(KYC.user_id).all())
+
+        db.bulk_update_mappings(User, [
+            {
+                "id": uid,
+                "kyc_doc_count": counts.get(uid, 0),
+                "kyc_status": kyc_status_from_count(counts.get(uid, 0))
+            }
+            for uid in user_ids
+        ])
+        db.commit()
+
+        updated += len(user_ids)
+        last_id = user_ids[-1]
+        print(f"🔄 KYC backfill: {updated} users updated")
+
+    return updated
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        total = backfill_kyc_status(db)
+        print(f"✅ KYC status backfilled for {total} users")
+    finally:
+        db.close()
@@ -0,0 +1,556 @@
+from sqlalchemy import event, func, or_
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sortedcontainers import SortedList
+from database import SessionLocal, fan_out, group_by_shard, shard_for_user
+from models import User, Wallet, WalletLedger, LeaderboardCheckpoint, MaintenanceFlag, OutboxEvent
+from collections import deque
+from datetime import date, datetime, timedelta
+import os
+import threading
+import time
+
+# How often the checkpoint thread catches up from the ledger and saves dirty users (0 = disabled)
+CHECKPOINT_INTERVAL_SECONDS = int(os.getenv("LEADERBOARD_CHECKPOINT_INTERVAL", "300"))
+CHUNK_SIZE = int(os.getenv("LEADERBOARD_CHUNK_SIZE", "5000"))
+# A ledger id becomes visible at most this long after it is allocated (its transaction commits).
+# Entries above the watermark are re-read until then, so a lower id committing late is not skipped.
+LATE_COMMIT_SECONDS = float(os.getenv("LEADERBOARD_LATE_COMMIT_SECONDS", "60"))
+
+# maintenance_flags row used as the checkpoint lease: one process saves per interval
+CHECKPOINT_LEASE = "leaderboard_checkpoint"
+
+METRICS = ("redeemed", "attainment")
+DIMENSIONS = ("slab", "region")
+
+# Outbox event written with every profile update (routers/auth.py); its fields that move a user
+PROFILE_EVENT = "user.profile_updated"
+PROFILE_FIELDS = {"slab", "region", "target"}
+
+
+# ============================================================
+# ONE RANKED PARTITION
+# ============================================================
+class RankedBoard:
+    """Scores kept in a SortedList of (-score, user_id): insert/remove/rank are O(log n)"""
+
+    def __init__(self):
+        self._entries = SortedList()
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._scores)
+
+    def set(self, user_id: int, score: float):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._entries.remove((-old, user_id))
+        self._entries.add((-score, user_id))
+        self._scores[user_id] = score
+
+    def remove(self, user_id: int):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._entries.remove((-old, user_id))
+
+    def top(self, n: int) -> list:
+        return [(user_id, -neg_score) for neg_score, user_id in self._entries.islice(0, n)]
+
+    def rank(self, user_id: int):
+        """1-based competition rank (ties share a rank), or None"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._entries.bisect_left((-score, 0)) + 1
+
+
+# ============================================================
+# ENGINE
+# ============================================================
+class LeaderboardEngine:
+    """
+    In-memory slab-wise and region-wise leaderboards on points redeemed and target attainment.
+
+    - Own wallet writes are applied right after their transaction commits.
+    - Writes made by other workers are picked up by catch_up() from the wallet ledger, and
+      their slab / region / target changes from the user.profile_updated outbox events.
+    - checkpoint() saves changed users so startup does not need to re-aggregate everything.
+
+    Ledger ids are allocated before commit, so a lower id can become visible after a higher one.
+    Per shard, every entry up to the watermark is applied; entries above it are re-read on each
+    catch_up until LATE_COMMIT_SECONDS have passed, and each user keeps the ids above the
+    watermark it already has ("recent") so re-reads are not counted twice. Profile events use
+    the same watermark scheme; re-reading one is harmless (the profile is read from users).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.year = date.today().year
+        self.users = {}          # user_id -> {"slab", "region", "target", "redeemed", "earned_ytd", "last_entry_id", "recent"}
+        self.boards = {}         # (metric, dimension, partition) -> RankedBoard
+        self.watermarks = {}     # shard -> every wallet_ledger.id up to here has been folded in
+        self._seen = {}          # shard -> deque of (monotonic time, highest id read by then)
+        # Same for outbox_events.id of profile events; starts at 0, so a rebuild re-reads the
+        # retained events once (checkpoints may hold partitions older than them)
+        self.profile_watermarks = {}
+        self._profile_seen = {}
+        self._dirty = set()
+        self.loaded = False
+
+    @staticmethod
+    def _new_user(slab: str = None, region: str = None, target: int = None) -> dict:
+        return {
+            "slab": slab, "region": region, "target": target,
+            "redeemed": 0, "earned_ytd": 0, "last_entry_id": 0, "recent": set()
+        }
+
+    # ---------------- scoring ----------------
+    @staticmethod
+    def _score(metric: str, user: dict) -> float:
+        if metric == "redeemed":
+            return user["redeemed"]
+        if not user["target"]:
+            return 0.0
+        return round(user["earned_ytd"] * 100.0 / user["target"], 2)
+
+    def _board(self, metric: str, dimension: str, partition: str) -> RankedBoard:
+        key = (metric, dimension, partition)
+        board = self.boards.get(key)
+        if board is None:
+            board = self.boards[key] = RankedBoard()
+        return board
+
+    def _place(self, user_id: int):
+        user = self.users[user_id]
+        for dimension in DIMENSIONS:
+            partition = user[dimension]
+            if partition is None:
+                continue
+            for metric in METRICS:
+                self._board(metric, dimension, partition).set(user_id, self._score(metric, user))
+
+    def _unplace(self, user_id: int):
+        user = self.users.get(user_id)
+        if not user:
+            return
+        for dimension in DIMENSIONS:
+            partition = user[dimension]
+            if partition is None:
+                continue
+            for metric in METRICS:
+                board = self.boards.get((metric, dimension, partition))
+                if board:
+                    board.remove(user_id)
+
+    def _upsert_user(self, user_id: int, **fields):
+        self._unplace(user_id)
+        user = self.users.setdefault(user_id, self._new_user())
+        user.update(fields)
+        self._place(user_id)
+        self._dirty.add(user_id)
+
+    # ---------------- events ----------------
+    def apply_wallet_entry(self, entry_id: int, user_id: int, entry_type: str,
+                           points_delta: int, redeemed_delta: int, created_at: datetime = None):
+        with self._lock:
+            watermark = self.watermarks.get(shard_for_user(user_id), 0)
+            if not self.loaded or entry_id <= watermark:
+                return
+
+            if user_id not in self.users:
+                self._load_user(user_id)
+
+            user = self.users[user_id]
+            # Already applied (right after our own commit, or by an earlier catch_up)
+            if entry_id in user["recent"]:
+                return
+
+            earned = user["earned_ytd"]
+            in_year = (created_at or datetime.now()).year == self.year
+            if in_year and entry_type != "OPENING_BALANCE" and points_delta > 0:
+                earned += points_delta
+
+            self._upsert_user(
+                user_id,
+                redeemed=user["redeemed"] + redeemed_delta,
+                earned_ytd=earned,
+                last_entry_id=max(user["last_entry_id"], entry_id),
+                recent={i for i in user["recent"] if i > watermark} | {entry_id}
+            )
+
+    def update_profile(self, user_id: int, slab: str, region: str, target: int):
+        with self._lock:
+            if not self.loaded:
+                return
+            user = self.users.get(user_id)
+            if user and (user["slab"], user["region"], user["target"]) == (slab, region, target):
+                return
+            self._upsert_user(user_id, slab=slab, region=region, target=target)
+
+    def _load_user(self, user_id: int):
+        db = SessionLocal()
+        try:
+            row = db.query(User.slab, User.region, User.target).filter(User.id == user_id).first()
+            self.users[user_id] = self._new_user(*(row or ()))
+        finally:
+            db.close()
+
+    # ---------------- queries ----------------
+    def top(self, metric: str, dimension: str, partition: str, n: int = 10) -> list:
+        with self._lock:
+            board = self.boards.get((metric, dimension, partition))
+            return board.top(n) if board else []
+
+    def rank(self, user_id: int, metric: str, dimension: str):
+        with self._lock:
+            user = self.users.get(user_id)
+            if not user or user[dimension] is None:
+                return None
+            board = self.boards.get((metric, dimension, user[dimension]))
+            return {
+                "partition": user[dimension],
+                "rank": board.rank(user_id),
+                "out_of": len(board),
+                "score": self._score(metric, user)
+            }
+
+    # ---------------- startup / persistence ----------------
+    def rebuild(self, db: Session):
+        """Load from the checkpoint (or aggregate from scratch), then catch up from the ledger"""
+        has_checkpoint = db.query(LeaderboardCheckpoint.user_id).filter(
+            LeaderboardCheckpoint.year == date.today().year
+        ).first() is not None
+        # Outside the lock: commit hooks keep running while we wait
+        allocated = None if has_checkpoint else self._allocated_ids()
+
+        with self._lock:
+            self._reset()
+            if has_checkpoint:
+                self._load_checkpoint(db)
+            else:
+                self._load_from_source(db, allocated)
+
+            self.loaded = True
+
+        self.catch_up(db)
+
+    def _load_checkpoint(self, db: Session):
+        last_id = 0
+        while True:
+            rows = db.query(LeaderboardCheckpoint).filter(
+                LeaderboardCheckpoint.year == self.year,
+                LeaderboardCheckpoint.user_id > last_id
+            ).order_by(LeaderboardCheckpoint.user_id).limit(CHUNK_SIZE).all()
+            if not rows:
+                break
+            for row in rows:
+                self.users[row.user_id] = {
+                    "slab": row.slab,
+                    "region": row.region,
+                    "target": row.target,
+                    "redeemed": row.redeemed,
+                    "earned_ytd": row.earned_ytd,
+                    "last_entry_id": row.last_entry_id,
+                    "recent": set(row.recent_entry_ids or ())
+                }
+                self._place(row.user_id)
+                # Each row carries the watermark of the user's own shard
+                shard = shard_for_user(row.user_id)
+                self.watermarks[shard] = max(self.watermarks.get(shard, 0), row.ledger_watermark)
+            last_id = rows[-1].user_id
+            db.expunge_all()
+
+    @staticmethod
+    def _allocated_ids() -> dict:
+        """Highest ledger id per shard, returned once every id up to it has had time to commit"""
+        allocated = {
+            shard: last_id or 0
+            for shard, last_id in fan_out(lambda s: s.query(func.max(WalletLedger.id)).scalar()).items()
+        }
+        time.sleep(LATE_COMMIT_SECONDS)
+        return allocated
+
+    def _load_from_source(self, db: Session, allocated: dict):
+        """
+        Aggregate from wallets and the ledger. Per shard, the totals and the ledger ids they
+        include come from one transaction (one snapshot) that sees every id up to `allocated`.
+        """
+        db.rollback()
+        for shard, watermark in allocated.items():
+            db.info["shard"] = shard
+            self.watermarks[shard] = watermark
+            newer = db.query(WalletLedger.id, WalletLedger.user_id).filter(
+                WalletLedger.id > watermark
+            ).all()
+            self._seen[shard] = deque([(time.monotonic(), max([watermark] + [row.id for row in newer]))])
+            for row in newer:
+                self.users.setdefault(row.user_id, self._new_user())["recent"].add(row.id)
+
+        last_id = 0
+        while True:
+            rows = db.query(
+                User.id, User.slab, User.region, User.target
+            ).filter(User.id > last_id).order_by(User.id).limit(CHUNK_SIZE).all()
+            if not rows:
+                break
+
+            # Wallets and ledger live on each user's shard
+            redeemed, earned = {}, {}
+            for shard, user_ids in group_by_shard([row.id for row in rows]).items():
+                db.info["shard"] = shard
+                redeemed.update(db.query(Wallet.user_id, Wallet.redeemed).filter(
+                    Wallet.user_id.in_(user_ids)
+                ).all())
+                earned.update(db.query(
+                    WalletLedger.user_id, func.sum(WalletLedger.points_delta)
+                ).filter(
+                    WalletLedger.user_id.in_(user_ids),
+                    WalletLedger.entry_type != "OPENING_BALANCE",
+                    WalletLedger.points_delta > 0,
+                    WalletLedger.created_at >= datetime(self.year, 1, 1),
+                    WalletLedger.created_at < datetime(self.year + 1, 1, 1)
+                ).group_by(WalletLedger.user_id).all())
+
+            for row in rows:
+                user = self.users.setdefault(row.id, self._new_user())
+                user.update(
+                    slab=row.slab,
+                    region=row.region,
+                    target=row.target,
+                    redeemed=redeemed.get(row.id) or 0,
+                    earned_ytd=int(earned.get(row.id) or 0),
+                    last_entry_id=max(user["recent"], default=self.watermarks.get(shard_for_user(row.id), 0))
+                )
+                self._place(row.id)
+                self._dirty.add(row.id)
+            last_id = rows[-1].id
+        db.rollback()
+
+    def catch_up(self, db: Session):
+        """Fold in ledger entries and profile changes committed since each shard's watermarks (e.g. by other workers)"""
+        fan_out(self._catch_up_shard)
+        fan_out(self._catch_up_profiles)
+
+    def _advance(self, seen_by_shard: dict, watermarks: dict, shard: str, started: float, last_id: int):
+        with self._lock:
+            seen = seen_by_shard.setdefault(shard, deque())
+            seen.append((time.monotonic(), last_id))
+            # Ids read before (started - LATE_COMMIT_SECONDS) are all committed: this pass saw them
+            while seen and seen[0][0] <= started - LATE_COMMIT_SECONDS:
+                watermarks[shard] = max(watermarks.get(shard, 0), seen.popleft()[1])
+
+    def _catch_up_shard(self, db: Session):
+        shard = db.info["shard"]
+        started = time.monotonic()
+        with self._lock:
+            last_id = self.watermarks.get(shard, 0)
+
+        while True:
+            entries = db.query(
+                WalletLedger.id, WalletLedger.user_id, WalletLedger.entry_type,
+                WalletLedger.points_delta, WalletLedger.redeemed_delta, WalletLedger.created_at
+            ).filter(WalletLedger.id > last_id).order_by(WalletLedger.id).limit(CHUNK_SIZE).all()
+            if not entries:
+                break
+
+            for entry in entries:
+                self.apply_wallet_entry(*entry)
+            last_id = entries[-1].id
+
+        self._advance(self._seen, self.watermarks, shard, started, last_id)
+
+    def _catch_up_profiles(self, db: Session):
+        """Re-read slab / region / target of users whose profile events committed since the watermark"""
+        shard = db.info["shard"]
+        started = time.monotonic()
+        with self._lock:
+            last_id = self.profile_watermarks.get(shard, 0)
+
+        while True:
+            events = db.query(OutboxEvent.id, OutboxEvent.user_id, OutboxEvent.payload).filter(
+                OutboxEvent.event_type == PROFILE_EVENT,
+                OutboxEvent.id > last_id
+            ).order_by(OutboxEvent.id).limit(CHUNK_SIZE).all()
+            if not events:
+                break
+
+            user_ids = {
+                event.user_id for event in events
+                if PROFILE_FIELDS & set((event.payload or {}).get("fields", ()))
+            }
+            if user_ids:
+                for row in db.query(User.id, User.slab, User.region, User.target).filter(User.id.in_(user_ids)):
+                    self.update_profile(*row)
+            last_id = events[-1].id
+
+        self._advance(self._profile_seen, self.profile_watermarks, shard, started, last_id)
+
+    def checkpoint(self, db: Session):
+        """Persist users whose scores or partitions changed since the last checkpoint"""
+        with self._lock:
+            dirty = list(self._dirty)
+            self._dirty.clear()
+            watermarks = dict(self.watermarks)
+            snapshot = []
+            for user_id in dirty:
+                user = self.users.get(user_id)
+                if user is None:
+                    continue
+                watermark = watermarks.get(shard_for_user(user_id), 0)
+                snapshot.append({
+                    "user_id": user_id,
+                    "year": self.year,
+                    "slab": user["slab"],
+                    "region": user["region"],
+                    "target": user["target"],
+                    "redeemed": user["redeemed"],
+                    "earned_ytd": user["earned_ytd"],
+                    "last_entry_id": user["last_entry_id"],
+                    "ledger_watermark": watermark,
+                    "recent_entry_ids": sorted(i for i in user["recent"] if i > watermark),
+                    "updated_at": datetime.now()
+                })
+
+        try:
+            for start in range(0, len(snapshot), CHUNK_SIZE):
+                _save_checkpoint_rows(db, snapshot[start:start + CHUNK_SIZE])
+                db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._dirty.update(dirty)
+            raise
+
+
+def _save_checkpoint_rows(db: Session, rows: list):
+    """Insert or overwrite checkpoint rows (one executemany where the dialect has an upsert)"""
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    columns = [name for name in rows[0] if name != "user_id"]
+
+    if dialect == "mysql":
+        stmt = mysql.insert(LeaderboardCheckpoint)
+        stmt = stmt.on_duplicate_key_update(**{name: stmt.inserted[name] for name in columns})
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(LeaderboardCheckpoint)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"], set_={name: stmt.excluded[name] for name in columns}
+        )
+    else:
+        for row in rows:
+            db.merge(LeaderboardCheckpoint(**row))
+        return
+
+    db.execute(stmt, rows)
+
+
+def claim_checkpoint(db: Session, interval: int = CHECKPOINT_INTERVAL_SECONDS) -> bool:
+    """True for the one process that takes this interval's checkpoint (lease row on the primary)"""
+    if db.get(MaintenanceFlag, CHECKPOINT_LEASE) is None:
+        db.add(MaintenanceFlag(name=CHECKPOINT_LEASE, enabled=True, updated_at=datetime(2000, 1, 1)))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+
+    now = datetime.now()
+    claimed = db.query(MaintenanceFlag).filter(
+        MaintenanceFlag.name == CHECKPOINT_LEASE,
+        or_(MaintenanceFlag.updated_at.is_(None), MaintenanceFlag.updated_at <= now - timedelta(seconds=interval / 2))
+    ).update({"updated_at": now}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+leaderboards = LeaderboardEngine()
+
+
+# ============================================================
+# APPLY WALLET EVENTS AFTER COMMIT
+# ============================================================
+def queue_wallet_entry(db: Session, entry: WalletLedger):
+    """Called by the ledger; the entry reaches the boards only if the transaction commits"""
+    db.info.setdefault("leaderboard_entries", []).append(entry)
+
+
+@event.listens_for(Session, "before_commit")
+def _collect_entries(session):
+    entries = session.info.pop("leaderboard_entries", None)
+    if entries:
+        session.flush()
+        session.info["leaderboard_applied"] = [
+            (e.id, e.user_id, e.entry_type, e.points_delta, e.redeemed_delta, e.created_at)
+            for e in entries
+        ]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_entries(session):
+    for entry in session.info.pop("leaderboard_applied", []):
+        leaderboards.apply_wallet_entry(*entry)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_entries(session):
+    session.info.pop("leaderboard_entries", None)
+    session.info.pop("leaderboard_applied", None)
+
+
+# ============================================================
+# BACKGROUND LOAD + CHECKPOINT
+# ============================================================
+_checkpoint_stop = threading.Event()
+
+
+def _checkpoint_loop(interval: int):
+    db = SessionLocal()
+    try:
+        leaderboards.rebuild(db)
+        print(f"🏆 Leaderboards loaded: {len(leaderboards.users)} users")
+    except Exception as e:
+        print(f"❌ Leaderboard rebuild error: {e}")
+    finally:
+        db.close()
+
+    while not _checkpoint_stop.wait(interval):
+        db = SessionLocal()
+        try:
+            # Attainment is year-to-date: start over on the first run of a new year
+            if leaderboards.year != date.today().year:
+                leaderboards.rebuild(db)
+            leaderboards.catch_up(db)
+            # Every process catches up; one of them saves (the others keep their dirty users for their turn)
+            if claim_checkpoint(db):
+                leaderboards.checkpoint(db)
+        except Exception as e:
+            print(f"❌ Leaderboard checkpoint error: {e}")
+        finally:
+            db.close()
+
+
+def start_checkpointer():
+    """Rebuild the boards in the background, then catch up + checkpoint periodically"""
+    if CHECKPOINT_INTERVAL_SECONDS <= 0:
+        return None
+
+    _checkpoint_stop.clear()
+    thread = threading.Thread(
+        target=_checkpoint_loop,
+        args=(CHECKPOINT_INTERVAL_SECONDS,),
+        name="leaderboard-checkpoint",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_checkpointer():
+    _checkpoint_stop.set()
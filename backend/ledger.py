@@ -0,0 +1,255 @@
+from sqlalchemy import func, and_
+from sqlalchemy.orm import Session
+from database import SessionLocal, SHARDED, fan_out
+from models import Wallet, WalletLedger, WalletSnapshot
+from rollups import record_wallet_activity
+from leaderboard import queue_wallet_entry
+import os
+import threading
+
+# Points every new wallet opens with
+OPENING_POINTS = 6000
+
+# Write a running-balance snapshot every N ledger entries per user
+SNAPSHOT_INTERVAL = int(os.getenv("WALLET_SNAPSHOT_INTERVAL", "50"))
+
+# Background reconciler (0 = disabled)
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("WALLET_RECONCILE_INTERVAL", "0"))
+RECONCILE_CHUNK_SIZE = int(os.getenv("WALLET_RECONCILE_CHUNK_SIZE", "1000"))
+
+
+# ================= LEDGER WRITE =================
+def lock_wallet(db: Session, user_id: int):
+    """
+    Load the user's wallet with its row locked (FOR UPDATE) and fresh counters, or None.
+    Debits check the balance on this row: the lock holds until the caller commits, so a
+    concurrent debit waits and then sees the lowered balance.
+    """
+    return db.query(Wallet).filter(
+        Wallet.user_id == user_id
+    ).populate_existing().with_for_update().first()
+
+
+def apply_wallet_change(
+    db: Session,
+    wallet: Wallet,
+    points_delta: int,
+    redeemed_delta: int,
+    entry_type: str,
+    reference: str = None
+) -> WalletLedger:
+    """
+    Mutate the wallet counters AND append the matching ledger entry.
+    Every write path that touches Wallet.points / Wallet.redeemed goes through here.
+    Caller commits.
+    """
+
+    # Sessions don't autoflush: make earlier entries from this same transaction visible
+    db.flush()
+    # Lock the wallet row and re-read its counters: concurrent changes to the same wallet queue
+    # here instead of both reading the same seq / balance
+    db.refresh(wallet, with_for_update=True)
+
+    last_seq = db.query(func.max(WalletLedger.seq)).filter(
+        WalletLedger.user_id == wallet.user_id
+    ).scalar() or 0
+
+    # Wallets created before the ledger existed: open the history with their current counters
+    if last_seq == 0 and (wallet.points or wallet.redeemed):
+        last_seq += 1
+        db.add(WalletLedger(
+            user_id=wallet.user_id,
+            seq=last_seq,
+            entry_type="OPENING_BALANCE",
+            points_delta=wallet.points or 0,
+            redeemed_delta=wallet.redeemed or 0
+        ))
+
+    wallet.points = (wallet.points or 0) + points_delta
+    wallet.redeemed = (wallet.redeemed or 0) + redeemed_delta
+
+    entry = WalletLedger(
+        user_id=wallet.user_id,
+        seq=last_seq + 1,
+        entry_type=entry_type,
+        points_delta=points_delta,
+        redeemed_delta=redeemed_delta,
+        reference=reference
+    )
+    db.add(entry)
+
+    # Keep dashboard rollups in step with the ledger (same transaction)
+    record_wallet_activity(db, wallet.user_id, entry_type, points_delta, redeemed_delta)
+    # Leaderboards are updated in memory once this transaction commits
+    queue_wallet_entry(db, entry)
+
+    if entry.seq // SNAPSHOT_INTERVAL > last_seq // SNAPSHOT_INTERVAL:
+        db.flush()
+        points, redeemed = get_ledger_balance(db, wallet.user_id)
+        db.add(WalletSnapshot(
+            user_id=wallet.user_id,
+            seq=entry.seq,
+            points=points,
+            redeemed=redeemed
+        ))
+
+    return entry
+
+
+# ================= LEDGER READ =================
+def get_ledger_balance(db: Session, user_id: int) -> tuple:
+    """Derived balance = latest snapshot + sum of the entries after it. Returns (points, redeemed)"""
+
+    snapshot = db.query(WalletSnapshot).filter(
+        WalletSnapshot.user_id == user_id
+    ).order_by(WalletSnapshot.seq.desc()).first()
+
+    base_seq = snapshot.seq if snapshot else 0
+    base_points = snapshot.points if snapshot else 0
+    base_redeemed = snapshot.redeemed if snapshot else 0
+
+    tail_points, tail_redeemed = db.query(
+        func.coalesce(func.sum(WalletLedger.points_delta), 0),
+        func.coalesce(func.sum(WalletLedger.redeemed_delta), 0)
+    ).filter(
+        WalletLedger.user_id == user_id,
+        WalletLedger.seq > base_seq
+    ).one()
+
+    return base_points + int(tail_points), base_redeemed + int(tail_redeemed)
+
+
+# ================= RECONCILER =================
+def _ledger_balances_for(db: Session, user_ids: list) -> dict:
+    """Derived balances for a chunk of users in two grouped queries"""
+
+    latest = db.query(
+        WalletSnapshot.user_id.label("user_id"),
+        func.max(WalletSnapshot.seq).label("seq")
+    ).filter(
+        WalletSnapshot.user_id.in_(user_ids)
+    ).group_by(WalletSnapshot.user_id).subquery()
+
+    balances = {uid: [0, 0, 0] for uid in user_ids}
+
+    snapshots = db.query(WalletSnapshot).join(
+        latest,
+        and_(WalletSnapshot.user_id == latest.c.user_id, WalletSnapshot.seq == latest.c.seq)
+    ).all()
+    for snap in snapshots:
+        balances[snap.user_id] = [snap.seq, snap.points, snap.redeemed]
+
+    tails = db.query(
+        WalletLedger.user_id,
+        func.sum(WalletLedger.points_delta),
+        func.sum(WalletLedger.redeemed_delta),
+        func.count(WalletLedger.id)
+    ).outerjoin(
+        latest, WalletLedger.user_id == latest.c.user_id
+    ).filter(
+        WalletLedger.user_id.in_(user_ids),
+        WalletLedger.seq > func.coalesce(latest.c.seq, 0)
+    ).group_by(WalletLedger.user_id).all()
+
+    result = {}
+    for uid, (seq, points, redeemed) in balances.items():
+        result[uid] = {"points": points, "redeemed": redeemed, "has_history": seq > 0}
+    for uid, tail_points, tail_redeemed, count in tails:
+        result[uid]["points"] += int(tail_points or 0)
+        result[uid]["redeemed"] += int(tail_redeemed or 0)
+        result[uid]["has_history"] = result[uid]["has_history"] or count > 0
+
+    return result
+
+
+def reconcile_wallets(db: Session, chunk_size: int = RECONCILE_CHUNK_SIZE) -> dict:
+    """
+    Compare every wallet's counters against its ledger-derived balance.
+    Wallets are streamed in keyset-ordered chunks so memory stays flat.
+    Wallets without any ledger history yet are skipped (they get an OPENING_BALANCE on first write).
+    With user shards, every shard is checked in parallel and the reports are merged.
+    """
+    if SHARDED:
+        reports = fan_out(lambda shard_db: _reconcile_shard(shard_db, chunk_size)).values()
+        return {
+            "checked": sum(report["checked"] for report in reports),
+            "skipped": sum(report["skipped"] for report in reports),
+            "mismatches": [mismatch for report in reports for mismatch in report["mismatches"]]
+        }
+
+    return _reconcile_shard(db, chunk_size)
+
+
+def _reconcile_shard(db: Session, chunk_size: int) -> dict:
+
+    checked, skipped, mismatches = 0, 0, []
+    last_id = 0
+
+    while True:
+        chunk = db.query(Wallet.id, Wallet.user_id, Wallet.points, Wallet.redeemed).filter(
+            Wallet.id > last_id
+        ).order_by(Wallet.id).limit(chunk_size).all()
+
+        if not chunk:
+            break
+
+        derived = _ledger_balances_for(db, [row.user_id for row in chunk])
+
+        for row in chunk:
+            ledger = derived[row.user_id]
+            if not ledger["has_history"]:
+                skipped += 1
+                continue
+
+            checked += 1
+            if ledger["points"] != (row.points or 0) or ledger["redeemed"] != (row.redeemed or 0):
+                mismatches.append({
+                    "user_id": row.user_id,
+                    "wallet_points": row.points,
+                    "ledger_points": ledger["points"],
+                    "wallet_redeemed": row.redeemed,
+                    "ledger_redeemed": ledger["redeemed"]
+                })
+
+        last_id = chunk[-1].id
+        db.expunge_all()
+
+    return {"checked": checked, "skipped": skipped, "mismatches": mismatches}
+
+
+_reconciler_stop = threading.Event()
+
+
+def _reconciler_loop(interval: int):
+    while not _reconciler_stop.wait(interval):
+        db = SessionLocal()
+        try:
+            report = reconcile_wallets(db)
+            if report["mismatches"]:
+                print(f"⚠️ Wallet reconciler: {len(report['mismatches'])} mismatches out of {report['checked']} wallets")
+                for mismatch in report["mismatches"][:20]:
+                    print(f"   {mismatch}")
+        except Exception as e:
+            print(f"❌ Wallet reconciler error: {e}")
+        finally:
+            db.close()
+
+
+def start_reconciler():
+    """Start the periodic reconciler thread if WALLET_RECONCILE_INTERVAL is set"""
+    if RECONCILE_INTERVAL_SECONDS <= 0:
+        return None
+
+    _reconciler_stop.clear()
+    thread = threading.Thread(
+        target=_reconciler_loop,
+        args=(RECONCILE_INTERVAL_SECONDS,),
+        name="wallet-reconciler",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_reconciler():
+    _reconciler_stop.set()
@@ -1,32 +1,60 @@
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine
-import models
-from routers import auth, kyc, bank, wallet, kyc_ocr, cart, orders
-from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse
+from settings import settings
+from database import warm_up, start_replica_monitor, stop_replica_monitor
+from payment_validation import load_reference_data
+from static_assets import mount_frontend
+from compression import CompressionMiddleware
+from routers import auth, kyc, bank, wallet, kyc_ocr, cart, orders, performance, accruals, onboarding
+from routers import leaderboard as leaderboard_router
+from routers import push as push_router
+import ledger
+import leaderboard
+import bank_validation
+import outbox
+import push
 
-load_dotenv()
 
+# Startup / shutdown: DB pool warm-up, validation reference data and background jobs
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up()
+    start_replica_monitor()
+    load_reference_data()
+    ledger.start_reconciler()
+    leaderboard.start_checkpointer()
+    bank_validation.start_workers()
+    outbox.start_dispatcher()
+    push.hub.start(asyncio.get_running_loop())
+    yield
+    push.hub.stop()
+    stop_replica_monitor()
+    ledger.stop_reconciler()
+    leaderboard.stop_checkpointer()
+    bank_validation.stop_workers()
+    outbox.stop_dispatcher()
 
 
 # Create FastAPI app
-app = FastAPI(title="RSPL Demo Platform")
+# orjson for every JSON response (routes returning their own Response are unaffected)
+app = FastAPI(title="RSPL Demo Platform", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "https://greaves-cotton.vercel.app",   # ✅ ADD THIS
-        "https://hamdard-udaan.vercel.app",
-        "http://localhost:3000",
-        "http://127.0.0.1:5500"
-    ],
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# gzip / brotli for responses over COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
 
 # Root endpoint
 @app.get("/")
@@ -40,4 +68,12 @@ app.include_router(bank.router)
 app.include_router(wallet.router)
 app.include_router(kyc_ocr.router)
 app.include_router(cart.router)
-app.include_router(orders.router)
\ No newline at end of file
+app.include_router(orders.router)
+app.include_router(performance.router)
+app.include_router(leaderboard_router.router)
+app.include_router(accruals.router)
+app.include_router(onboarding.router)
+app.include_router(push_router.router)
+
+# Built frontend (build_assets.py)
+mount_frontend(app)
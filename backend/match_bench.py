@@ -0,0 +1,160 @@
+"""
+Cheque matching benchmark.
+
+    python match_bench.py [--repeat 2000] [--cases 500]
+
+Speed: the old pure-Python O(n·m) Levenshtein (calculate_similarity before fuzzy_match) against
+fuzzy_match.similarity at name, account-number and long-string lengths.
+Decisions: on synthetic OCR results (honorifics, initials, missing middle names, O/0 and I/1 mix-ups,
+plus genuinely different details) compares the old exact normalized comparison with match_bank_details.
+"""
+from fuzzy_match import match_bank_details, similarity
+import argparse
+import random
+import re
+import string
+import sys
+import time
+
+
+# ============================================================
+# BEFORE (routers/bank.py as it was)
+# ============================================================
+def legacy_similarity(s1: str, s2: str) -> float:
+    if not s1 or not s2:
+        return 0.0
+    if s1 == s2:
+        return 1.0
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+
+    len1, len2 = len(s1), len(s2)
+    current_row = list(range(len1 + 1))
+    for i in range(1, len2 + 1):
+        previous_row, current_row = current_row, [i] + [0] * len1
+        for j in range(1, len1 + 1):
+            add = previous_row[j] + 1
+            delete = current_row[j - 1] + 1
+            change = previous_row[j - 1]
+            if s1[j - 1] != s2[i - 1]:
+                change += 1
+            current_row[j] = min(add, delete, change)
+
+    distance = current_row[len1]
+    return 1 - distance / max(len(s1), len(s2))
+
+
+def legacy_match(extracted: dict, stored: dict) -> bool:
+    def normalize(s):
+        return re.sub(r'[^A-Z0-9]', '', s.upper()) if s else ""
+
+    return all(
+        normalize(extracted.get(field)) == normalize(stored.get(field))
+        for field in ("account_holder_name", "account_number", "ifsc")
+    )
+
+
+# ============================================================
+# SPEED
+# ============================================================
+def _random_text(rng, length: int) -> str:
+    return "".join(rng.choice(string.ascii_uppercase + " ") for _ in range(length))
+
+
+def _mutate(rng, text: str, edits: int) -> str:
+    chars = list(text)
+    for _ in range(edits):
+        chars[rng.randrange(len(chars))] = rng.choice(string.ascii_uppercase)
+    return "".join(chars)
+
+
+def run_speed(repeat: int):
+    rng = random.Random(1)
+    print(f"🏁 similarity, {repeat} pairs per length")
+    for length in (12, 24, 64, 256):
+        pairs = [(text, _mutate(rng, text, max(1, length // 8))) for text in (_random_text(rng, length) for _ in range(repeat))]
+
+        started = time.perf_counter()
+        before = [legacy_similarity(a, b) for a, b in pairs]
+        before_us = (time.perf_counter() - started) / repeat * 1e6
+
+        started = time.perf_counter()
+        after = [similarity(a, b) for a, b in pairs]
+        after_us = (time.perf_counter() - started) / repeat * 1e6
+
+        assert all(abs(x - y) < 1e-12 for x, y in zip(before, after))
+        print(f"   {length:>4} chars  before {before_us:>9.1f} µs  after {after_us:>7.1f} µs  ({before_us / after_us:>5.1f}x)")
+
+
+# ============================================================
+# DECISIONS
+# ============================================================
+FIRST = ["RAJESH", "SUNITA", "MOHAMMED", "PRIYA", "ANIL", "KAVITA", "SURESH", "NEHA", "ABDUL", "GEETA"]
+MIDDLE = ["KUMAR", "DEVI", "PRASAD", "RANI", "LAL", ""]
+LAST = ["SHARMA", "VERMA", "KHAN", "PATEL", "YADAV", "SINGH", "GUPTA", "REDDY", "NAIR", "DAS"]
+
+
+def _person(rng) -> dict:
+    name = " ".join(part for part in (rng.choice(FIRST), rng.choice(MIDDLE), rng.choice(LAST)) if part)
+    return {
+        "account_holder_name": name.title(),
+        "account_number": "".join(rng.choice(string.digits[1:]) for _ in range(rng.choice((11, 12, 14)))),
+        "ifsc": rng.choice(["SBIN", "HDFC", "ICIC", "UTIB"]) + "0" + "".join(rng.choice(string.digits) for _ in range(6)),
+    }
+
+
+def _ocr_variant(rng, stored: dict) -> dict:
+    """The same details as a cheque OCR might return them"""
+    words = stored["account_holder_name"].upper().split()
+    style = rng.randrange(4)
+    if style == 1 and len(words) > 2:
+        words = [words[0][0]] + [word[0] for word in words[1:-1]] + [words[-1]]   # R K SHARMA
+    elif style == 2 and len(words) > 2:
+        words = [words[0], words[-1]]                                            # no middle name
+    elif style == 3:
+        words = [words[-1]] + words[:-1]                                         # surname first
+    name = rng.choice(["", "MR ", "MRS ", "SHRI ", "SMT "]) + " ".join(words)
+
+    account = stored["account_number"]
+    if rng.random() < 0.3:
+        position = rng.randrange(len(account))
+        account = account[:position] + {"0": "O", "1": "I", "5": "S", "8": "B"}.get(account[position], account[position]) + account[position + 1:]
+    ifsc = stored["ifsc"][:4] + "O" + stored["ifsc"][5:] if rng.random() < 0.3 else stored["ifsc"]
+    return {"account_holder_name": name, "account_number": account, "ifsc": ifsc}
+
+
+def run_decisions(cases: int):
+    rng = random.Random(2)
+    same = different = 0
+    legacy_same = legacy_different = 0
+
+    for _ in range(cases):
+        stored = _person(rng)
+        genuine = _ocr_variant(rng, stored)
+        other = _ocr_variant(rng, _person(rng))
+        # Someone else's cheque with the same holder name: account number must still decide
+        impostor = {**genuine, "account_number": other["account_number"]}
+
+        same += match_bank_details(genuine, stored)["is_valid"]
+        legacy_same += legacy_match(genuine, stored)
+        for candidate in (other, impostor):
+            different += not match_bank_details(candidate, stored)["is_valid"]
+            legacy_different += not legacy_match(candidate, stored)
+
+    print(f"\n🏁 decisions on {cases} holders")
+    print(f"   genuine cheques accepted   before {legacy_same / cases:>6.1%}  after {same / cases:>6.1%}")
+    print(f"   wrong cheques rejected     before {legacy_different / (2 * cases):>6.1%}  after {different / (2 * cases):>6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cheque matching benchmark")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--cases", type=int, default=500)
+    args = parser.parse_args()
+
+    run_speed(args.repeat)
+    run_decisions(args.cases)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+from alembic import context, op
+from sqlalchemy import inspect
+import os
+
+# Build indexes without blocking writes (MySQL INPLACE/LOCK=NONE, PostgreSQL CONCURRENTLY)
+ONLINE_DDL = os.getenv("MIGRATION_ONLINE_DDL", "1") == "1"
+
+
+def _inspector():
+    return inspect(op.get_bind())
+
+
+def has_table(table: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return _inspector().has_table(table)
+
+
+def get_columns(table: str) -> dict:
+    """name -> inspector column info ({} in offline mode)"""
+    if context.is_offline_mode():
+        return {}
+    return {column["name"]: column for column in _inspector().get_columns(table)}
+
+
+def find_index(table: str, columns: list, unique: bool = False):
+    """Name of an existing index (or unique constraint) on exactly these columns, else None"""
+    if context.is_offline_mode():
+        return None
+
+    inspector = _inspector()
+    candidates = [
+        (index["name"], index["column_names"], bool(index.get("unique")))
+        for index in inspector.get_indexes(table)
+    ]
+    candidates += [
+        (constraint["name"], constraint["column_names"], True)
+        for constraint in inspector.get_unique_constraints(table)
+    ]
+
+    for name, index_columns, index_unique in candidates:
+        if list(index_columns) == list(columns) and (index_unique or not unique):
+            return name
+    return None
+
+
+def create_index(name: str, table: str, columns: list, unique: bool = False):
+    """
+    Create an index unless an equivalent one already exists (hand-made DBs have their own names).
+    Uses online DDL on MySQL / PostgreSQL when MIGRATION_ONLINE_DDL=1 (default).
+    """
+    existing = find_index(table, columns, unique)
+    if existing:
+        print(f"   {table}: {existing} already covers ({', '.join(columns)})")
+        return
+
+    dialect = op.get_bind().dialect.name
+
+    if ONLINE_DDL and dialect == "mysql":
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        op.execute(
+            f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)}), "
+            f"ALGORITHM=INPLACE, LOCK=NONE"
+        )
+    elif ONLINE_DDL and dialect == "postgresql":
+        # CONCURRENTLY can't run inside a transaction
+        with context.get_context().autocommit_block():
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def drop_index(name: str, table: str):
+    if context.is_offline_mode() or name in {index["name"] for index in _inspector().get_indexes(table)}:
+        op.drop_index(name, table_name=table)
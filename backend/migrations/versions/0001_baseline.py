@@ -0,0 +1,280 @@
+"""Baseline: bring an existing (hand-migrated) database to the models
+
+Creates missing tables and adds missing columns/indexes. Databases built from
+rspl_demo.sql are upgraded in place; an empty database gets the full schema.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+from migrations.helpers import has_table, get_columns, create_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Schema as of this revision (frozen copy - later model changes get their own revision)
+LongText = sa.Text().with_variant(mysql.LONGTEXT(), "mysql")
+
+meta = sa.MetaData()
+
+TABLES = [
+    sa.Table(
+        "users", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("full_name", sa.String(100)),
+        sa.Column("phone", sa.String(15), unique=True),
+        sa.Column("email", sa.String(100), nullable=True),
+        sa.Column("otp", sa.String(6)),
+        sa.Column("otp_verified", sa.Boolean, server_default=sa.false()),
+        sa.Column("profile_picture", LongText, nullable=True),
+        sa.Column("ham_code", sa.String(20), unique=True, nullable=True),
+        sa.Column("be_name", sa.String(100), nullable=True),
+        sa.Column("outlet_name", sa.String(100), nullable=True),
+        sa.Column("member_type", sa.String(50), nullable=True),
+        sa.Column("slab", sa.String(50), nullable=True),
+        sa.Column("distributor_name", sa.String(100), nullable=True),
+        sa.Column("target", sa.Integer, nullable=True),
+        sa.Column("region", sa.String(50), nullable=True),
+        sa.Column("state", sa.String(50), nullable=True),
+        sa.Column("city", sa.String(50), nullable=True),
+        sa.Column("address", sa.Text, nullable=True),
+        sa.Column("pincode", sa.String(10), nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("version", sa.Integer, nullable=False, server_default="1"),
+        sa.Column("kyc_status", sa.String(20), server_default="PENDING"),
+        sa.Column("kyc_doc_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Index("idx_users_kyc_location", "region", "state", "city", "kyc_status"),
+        sa.Index("idx_users_kyc_status_id", "kyc_status", "id"),
+        sa.Index("idx_users_distributor_id", "distributor_name", "id"),
+        sa.Index("idx_users_created_at", "created_at"),
+    ),
+    sa.Table(
+        "kyc", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False, index=True),
+        sa.Column("document_type", sa.String(50), nullable=False),
+        sa.Column("document_number", sa.String(100), nullable=False),
+        sa.Column("status", sa.String(20), server_default="COMPLETED"),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.UniqueConstraint("user_id", "document_type", name="unique_user_document"),
+    ),
+    sa.Table(
+        "bank_details", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False, index=True),
+        sa.Column("payment_method", sa.String(10), server_default="BANK"),
+        sa.Column("account_holder_name", sa.String(255)),
+        sa.Column("bank_name", sa.String(255)),
+        sa.Column("account_number", sa.String(50)),
+        sa.Column("ifsc", sa.String(11)),
+        sa.Column("cheque_image", LongText),
+        sa.Column("upi_id", sa.String(255)),
+        sa.Column("upi_qr_code", LongText),
+        sa.Column("is_validated", sa.Boolean, server_default=sa.false()),
+        sa.Column("validation_status", sa.String(20), server_default="PENDING"),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    ),
+    sa.Table(
+        "wallet", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), unique=True, nullable=False),
+        sa.Column("points", sa.Integer, server_default="6000"),
+        sa.Column("redeemed", sa.Integer, server_default="0"),
+    ),
+    sa.Table(
+        "wallet_ledger", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("seq", sa.Integer, nullable=False),
+        sa.Column("entry_type", sa.String(30), nullable=False),
+        sa.Column("points_delta", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("redeemed_delta", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("reference", sa.String(50), nullable=True),
+        sa.Column("created_at", sa.DateTime),
+        sa.UniqueConstraint("user_id", "seq", name="unique_user_ledger_seq"),
+    ),
+    sa.Table(
+        "wallet_snapshots", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("seq", sa.Integer, nullable=False),
+        sa.Column("points", sa.Integer, nullable=False),
+        sa.Column("redeemed", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        sa.UniqueConstraint("user_id", "seq", name="unique_user_snapshot_seq"),
+    ),
+    sa.Table(
+        "transactions", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False, index=True),
+        sa.Column("transaction_type", sa.String(50), nullable=False),
+        sa.Column("points", sa.Integer, nullable=False),
+        sa.Column("amount", sa.Integer, nullable=True),
+        sa.Column("tds_percentage", sa.Integer, server_default="15"),
+        sa.Column("tds_amount", sa.Integer, server_default="0"),
+        sa.Column("net_amount", sa.Integer, server_default="0"),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("status", sa.String(20), server_default="COMPLETED"),
+        sa.Column("created_at", sa.DateTime),
+    ),
+    sa.Table(
+        "carts", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+        sa.Column("product_name", sa.String(255)),
+        sa.Column("product_image", sa.String(500)),
+        sa.Column("points", sa.Integer),
+        sa.Column("quantity", sa.Integer, server_default="1"),
+        sa.Column("category", sa.String(100)),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+    ),
+    sa.Table(
+        "orders", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False, index=True),
+        sa.Column("order_id", sa.String(50), unique=True, nullable=False),
+        sa.Column("total_points", sa.Integer, nullable=False),
+        sa.Column("delivery_address", sa.Text, nullable=True),
+        sa.Column("mobile", sa.String(20), nullable=True),
+        sa.Column("status", sa.String(50), server_default="completed"),
+        sa.Column("transaction_type", sa.String(20), server_default="PRODUCT"),
+        sa.Column("created_at", sa.DateTime),
+    ),
+    sa.Table(
+        "order_items", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("order_id", sa.String(50), sa.ForeignKey("orders.order_id"), nullable=False),
+        sa.Column("product_name", sa.String(255), nullable=False),
+        sa.Column("product_image", sa.Text, nullable=True),
+        sa.Column("points", sa.Integer, nullable=False),
+        sa.Column("quantity", sa.Integer, server_default="1"),
+        sa.Column("category", sa.String(100), nullable=True),
+    ),
+    sa.Table(
+        "performance_rollups", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("scope", sa.String(20), nullable=False),
+        sa.Column("scope_key", sa.String(100), nullable=False),
+        sa.Column("period_type", sa.String(1), nullable=False),
+        sa.Column("period_start", sa.Date, nullable=False),
+        sa.Column("points_earned", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("points_redeemed", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("orders_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("transfers_count", sa.Integer, nullable=False, server_default="0"),
+        sa.UniqueConstraint("scope", "scope_key", "period_type", "period_start", name="unique_rollup_period"),
+    ),
+    sa.Table(
+        "leaderboard_checkpoints", meta,
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("year", sa.Integer, nullable=False),
+        sa.Column("slab", sa.String(50), nullable=True),
+        sa.Column("region", sa.String(50), nullable=True),
+        sa.Column("target", sa.Integer, nullable=True),
+        sa.Column("redeemed", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("earned_ytd", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("last_entry_id", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("ledger_watermark", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime),
+    ),
+    sa.Table(
+        "accrual_batches", meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("checksum", sa.String(64), unique=True, nullable=False),
+        sa.Column("status", sa.String(20), server_default="RUNNING"),
+        sa.Column("rows_total", sa.Integer, server_default="0"),
+        sa.Column("rows_accepted", sa.Integer, server_default="0"),
+        sa.Column("rows_rejected", sa.Integer, server_default="0"),
+        sa.Column("points_credited", sa.Integer, server_default="0"),
+        sa.Column("started_at", sa.DateTime),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+    ),
+]
+
+# Columns renamed in place by rspl_demo.sql on some databases: table -> {old: new}
+LEGACY_RENAMES = {
+    "wallet": {"available_points": "points", "redeemed_points": "redeemed"},
+}
+
+# NOT NULL in rspl_demo.sql but optional in the models (UPI-only payment details have no bank fields)
+RELAX_NOT_NULL = {
+    "bank_details": ["account_holder_name", "bank_name", "account_number", "ifsc"],
+    "users": ["full_name"],
+}
+
+
+def _rename_legacy_columns(table: sa.Table, existing: dict):
+    for old, new in LEGACY_RENAMES.get(table.name, {}).items():
+        if old in existing and new not in existing:
+            op.alter_column(
+                table.name, old,
+                new_column_name=new,
+                existing_type=table.c[new].type,
+                existing_server_default=existing[old].get("default")
+            )
+            existing[new] = existing.pop(old)
+            print(f"   renamed {table.name}.{old} -> {new}")
+
+
+def _index_name(table: sa.Table, prefix: str, columns) -> str:
+    return f"{prefix}_{table.name}_{'_'.join(c.name for c in columns)}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        if not has_table(table.name):
+            table.create(op.get_bind())
+            print(f"   created {table.name}")
+            continue
+
+        existing = get_columns(table.name)
+        _rename_legacy_columns(table, existing)
+
+        for column in table.columns:
+            if column.name not in existing:
+                # Unique / index flags are handled below as separate (online) index builds
+                op.add_column(table.name, sa.Column(
+                    column.name, column.type, nullable=column.nullable, server_default=column.server_default
+                ))
+                print(f"   added {table.name}.{column.name}")
+
+        relax = [name for name in RELAX_NOT_NULL.get(table.name, []) if name in existing and not existing[name]["nullable"]]
+        if relax:
+            # Batch mode: plain ALTER on MySQL, table copy on SQLite
+            with op.batch_alter_table(table.name) as batch:
+                for name in relax:
+                    batch.alter_column(
+                        name,
+                        nullable=True,
+                        existing_type=table.c[name].type,
+                        existing_server_default=existing[name].get("default")
+                    )
+
+        for index in table.indexes:
+            name = index.name if isinstance(index.name, str) else _index_name(table, "ix", index.columns)
+            create_index(name, table.name, [c.name for c in index.columns], unique=index.unique)
+
+        for constraint in table.constraints:
+            if isinstance(constraint, sa.UniqueConstraint):
+                name = constraint.name if isinstance(constraint.name, str) else _index_name(table, "uq", constraint.columns)
+                create_index(name, table.name, [c.name for c in constraint.columns], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The baseline describes data that predates migrations - nothing to undo
+    pass
@@ -0,0 +1,85 @@
+"""Indexes for the hot cart / order / bank / transaction queries
+
+Unique indexes first fold existing duplicates: cart rows for the same product are
+merged (quantities summed), and only the newest payment details per user are kept.
+
+Revision ID: 0002_performance_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import create_index, drop_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_performance_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _merge_duplicate_cart_rows():
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT user_id, product_name, MIN(id) AS keep_id, SUM(quantity) AS quantity "
+        "FROM carts GROUP BY user_id, product_name HAVING COUNT(*) > 1"
+    )).all()
+
+    for user_id, product_name, keep_id, quantity in duplicates:
+        bind.execute(
+            sa.text("UPDATE carts SET quantity = :quantity WHERE id = :keep_id"),
+            {"quantity": quantity, "keep_id": keep_id}
+        )
+        bind.execute(
+            sa.text("DELETE FROM carts WHERE user_id = :user_id AND product_name = :product_name AND id <> :keep_id"),
+            {"user_id": user_id, "product_name": product_name, "keep_id": keep_id}
+        )
+
+    if duplicates:
+        print(f"   merged {len(duplicates)} duplicated cart products")
+
+
+def _drop_duplicate_bank_details():
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT user_id, MAX(id) AS keep_id FROM bank_details GROUP BY user_id HAVING COUNT(*) > 1"
+    )).all()
+
+    for user_id, keep_id in duplicates:
+        bind.execute(
+            sa.text("DELETE FROM bank_details WHERE user_id = :user_id AND id <> :keep_id"),
+            {"user_id": user_id, "keep_id": keep_id}
+        )
+
+    if duplicates:
+        print(f"   removed older payment details for {len(duplicates)} users")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not op.get_context().as_sql:
+        _merge_duplicate_cart_rows()
+        _drop_duplicate_bank_details()
+
+    # add_to_cart / checkout look up (user_id, product_name); one row per product
+    create_index("uq_carts_user_product", "carts", ["user_id", "product_name"], unique=True)
+    # Order history: WHERE user_id = ? ORDER BY created_at DESC
+    create_index("idx_orders_user_created", "orders", ["user_id", "created_at"])
+    # Items of an order (joins / per-order lookups)
+    create_index("idx_order_items_order_id", "order_items", ["order_id"])
+    # One payment-details row per user
+    create_index("uq_bank_details_user_id", "bank_details", ["user_id"], unique=True)
+    # Transaction history: WHERE user_id = ? ORDER BY created_at DESC
+    create_index("idx_transactions_user_created", "transactions", ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index("idx_transactions_user_created", "transactions")
+    drop_index("uq_bank_details_user_id", "bank_details")
+    drop_index("idx_order_items_order_id", "order_items")
+    drop_index("idx_orders_user_created", "orders")
+    drop_index("uq_carts_user_product", "carts")
@@ -0,0 +1,42 @@
+"""Queue columns for background bank-details validation
+
+Revision ID: 0003_bank_validation_queue
+Revises: 0002_performance_indexes
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import get_columns, create_index, drop_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_bank_validation_queue"
+down_revision: Union[str, Sequence[str], None] = "0002_performance_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    sa.Column("validation_reason", sa.String(500), nullable=True),
+    sa.Column("validation_claimed_at", sa.DateTime, nullable=True),
+    sa.Column("validation_attempts", sa.Integer, nullable=False, server_default="0"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = get_columns("bank_details")
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column("bank_details", column.copy())
+
+    # Workers claim WHERE validation_status = 'PENDING' ORDER BY id
+    create_index("idx_bank_details_validation_status", "bank_details", ["validation_status", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index("idx_bank_details_validation_status", "bank_details")
+    for column in reversed(COLUMNS):
+        op.drop_column("bank_details", column.name)
@@ -0,0 +1,43 @@
+"""Outbox table for domain events
+
+Revision ID: 0004_outbox_events
+Revises: 0003_bank_validation_queue
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table, create_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_outbox_events"
+down_revision: Union[str, Sequence[str], None] = "0003_bank_validation_queue"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("outbox_events"):
+        op.create_table(
+            "outbox_events",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("event_type", sa.String(50), nullable=False),
+            sa.Column("user_id", sa.Integer, nullable=True),
+            sa.Column("payload", sa.JSON, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=True),
+            sa.Column("dispatched_at", sa.DateTime, nullable=True),
+            sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("next_attempt_at", sa.DateTime, nullable=True),
+            sa.Column("last_error", sa.String(500), nullable=True),
+        )
+
+    # Dispatcher: WHERE dispatched_at IS NULL ORDER BY id
+    create_index("idx_outbox_events_dispatched", "outbox_events", ["dispatched_at", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("outbox_events")
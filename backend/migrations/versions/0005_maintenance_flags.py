@@ -0,0 +1,34 @@
+"""Maintenance flags (resharding write freeze)
+
+Revision ID: 0005_maintenance_flags
+Revises: 0004_outbox_events
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_maintenance_flags"
+down_revision: Union[str, Sequence[str], None] = "0004_outbox_events"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("maintenance_flags"):
+        op.create_table(
+            "maintenance_flags",
+            sa.Column("name", sa.String(50), primary_key=True),
+            sa.Column("enabled", sa.Boolean, nullable=False, server_default=sa.false()),
+            sa.Column("updated_at", sa.DateTime, nullable=True),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("maintenance_flags")
@@ -0,0 +1,29 @@
+"""Ledger ids above the watermark already in a leaderboard checkpoint
+
+Revision ID: 0006_leaderboard_recent_entries
+Revises: 0005_maintenance_flags
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import get_columns
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_leaderboard_recent_entries"
+down_revision: Union[str, Sequence[str], None] = "0005_maintenance_flags"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if "recent_entry_ids" not in get_columns("leaderboard_checkpoints"):
+        op.add_column("leaderboard_checkpoints", sa.Column("recent_entry_ids", sa.JSON, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("leaderboard_checkpoints", "recent_entry_ids")
@@ -0,0 +1,42 @@
+"""Product code and brand on cart lines and order items
+
+Revision ID: 0007_order_item_product_fields
+Revises: 0006_leaderboard_recent_entries
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import get_columns
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_order_item_product_fields"
+down_revision: Union[str, Sequence[str], None] = "0006_leaderboard_recent_entries"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = {
+    "carts": [sa.Column("product_code", sa.String(50), nullable=True)],
+    "order_items": [
+        sa.Column("product_code", sa.String(50), nullable=True),
+        sa.Column("brand", sa.String(100), nullable=True),
+    ],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, columns in COLUMNS.items():
+        existing = get_columns(table)
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column.copy())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in COLUMNS.items():
+        for column in reversed(columns):
+            op.drop_column(table, column.name)
@@ -0,0 +1,29 @@
+"""Per-subscriber delivery record on outbox events
+
+Revision ID: 0008_outbox_delivered_to
+Revises: 0007_order_item_product_fields
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import get_columns
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_outbox_delivered_to"
+down_revision: Union[str, Sequence[str], None] = "0007_order_item_product_fields"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if "delivered_to" not in get_columns("outbox_events"):
+        op.add_column("outbox_events", sa.Column("delivered_to", sa.JSON, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("outbox_events", "delivered_to")
@@ -0,0 +1,34 @@
+"""Counters (last allocated HAM code number)
+
+Revision ID: 0009_counters
+Revises: 0008_outbox_delivered_to
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_counters"
+down_revision: Union[str, Sequence[str], None] = "0008_outbox_delivered_to"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The "ham_code" row is seeded from the existing users on first allocation
+    if not has_table("counters"):
+        op.create_table(
+            "counters",
+            sa.Column("name", sa.String(50), primary_key=True),
+            sa.Column("value", sa.Integer, nullable=False, server_default="0"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("counters")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Text, UniqueConstraint, Index, JSON
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime
@@ -22,7 +22,8 @@ class User(Base):
     otp_verified = Column(Boolean, default=False)
     
     # Profile fields
-    profile_picture = Column(Text(length=2**32-1), nullable=True)
+    # Base64 images are deferred (group "images"): only queries that undefer them read the bytes
+    profile_picture = deferred(Column(Text(length=2**32-1), nullable=True), group="images")
     ham_code = Column(String(20), unique=True, nullable=True)
     be_name = Column(String(100), nullable=True)
     outlet_name = Column(String(100), nullable=True)  # ✅ NEW
@@ -40,6 +41,24 @@ class User(Base):
     address = Column(Text, nullable=True)
     pincode = Column(String(10), nullable=True)
 
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Bumped on every profile write; drives the profile ETag
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+
+    # KYC (materialized, maintained by complete_kyc / delete_document)
+    kyc_status = Column(String(20), default="PENDING", server_default="PENDING")
+    kyc_doc_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+    __table_args__ = (
+        # Covers the KYC dashboard summary GROUP BY
+        Index('idx_users_kyc_location', 'region', 'state', 'city', 'kyc_status'),
+        # Admin KYC listing filters (keyset on id)
+        Index('idx_users_kyc_status_id', 'kyc_status', 'id'),
+        Index('idx_users_distributor_id', 'distributor_name', 'id'),
+        Index('idx_users_created_at', 'created_at'),
+    )
+
     # Relationships
     cart_items = relationship("Cart", back_populates="user", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="user", cascade="all, delete-orphan")
@@ -82,19 +101,29 @@ class Bank(Base):
     bank_name = Column(String(255))
     account_number = Column(String(50))
     ifsc = Column(String(11))
-    cheque_image = Column(LONGTEXT)
+    cheque_image = deferred(Column(LONGTEXT), group="images")
 
     # UPI fields
     upi_id = Column(String(255))
-    upi_qr_code = Column(LONGTEXT)
+    upi_qr_code = deferred(Column(LONGTEXT), group="images")
 
-    # Validation
+    # Validation (bank_validation workers: PENDING -> PROCESSING -> VALIDATED / FAILED)
     is_validated = Column(Boolean, default=False)
     validation_status = Column(String(20), default="PENDING")
+    validation_reason = Column(String(500), nullable=True)
+    validation_claimed_at = Column(DateTime, nullable=True)
+    validation_attempts = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # One payment-details row per user
+        UniqueConstraint('user_id', name='uq_bank_details_user_id'),
+        # Workers claim PENDING rows in id order
+        Index('idx_bank_details_validation_status', 'validation_status', 'id'),
+    )
+
 
 
 
@@ -111,6 +140,48 @@ class Wallet(Base):
     redeemed = Column(Integer, default=0)
 
 
+# =======================
+# WALLET LEDGER (APPEND-ONLY)
+# =======================
+class WalletLedger(Base):
+    __tablename__ = "wallet_ledger"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # Per-user sequence number, 1, 2, 3 ... (gap-free)
+    seq = Column(Integer, nullable=False)
+    entry_type = Column(String(30), nullable=False)
+    points_delta = Column(Integer, nullable=False, default=0)
+    redeemed_delta = Column(Integer, nullable=False, default=0)
+    reference = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now())
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'seq', name='unique_user_ledger_seq'),
+    )
+
+
+# =======================
+# WALLET SNAPSHOT (RUNNING BALANCE EVERY N ENTRIES)
+# =======================
+class WalletSnapshot(Base):
+    __tablename__ = "wallet_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # Balance after applying every ledger entry up to and including this seq
+    seq = Column(Integer, nullable=False)
+    points = Column(Integer, nullable=False)
+    redeemed = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now())
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'seq', name='unique_user_snapshot_seq'),
+    )
+
+
 # =======================
 # TRANSACTION
 # =======================
@@ -135,6 +206,10 @@ class Transaction(Base):
     description = Column(Text, nullable=True)
     status = Column(String(20), default="COMPLETED")
     created_at = Column(DateTime, default=lambda: datetime.now())
+
+    __table_args__ = (
+        Index('idx_transactions_user_created', 'user_id', 'created_at'),
+    )
     
     user = relationship("User")
 
@@ -154,8 +229,13 @@ class Cart(Base):
     quantity = Column(Integer, default=1)
     category = Column(String(100))
     description = Column(Text, nullable=True)  # ✅ ADD THIS LINE
+    product_code = Column(String(50), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now())
 
+    __table_args__ = (
+        UniqueConstraint('user_id', 'product_name', name='uq_carts_user_product'),
+    )
+
     user = relationship("User", back_populates="cart_items")
 
 
@@ -175,6 +255,10 @@ class Order(Base):
     transaction_type = Column(String(20), default="PRODUCT")
     created_at = Column(DateTime, default=lambda: datetime.now())
 
+    __table_args__ = (
+        Index('idx_orders_user_created', 'user_id', 'created_at'),
+    )
+
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
@@ -188,9 +272,129 @@ class OrderItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(String(50), ForeignKey("orders.order_id"), nullable=False, index=True)
     product_name = Column(String(255), nullable=False)
-    product_image = Column(Text, nullable=True)
+    product_image = deferred(Column(Text, nullable=True), group="images")
     points = Column(Integer, nullable=False)
     quantity = Column(Integer, default=1)
     category = Column(String(100), nullable=True)
+    product_code = Column(String(50), nullable=True)
+    brand = Column(String(100), nullable=True)
+
+    order = relationship("Order", back_populates="items")
+
+
+# =======================
+# PERFORMANCE ROLLUPS (DAILY / MONTHLY)
+# =======================
+class PerformanceRollup(Base):
+    __tablename__ = "performance_rollups"
+
+    id = Column(Integer, primary_key=True)
+
+    # USER (key = user id), DISTRIBUTOR (key = distributor_name), REGION (key = region)
+    scope = Column(String(20), nullable=False)
+    scope_key = Column(String(100), nullable=False)
+    # D = daily, M = monthly (period_start is the 1st of the month)
+    period_type = Column(String(1), nullable=False)
+    period_start = Column(Date, nullable=False)
+
+    points_earned = Column(Integer, nullable=False, default=0)
+    points_redeemed = Column(Integer, nullable=False, default=0)
+    orders_count = Column(Integer, nullable=False, default=0)
+    transfers_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('scope', 'scope_key', 'period_type', 'period_start', name='unique_rollup_period'),
+    )
+
+
+
+# =======================
+# LEADERBOARD CHECKPOINT (FAST STARTUP)
+# =======================
+class LeaderboardCheckpoint(Base):
+    __tablename__ = "leaderboard_checkpoints"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, nullable=False)
+
+    slab = Column(String(50), nullable=True)
+    region = Column(String(50), nullable=True)
+    target = Column(Integer, nullable=True)
+    redeemed = Column(Integer, nullable=False, default=0)
+    earned_ytd = Column(Integer, nullable=False, default=0)
+
+    # Highest wallet_ledger.id applied to this user / to the whole engine at save time
+    last_entry_id = Column(Integer, nullable=False, default=0)
+    ledger_watermark = Column(Integer, nullable=False, default=0)
+    # Ids above ledger_watermark already included (they may sit between ids that commit later)
+    recent_entry_ids = Column(JSON, nullable=True)
+    updated_at = Column(DateTime, default=lambda: datetime.now(), onupdate=lambda: datetime.now())
+
+
+# =======================
+# POINTS ACCRUAL BATCH (BULK FILE IMPORT)
+# =======================
+class AccrualBatch(Base):
+    __tablename__ = "accrual_batches"
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String(255), nullable=False)
+    # sha256 of the uploaded file - the same file can't be credited twice
+    checksum = Column(String(64), unique=True, nullable=False)
+
+    status = Column(String(20), default="RUNNING")
+    rows_total = Column(Integer, default=0)
+    rows_accepted = Column(Integer, default=0)
+    rows_rejected = Column(Integer, default=0)
+    points_credited = Column(Integer, default=0)
+
+    started_at = Column(DateTime, default=lambda: datetime.now())
+    finished_at = Column(DateTime, nullable=True)
+
+
+# =======================
+# OUTBOX (DOMAIN EVENTS, see outbox.py)
+# =======================
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    # Written in the same transaction as the change it describes
+    event_type = Column(String(50), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now())
+
+    # Delivery: NULL until every subscriber has handled it
+    dispatched_at = Column(DateTime, nullable=True)
+    # Subscribers that already handled it; retries skip them
+    delivered_to = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(String(500), nullable=True)
+
+    __table_args__ = (
+        # The dispatcher reads WHERE dispatched_at IS NULL ORDER BY id
+        Index('idx_outbox_events_dispatched', 'dispatched_at', 'id'),
+    )
+
+
+# =======================
+# MAINTENANCE FLAGS (e.g. the resharding write freeze, see database.writes_frozen)
+# =======================
+class MaintenanceFlag(Base):
+    __tablename__ = "maintenance_flags"
+
+    name = Column(String(50), primary_key=True)
+    enabled = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(), onupdate=lambda: datetime.now())
+
+
+# =======================
+# COUNTERS (e.g. the last HAM code number, see onboarding.allocate_ham_numbers)
+# =======================
+class Counter(Base):
+    __tablename__ = "counters"
 
-    order = relationship("Order", back_populates="items")
\ No newline at end of file
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
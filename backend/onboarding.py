@@ -0,0 +1,282 @@
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import User, Wallet, WalletLedger, Counter
+from ledger import OPENING_POINTS
+from file_rows import iter_file_rows
+from database import group_by_shard
+from datetime import datetime
+import json
+import os
+import re
+import time
+
+CHUNK_SIZE = int(os.getenv("ONBOARDING_CHUNK_SIZE", "2000"))
+
+PROFILE_COLUMNS = (
+    "full_name", "email", "be_name", "outlet_name", "member_type", "slab",
+    "distributor_name", "region", "state", "city", "address"
+)
+
+PHONE_RE = re.compile(r"[6-9]\d{9}")
+PINCODE_RE = re.compile(r"[1-9]\d{5}")
+
+
+# ============================================================
+# HAM CODES
+# ============================================================
+HAM_COUNTER = "ham_code"
+HAM_CODE_RE = re.compile(r"HAM(\d+)")
+
+
+def _highest_ham_number(db: Session) -> int:
+    """Highest HAMnnnnnn code in users - one scan, only to seed the counter"""
+    last = db.query(User.ham_code).filter(
+        User.ham_code.like("HAM%")
+    ).order_by(func.length(User.ham_code).desc(), User.ham_code.desc()).limit(1).scalar()
+
+    if not last:
+        return 0
+    match = HAM_CODE_RE.fullmatch(last)
+    if not match:
+        raise ValueError(f"Cannot seed HAM counter from code {last!r}")
+    return int(match.group(1))
+
+
+def allocate_ham_numbers(db: Session, count: int = 1) -> int:
+    """
+    Reserve `count` consecutive HAM numbers and return the first.
+    The counter row stays locked until the caller commits, so concurrent signups and
+    imports get distinct blocks; a rollback gives the numbers back.
+    """
+    while True:
+        result = db.execute(
+            update(Counter).where(Counter.name == HAM_COUNTER).values(value=Counter.value + count)
+        )
+        if result.rowcount:
+            value = db.query(Counter.value).filter(Counter.name == HAM_COUNTER).scalar()
+            return value - count + 1
+
+        # First allocation on this database: start after the codes already handed out
+        highest = _highest_ham_number(db)
+        try:
+            with db.begin_nested():
+                db.add(Counter(name=HAM_COUNTER, value=highest + count))
+            return highest + 1
+        except IntegrityError:
+            # Another process seeded it first; take a block from its row
+            continue
+
+
+def format_ham_code(number: int) -> str:
+    return f"HAM{number:06d}"
+
+
+# ============================================================
+# BATCH VALIDATION
+# ============================================================
+def _digits(value) -> str:
+    text = re.sub(r"[\s\-()]", "", str(value or ""))
+    # Excel stores numeric cells as floats
+    return text[:-2] if text.endswith(".0") else text
+
+
+def normalize_phone(value) -> str:
+    phone = _digits(value)
+    if phone.startswith("+91"):
+        phone = phone[3:]
+    elif len(phone) == 12 and phone.startswith("91"):
+        phone = phone[2:]
+    elif len(phone) == 11 and phone.startswith("0"):
+        phone = phone[1:]
+    return phone
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _validate_chunk(db: Session, rows: list, seen_phones: set):
+    """
+    Validate a chunk column by column.
+    Phones are checked against each other and against users in one IN query.
+    Returns (valid records, errors).
+    """
+    phones = [normalize_phone(row.get("phone")) for _, row in rows]
+    pincodes = [_digits(row.get("pincode")) for _, row in rows]
+
+    existing = {
+        phone for (phone,) in db.query(User.phone).filter(
+            User.phone.in_([p for p in phones if PHONE_RE.fullmatch(p)])
+        )
+    }
+
+    records, errors = [], []
+    for (row_number, row), phone, pincode in zip(rows, phones, pincodes):
+        record = {name: _clean(row.get(name)) for name in PROFILE_COLUMNS}
+
+        if not PHONE_RE.fullmatch(phone):
+            error = "Invalid phone number"
+        elif phone in seen_phones:
+            error = "Duplicate phone in file"
+        elif phone in existing:
+            error = "Phone already registered"
+        elif not record["full_name"]:
+            error = "full_name missing"
+        elif pincode and not PINCODE_RE.fullmatch(pincode):
+            error = "Invalid pincode"
+        elif record["email"] and "@" not in record["email"]:
+            error = "Invalid email"
+        else:
+            error = None
+
+        target = _clean(row.get("target"))
+        if not error and target:
+            try:
+                record["target"] = int(float(target.replace(",", "")))
+            except ValueError:
+                error = "Invalid target"
+
+        if error:
+            errors.append({"row": row_number, "phone": row.get("phone"), "error": error})
+            continue
+
+        seen_phones.add(phone)
+        record.update(
+            phone=phone,
+            pincode=pincode or None,
+            target=record.get("target"),
+            otp_verified=False,
+            kyc_status="PENDING",
+            kyc_doc_count=0
+        )
+        records.append((row_number, record))
+
+    return records, errors
+
+
+# ============================================================
+# CHUNKED BULK WRITE
+# ============================================================
+def _insert_chunk(db: Session, records: list) -> tuple:
+    """
+    Users, wallets and opening ledger entries for one chunk - one commit.
+    HAM codes are a contiguous block reserved from the counter.
+    Returns (first HAM number, last HAM number).
+    """
+    first = allocate_ham_numbers(db, len(records))
+    users = []
+    for offset, (_, record) in enumerate(records):
+        users.append({**record, "ham_code": format_ham_code(first + offset)})
+
+    db.execute(User.__table__.insert(), users)
+
+    ids = db.query(User.id).filter(
+        User.ham_code.in_([user["ham_code"] for user in users])
+    ).all()
+    user_ids = [user_id for (user_id,) in ids]
+
+    now = datetime.now()
+    # Wallets live on each user's shard
+    for shard, shard_user_ids in group_by_shard(user_ids).items():
+        db.info["shard"] = shard
+        db.execute(Wallet.__table__.insert(), [
+            {"user_id": user_id, "points": OPENING_POINTS, "redeemed": 0}
+            for user_id in shard_user_ids
+        ])
+        db.execute(WalletLedger.__table__.insert(), [
+            {
+                "user_id": user_id, "seq": 1, "entry_type": "OPENING_BALANCE",
+                "points_delta": OPENING_POINTS, "redeemed_delta": 0,
+                "reference": None, "created_at": now
+            }
+            for user_id in shard_user_ids
+        ])
+
+    db.commit()
+    return first, first + len(records) - 1
+
+
+def import_users(db: Session, fileobj, filename: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Stream a CSV/XLSX file of users and create them with their wallets.
+    Columns: phone, full_name, plus any of the profile fields and pincode / target.
+    Each chunk commits on its own; rejected rows are listed in the report.
+    """
+    started = time.perf_counter()
+    rows = iter_file_rows(fileobj, filename)
+
+    seen_phones = set()
+    errors = []
+    ham_ranges = []
+    rows_total = rows_created = 0
+    chunk = []
+
+    def flush(chunk):
+        records, chunk_errors = _validate_chunk(db, chunk, seen_phones)
+        errors.extend(chunk_errors)
+        if not records:
+            return 0
+
+        # A code set by hand above the counter can still collide; retry once with a fresh block
+        for attempt in range(2):
+            try:
+                first, last = _insert_chunk(db, records)
+                ham_ranges.append([format_ham_code(first), format_ham_code(last)])
+                return len(records)
+            except IntegrityError as e:
+                db.rollback()
+                print(f"⚠️ User import chunk conflict (attempt {attempt + 1}): {e.orig}")
+
+        errors.extend(
+            {"row": row_number, "phone": record["phone"], "error": "Could not be saved, please retry"}
+            for row_number, record in records
+        )
+        return 0
+
+    # Row 1 is the header
+    for row_number, row in enumerate(rows, start=2):
+        rows_total += 1
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            rows_created += flush(chunk)
+            chunk = []
+
+    if chunk:
+        rows_created += flush(chunk)
+
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows_total": rows_total,
+        "rows_created": rows_created,
+        "rows_rejected": rows_total - rows_created,
+        "ham_code_ranges": ham_ranges,
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round(rows_total / elapsed) if elapsed else rows_total,
+        "errors": sorted(errors, key=lambda e: e["row"])
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    from database import SessionLocal
+
+    if len(sys.argv) != 2:
+        print("Usage: python onboarding.py <users.csv|users.xlsx>")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            report = import_users(db, f, os.path.basename(path))
+        errors = report.pop("errors")
+        print(json.dumps(report, indent=2))
+        for error in errors[:50]:
+            print(f"   row {error['row']}: {error['error']}")
+    finally:
+        db.close()
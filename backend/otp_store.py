@@ -0,0 +1,157 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+# =====================================
+# OTP CONFIG (FROM ENVIRONMENT VARIABLES)
+# =====================================
+
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "300"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+
+# Token bucket per phone: OTP_SEND_BURST sends, refilled at one every OTP_SEND_REFILL_SECONDS
+OTP_SEND_BURST = int(os.getenv("OTP_SEND_BURST", "3"))
+OTP_SEND_REFILL_SECONDS = float(os.getenv("OTP_SEND_REFILL_SECONDS", "60"))
+
+# Used to hash OTPs at rest. A random per-process key is fine for the in-memory backend;
+# set OTP_SECRET explicitly when several processes share OTP_REDIS_URL
+OTP_SECRET = os.getenv("OTP_SECRET") or secrets.token_hex(32)
+
+# Shared backend for multi-instance deployments, e.g. redis://localhost:6379/0
+OTP_REDIS_URL = os.getenv("OTP_REDIS_URL")
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+class MemoryBackend:
+    """Process-local TTL key/value store. Also the local stand-in for the shared backend."""
+
+    def __init__(self, sweep_every: int = 1000):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._writes = 0
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: dict, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._writes += 1
+            if self._writes % self._sweep_every == 0:
+                self._sweep()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _sweep(self):
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+
+
+class RedisBackend:
+    """Shared TTL store so every worker/instance sees the same OTPs and rate limits"""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed when OTP_REDIS_URL is set
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        raw = self._client.get(key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: dict, ttl: float):
+        self._client.set(key, json.dumps(value), px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+
+def _default_backend():
+    if OTP_REDIS_URL:
+        try:
+            return RedisBackend(OTP_REDIS_URL)
+        except ImportError:
+            print("⚠️ OTP_REDIS_URL set but redis is not installed - using in-memory OTP store")
+    return MemoryBackend()
+
+
+# ============================================================
+# OTP STORE
+# ============================================================
+class OTPStore:
+    """Issues, rate-limits and verifies OTPs without touching the database"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or _default_backend()
+
+    @staticmethod
+    def _hash(phone: str, otp: str) -> str:
+        return hmac.new(OTP_SECRET.encode(), f"{phone}:{otp}".encode(), hashlib.sha256).hexdigest()
+
+    def _take_send_token(self, phone: str) -> bool:
+        key = f"otp:bucket:{phone}"
+        now = time.time()
+        bucket = self.backend.get(key) or {"tokens": OTP_SEND_BURST, "updated_at": now}
+
+        refilled = (now - bucket["updated_at"]) / OTP_SEND_REFILL_SECONDS
+        tokens = min(OTP_SEND_BURST, bucket["tokens"] + refilled)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        # Bucket expires once it would be full again anyway
+        ttl = (OTP_SEND_BURST - tokens) * OTP_SEND_REFILL_SECONDS + 1
+        self.backend.set(key, {"tokens": tokens, "updated_at": now}, ttl)
+        return allowed
+
+    def issue(self, phone: str):
+        """Returns a new 6-digit OTP, or None when the phone is rate limited"""
+        if not self._take_send_token(phone):
+            return None
+
+        otp = f"{secrets.randbelow(900000) + 100000}"
+        self.backend.set(
+            f"otp:code:{phone}",
+            {"hash": self._hash(phone, otp), "attempts": 0, "expires_at": time.time() + OTP_TTL_SECONDS},
+            OTP_TTL_SECONDS
+        )
+        return otp
+
+    def verify(self, phone: str, otp: str) -> bool:
+        key = f"otp:code:{phone}"
+        entry = self.backend.get(key)
+        if not entry:
+            return False
+
+        if hmac.compare_digest(entry["hash"], self._hash(phone, otp or "")):
+            self.backend.delete(key)
+            return True
+
+        entry["attempts"] += 1
+        remaining = entry["expires_at"] - time.time()
+        if entry["attempts"] >= OTP_MAX_ATTEMPTS or remaining <= 0:
+            self.backend.delete(key)
+        else:
+            self.backend.set(key, entry, remaining)
+        return False
+
+
+otp_store = OTPStore()
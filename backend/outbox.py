@@ -0,0 +1,207 @@
+"""
+Domain events through a transactional outbox.
+
+Write paths call publish(db, ...) before their commit: the event row is stored on the user's
+shard in the same transaction as the change, so an event exists if and only if the change
+does. A dispatcher thread per app process then relays stored events in batches to the
+in-process subscribers registered with @subscribe, and marks them dispatched.
+
+Delivery is at least once: a batch that fails (or a process that dies) mid-way is delivered
+again, so subscribers must be idempotent. Subscribers run in whichever process dispatched the
+event - they should act on shared state (DB, external services), not on per-process caches.
+A failing subscriber gets the event again after a backoff, up to OUTBOX_MAX_ATTEMPTS times;
+subscribers that already handled it are recorded on the row (delivered_to) and not called
+again, and the other events of the batch are not held back.
+
+Events: order.placed, wallet.transferred, kyc.submitted, user.profile_updated.
+"""
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import event, or_
+from database import RoutingSession, SessionLocal, shard_engines
+from models import OutboxEvent
+import os
+import threading
+import time
+
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("OUTBOX_DISPATCH_INTERVAL", "1"))
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH", "100"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+RETRY_SECONDS = int(os.getenv("OUTBOX_RETRY_SECONDS", "30"))
+# Dispatched events are deleted after this many days (0 keeps them)
+RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+LOG_EVENTS = os.getenv("OUTBOX_LOG_EVENTS", "0") == "1"
+
+
+class DomainEvent(NamedTuple):
+    """What subscribers receive: a plain copy of the outbox row, no session attached"""
+    id: int
+    event_type: str
+    user_id: Optional[int]
+    payload: dict
+    created_at: datetime
+
+
+# ============================================================
+# PUBLISH
+# ============================================================
+def publish(db, event_type: str, user_id: int = None, **payload) -> OutboxEvent:
+    """Add an event to the caller's transaction; it is dispatched once the caller commits"""
+    row = OutboxEvent(event_type=event_type, user_id=user_id, payload=payload)
+    db.add(row)
+    db.info["outbox_published"] = True
+    return row
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _wake_on_commit(session):
+    if session.info.pop("outbox_published", False):
+        _wake.set()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("outbox_published", None)
+
+
+# ============================================================
+# SUBSCRIBERS
+# ============================================================
+# event type ("*" = every event) -> [(name, handler)]
+SUBSCRIBERS = {}
+
+
+def subscribe(event_type: str, name: str = None):
+    """Decorator: handler(event: DomainEvent) is called for every event of this type"""
+    def register(handler):
+        SUBSCRIBERS.setdefault(event_type, []).append((name or handler.__name__, handler))
+        return handler
+    return register
+
+
+def deliver(domain_event: DomainEvent, skip=()) -> tuple:
+    """
+    Call every subscriber of the event except those named in `skip`.
+    Returns (names that handled it, failures as "name: error" strings).
+    """
+    delivered, errors = [], []
+    for name, handler in SUBSCRIBERS.get(domain_event.event_type, []) + SUBSCRIBERS.get("*", []):
+        if name in skip:
+            continue
+        try:
+            handler(domain_event)
+            delivered.append(name)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    return delivered, errors
+
+
+if LOG_EVENTS:
+    @subscribe("*", name="log")
+    def _log_event(domain_event: DomainEvent):
+        print(f"📣 {domain_event.event_type} user={domain_event.user_id} {domain_event.payload}")
+
+
+# ============================================================
+# DISPATCH
+# ============================================================
+def dispatch_batch(db, limit: int = BATCH_SIZE) -> int:
+    """
+    Deliver up to `limit` due events of this session's shard, in id order.
+    Rows stay locked (SKIP LOCKED for other dispatchers) until the batch is marked and committed.
+    """
+    now = datetime.now()
+    rows = db.query(OutboxEvent).filter(
+        OutboxEvent.dispatched_at.is_(None),
+        OutboxEvent.attempts < MAX_ATTEMPTS,
+        or_(OutboxEvent.next_attempt_at.is_(None), OutboxEvent.next_attempt_at <= now)
+    ).order_by(OutboxEvent.id).limit(limit).with_for_update(skip_locked=True).all()
+
+    for row in rows:
+        done = row.delivered_to or []
+        delivered, errors = deliver(
+            DomainEvent(row.id, row.event_type, row.user_id, row.payload or {}, row.created_at), set(done)
+        )
+        if delivered:
+            row.delivered_to = done + delivered
+        if errors:
+            row.attempts = (row.attempts or 0) + 1
+            row.next_attempt_at = now + timedelta(seconds=RETRY_SECONDS * 2 ** (row.attempts - 1))
+            row.last_error = "; ".join(errors)[:500]
+            print(f"⚠️ Outbox event {row.id} {row.event_type} (attempt {row.attempts}): {row.last_error}")
+        else:
+            row.dispatched_at = now
+
+    db.commit()
+    return len(rows)
+
+
+def purge_dispatched(db, days: int = RETENTION_DAYS) -> int:
+    if days <= 0:
+        return 0
+    deleted = db.query(OutboxEvent).filter(
+        OutboxEvent.dispatched_at < datetime.now() - timedelta(days=days)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def _on_shard(shard: str, fn, *args):
+    db = SessionLocal()
+    db.info["shard"] = shard
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def dispatch_pending() -> int:
+    """One batch per shard; returns the events handled"""
+    return sum(_on_shard(shard, dispatch_batch) for shard in shard_engines)
+
+
+# ============================================================
+# DISPATCHER THREAD
+# ============================================================
+_wake = threading.Event()
+_dispatcher_stop = threading.Event()
+
+
+def _dispatcher_loop(interval: float):
+    last_purge = 0.0
+    while not _dispatcher_stop.is_set():
+        try:
+            handled = dispatch_pending()
+            if time.monotonic() - last_purge > 3600:
+                last_purge = time.monotonic()
+                for shard in shard_engines:
+                    _on_shard(shard, purge_dispatched)
+        except Exception as e:
+            print(f"❌ Outbox dispatcher error: {e}")
+            handled = 0
+
+        if not handled:
+            # Idle: next poll, or right after a commit that published something
+            _wake.wait(interval)
+            _wake.clear()
+
+
+def start_dispatcher():
+    """Start the dispatcher thread (OUTBOX_DISPATCH_INTERVAL=0 disables it)"""
+    if DISPATCH_INTERVAL_SECONDS <= 0:
+        return None
+
+    _dispatcher_stop.clear()
+    thread = threading.Thread(
+        target=_dispatcher_loop,
+        args=(DISPATCH_INTERVAL_SECONDS,),
+        name="outbox-dispatcher",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_dispatcher():
+    _dispatcher_stop.set()
+    _wake.set()
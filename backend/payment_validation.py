@@ -0,0 +1,221 @@
+"""
+Local checks for payout details: IFSC against an RBI index, UPI handles against a PSP whitelist,
+account-number shape. They take microseconds, so they run before (and instead of) cheque OCR.
+
+IFSC index source (IFSC_MASTER_PATH, CSV or XLSX):
+- the RBI IFSC master (bank / ifsc / branch / city / state columns): every branch is known and an
+  IFSC that is not in it is rejected;
+- a bank-code list (bank_code / bank columns, the bundled data/ifsc_banks.csv): IFSCs resolve to
+  the bank only, and bank codes that are not listed pass on format alone.
+"""
+from file_rows import iter_file_rows
+from typing import NamedTuple, Optional
+import os
+import re
+import sys
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+IFSC_MASTER_PATH = os.getenv("IFSC_MASTER_PATH", os.path.join(DATA_DIR, "ifsc_banks.csv"))
+UPI_HANDLES_PATH = os.getenv("UPI_HANDLES_PATH", os.path.join(DATA_DIR, "upi_handles.txt"))
+UPI_EXTRA_HANDLES = os.getenv("UPI_EXTRA_HANDLES", "")
+
+ACCOUNT_MIN_DIGITS = int(os.getenv("ACCOUNT_MIN_DIGITS", "9"))
+ACCOUNT_MAX_DIGITS = int(os.getenv("ACCOUNT_MAX_DIGITS", "18"))
+
+# 4-letter bank code, a 0, 6-character branch code
+IFSC_PATTERN = re.compile(r"^[A-Z]{4}0[A-Z0-9]{6}$")
+UPI_PATTERN = re.compile(r"^[\w\.\-]+@([\w]+)$")
+
+
+# ============================================================
+# IFSC INDEX
+# ============================================================
+class IfscInfo(NamedTuple):
+    ifsc: str
+    bank: str
+    branch: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+
+
+class IfscIndex:
+    """
+    Two levels keyed by the IFSC itself: bank code (first 4) -> bank name, and
+    bank code -> {branch code (last 6): (branch, city, state)}. Cities and states are interned.
+    """
+
+    def __init__(self):
+        self.banks = {}
+        self.branches = {}
+        self.branch_count = 0
+
+    @property
+    def has_branches(self) -> bool:
+        return self.branch_count > 0
+
+    def add_bank(self, code: str, name: str):
+        self.banks.setdefault(code, name)
+
+    def add_branch(self, ifsc: str, bank: str, branch: str, city: str, state: str):
+        code = ifsc[:4]
+        self.add_bank(code, bank)
+        branches = self.branches.setdefault(code, {})
+        if ifsc[5:] not in branches:
+            self.branch_count += 1
+        branches[ifsc[5:]] = (branch or None, sys.intern(city) if city else None, sys.intern(state) if state else None)
+
+    def lookup(self, ifsc: str) -> Optional[IfscInfo]:
+        """None when the bank is unknown, or its branches are known and this is not one of them"""
+        code = ifsc[:4]
+        bank = self.banks.get(code)
+        if bank is None:
+            return None
+        branches = self.branches.get(code)
+        if branches is None:
+            return IfscInfo(ifsc, bank)
+        row = branches.get(ifsc[5:])
+        return IfscInfo(ifsc, bank, *row) if row else None
+
+
+def _cell(row: dict, *names) -> str:
+    for name in names:
+        value = row.get(name)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return ""
+
+
+def load_ifsc_index(path: str) -> IfscIndex:
+    index = IfscIndex()
+    with open(path, "rb") as f:
+        for row in iter_file_rows(f, path):
+            bank = _cell(row, "bank", "bank_name")
+            ifsc = _cell(row, "ifsc", "ifsc_code").upper()
+            if not bank:
+                continue
+            if ifsc:
+                if IFSC_PATTERN.match(ifsc):
+                    index.add_branch(
+                        ifsc, bank, _cell(row, "branch"),
+                        _cell(row, "city", "centre", "district"), _cell(row, "state")
+                    )
+            else:
+                code = _cell(row, "bank_code").upper()
+                if len(code) == 4:
+                    index.add_bank(code, bank)
+    return index
+
+
+def load_upi_handles(path: str, extra: str = "") -> frozenset:
+    handles = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip().lower()
+            if line:
+                handles.add(line)
+    handles.update(h.strip().lower() for h in extra.split(",") if h.strip())
+    return frozenset(handles)
+
+
+# ============================================================
+# REFERENCE DATA (ONCE PER PROCESS)
+# ============================================================
+_ifsc_index = None
+_upi_handles = None
+_load_lock = threading.Lock()
+
+
+def load_reference_data():
+    """Build the IFSC index and UPI handle set; called from the app lifespan, safe to call again"""
+    global _ifsc_index, _upi_handles
+    with _load_lock:
+        if _ifsc_index is None:
+            _ifsc_index = load_ifsc_index(IFSC_MASTER_PATH)
+            print(f"🏦 IFSC index: {len(_ifsc_index.banks)} banks, {_ifsc_index.branch_count} branches")
+        if _upi_handles is None:
+            _upi_handles = load_upi_handles(UPI_HANDLES_PATH, UPI_EXTRA_HANDLES)
+
+
+def ifsc_index() -> IfscIndex:
+    if _ifsc_index is None:
+        load_reference_data()
+    return _ifsc_index
+
+
+def upi_handles() -> frozenset:
+    if _upi_handles is None:
+        load_reference_data()
+    return _upi_handles
+
+
+# ============================================================
+# CHECKS
+# ============================================================
+def lookup_ifsc(ifsc: str) -> Optional[IfscInfo]:
+    value = (ifsc or "").strip().upper()
+    if not IFSC_PATTERN.match(value):
+        return None
+    return ifsc_index().lookup(value)
+
+
+def check_ifsc(ifsc: str) -> dict:
+    value = (ifsc or "").strip().upper()
+    if not IFSC_PATTERN.match(value):
+        return {"is_valid": False, "reason": "Invalid IFSC format", "bank": None, "branch": None}
+
+    index = ifsc_index()
+    info = index.lookup(value)
+    if info is None and (index.has_branches or value[:4] in index.banks):
+        return {"is_valid": False, "reason": "IFSC not found", "bank": None, "branch": None}
+
+    return {
+        "is_valid": True,
+        "reason": "",
+        "bank": info.bank if info else None,
+        "branch": info.branch if info else None
+    }
+
+
+def check_account_number(account_number: str) -> dict:
+    digits = re.sub(r"[\s\-]", "", account_number or "")
+    if not digits.isdigit():
+        reason = "Account number must contain digits only"
+    elif not ACCOUNT_MIN_DIGITS <= len(digits) <= ACCOUNT_MAX_DIGITS:
+        reason = f"Account number must be {ACCOUNT_MIN_DIGITS}-{ACCOUNT_MAX_DIGITS} digits"
+    elif len(set(digits)) == 1:
+        reason = "Invalid account number"
+    else:
+        reason = ""
+    return {"is_valid": not reason, "reason": reason}
+
+
+def check_upi_id(upi_id: str) -> dict:
+    match = UPI_PATTERN.match((upi_id or "").strip())
+    if not match:
+        return {"is_valid": False, "reason": "Invalid UPI ID format"}
+    if match.group(1).lower() not in upi_handles():
+        return {"is_valid": False, "reason": f"Unsupported UPI handle @{match.group(1)}"}
+    return {"is_valid": True, "reason": ""}
+
+
+def check_bank_details(account_holder_name: str, account_number: str, ifsc: str) -> dict:
+    """All local checks for a bank payout; reason lists every failure, one per line"""
+    errors = []
+    if not re.search(r"[A-Za-z]", account_holder_name or ""):
+        errors.append("Invalid account holder name")
+
+    account = check_account_number(account_number)
+    if not account["is_valid"]:
+        errors.append(account["reason"])
+
+    ifsc_result = check_ifsc(ifsc)
+    if not ifsc_result["is_valid"]:
+        errors.append(ifsc_result["reason"])
+
+    return {
+        "is_valid": not errors,
+        "reason": "\n".join(errors),
+        "bank": ifsc_result["bank"],
+        "branch": ifsc_result["branch"]
+    }
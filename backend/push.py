@@ -0,0 +1,210 @@
+"""
+Push channel for wallet and order updates (Server-Sent Events, GET /api/push/stream).
+
+Write paths don't call the hub: Wallet and Order rows changed in a flush are collected on the
+session and pushed once it commits (nothing is pushed on rollback). Bulk writes that bypass the
+ORM (accrual batches) call queue_push() themselves. Messages are deltas:
+    wallet  {points, redeemed, balance, delta, entry_type, reference}
+    order   {order_id, status, total_points, transaction_type}
+
+Each open stream is one asyncio.Queue on the worker's event loop - an idle connection costs a
+queue and a suspended coroutine, no thread. A message is formatted once per commit and the same
+frame is handed to every stream of the user.
+
+With several workers a user's stream may sit in another process: set PUSH_REDIS_URL and every
+commit is relayed through Redis pub/sub to all workers. Without it, pushes reach streams in the
+same process only (single worker / development).
+"""
+from sqlalchemy import event
+from database import RoutingSession
+from models import Wallet, Order, WalletLedger
+import asyncio
+import json
+import os
+import threading
+import time
+
+PUSH_REDIS_URL = os.getenv("PUSH_REDIS_URL")
+PUSH_CHANNEL = os.getenv("PUSH_CHANNEL", "push:user-events")
+# Open streams per worker process; more get 503
+MAX_CONNECTIONS = int(os.getenv("PUSH_MAX_CONNECTIONS", "20000"))
+# Frames buffered per stream; a client that falls further behind loses the oldest
+QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "16"))
+# Comment line sent on idle streams so proxies keep them open
+KEEPALIVE_SECONDS = float(os.getenv("PUSH_KEEPALIVE_SECONDS", "25"))
+
+
+def format_frame(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+
+# ============================================================
+# HUB
+# ============================================================
+class PushHub:
+    """user_id -> open stream queues, on one event loop; publish() may be called from any thread"""
+
+    def __init__(self):
+        self._streams = {}
+        self._count = 0
+        self._loop = None
+        self._redis = None
+
+    @property
+    def connections(self) -> int:
+        return self._count
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the worker's event loop; with PUSH_REDIS_URL also start the relay listener"""
+        self._loop = loop
+        if PUSH_REDIS_URL and self._redis is None:
+            try:
+                import redis  # optional dependency, only needed when PUSH_REDIS_URL is set
+            except ImportError:
+                print("⚠️ PUSH_REDIS_URL set but redis is not installed - pushes stay in this process")
+                return
+            self._redis = redis.Redis.from_url(PUSH_REDIS_URL)
+            threading.Thread(target=self._relay_loop, name="push-relay", daemon=True).start()
+
+    def stop(self):
+        """Close every open stream (server shutdown)"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._close_all)
+
+    # -------- streams (event loop only) --------
+    def connect(self, user_id: int):
+        """New stream queue for the user, or None when the worker is full"""
+        if self._count >= MAX_CONNECTIONS:
+            return None
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._streams.setdefault(user_id, set()).add(queue)
+        self._count += 1
+        return queue
+
+    def disconnect(self, user_id: int, queue: asyncio.Queue):
+        streams = self._streams.get(user_id)
+        if streams and queue in streams:
+            streams.discard(queue)
+            self._count -= 1
+            if not streams:
+                del self._streams[user_id]
+
+    def _deliver(self, user_id: int, frames: list):
+        for queue in self._streams.get(user_id, ()):
+            for frame in frames:
+                if queue.full():
+                    # Deltas carry absolute balances: the newest one is what matters
+                    queue.get_nowait()
+                queue.put_nowait(frame)
+
+    def _close_all(self):
+        for streams in self._streams.values():
+            for queue in streams:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    # -------- publishing (any thread) --------
+    def publish(self, messages: dict):
+        """messages: {user_id: [frame, ...]}"""
+        if self._redis is not None:
+            try:
+                self._redis.publish(PUSH_CHANNEL, json.dumps(list(messages.items())))
+                return
+            except Exception as e:
+                print(f"⚠️ Push relay publish failed, delivering locally: {e}")
+        self._deliver_local(messages.items())
+
+    def _deliver_local(self, messages):
+        if self._loop is None or self._loop.is_closed():
+            return
+        for user_id, frames in messages:
+            # Most commits are for users with no open stream in this worker
+            if user_id in self._streams:
+                self._loop.call_soon_threadsafe(self._deliver, user_id, frames)
+
+    def _relay_loop(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(PUSH_CHANNEL)
+                for message in pubsub.listen():
+                    self._deliver_local(json.loads(message["data"]))
+            except Exception as e:
+                print(f"❌ Push relay error: {e}")
+                time.sleep(1)
+
+
+hub = PushHub()
+
+
+# ============================================================
+# SESSION HOOKS (COLLECT ON FLUSH, PUSH AFTER COMMIT)
+# ============================================================
+def queue_push(session, user_id: int, event_type: str, data: dict):
+    """Push a message to the user's streams once this session commits"""
+    pending = session.info.setdefault("push_pending", {})
+    pending.setdefault(user_id, []).append(format_frame(event_type, data))
+
+
+def wallet_message(wallet: Wallet, entry: WalletLedger = None) -> dict:
+    return {
+        "points": wallet.points,
+        "redeemed": wallet.redeemed,
+        "balance": wallet.points,
+        "delta": entry.points_delta if entry is not None else None,
+        "entry_type": entry.entry_type if entry is not None else None,
+        "reference": entry.reference if entry is not None else None,
+    }
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_pushes(session, flush_context):
+    entries = {}
+    for obj in session.new:
+        # apply_wallet_change adds the ledger entry in the same flush as the wallet change
+        if isinstance(obj, WalletLedger) and obj.entry_type != "OPENING_BALANCE":
+            entries[obj.user_id] = obj
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Wallet) and (obj in session.new or session.is_modified(obj)):
+            queue_push(session, obj.user_id, "wallet", wallet_message(obj, entries.get(obj.user_id)))
+        elif isinstance(obj, Order) and (obj in session.new or session.is_modified(obj)):
+            queue_push(session, obj.user_id, "order", {
+                "order_id": obj.order_id,
+                "status": obj.status,
+                "total_points": obj.total_points,
+                "transaction_type": obj.transaction_type,
+            })
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _send_pushes(session):
+    pending = session.info.pop("push_pending", None)
+    if pending:
+        hub.publish(pending)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_pushes(session):
+    session.info.pop("push_pending", None)
+
+
+# ============================================================
+# STREAM
+# ============================================================
+async def stream_frames(user_id: int, queue: asyncio.Queue):
+    """SSE body for one connection; the response cancels it when the client goes away"""
+    try:
+        yield f"retry: 5000\n: connected {user_id}\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        hub.disconnect(user_id, queue)
@@ -0,0 +1,246 @@
+"""
+User shard maintenance.
+
+    python reshard.py init                       create (or add new columns to) the per-user tables on every shard
+    python reshard.py plan --to "s0=...,s1=..."  count users whose shard changes under the new layout
+    python reshard.py move --to "s0=...,s1=..."  freeze writes, copy those users' rows to their new shard,
+                                                 verify, then delete the old copies
+    python reshard.py unfreeze                   allow writes again (after the restart on the new layout)
+
+`move` freezes writes to the per-user tables first (database.writes_frozen: such writes get 503
+in every app process) and leaves them frozen. Until the app runs on the new layout, moved users
+read from their old, now empty, shard - run it in a maintenance window. Afterwards:
+set DB_SHARD_URLS to the new layout, restart, then `python reshard.py unfreeze`.
+
+Users are moved in batches. Only users that still have rows on their old shard are moved, and a
+batch is deleted from the old shard only after its copy was verified, so `move` can be re-run
+after an interruption (or by mistake) without touching users that were already moved.
+"""
+from sqlalchemy import create_engine, inspect, select, delete, func, text
+from sqlalchemy.schema import CreateTable, CreateIndex, CreateColumn
+from database import (
+    SessionLocal, SHARDED_TABLES, SHARD_WRITE_FREEZE, WRITE_FREEZE_CHECK_SECONDS,
+    ShardRing, parse_shard_urls, shard_engines, shard_ring
+)
+from models import Base, User, LeaderboardCheckpoint, MaintenanceFlag
+import argparse
+import sys
+import time
+
+BATCH_SIZE = 500
+
+# Parents before children (order_items references orders.order_id)
+TABLES = [table for table in Base.metadata.sorted_tables if table.name in SHARDED_TABLES]
+
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def create_shard_schema(engine):
+    """
+    Per-user tables only; foreign keys to users are dropped (users stay on the primary).
+    Tables that already exist get the columns and indexes added to the models since.
+    """
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table in TABLES:
+            if table.name in existing:
+                add_missing_columns(conn, inspector, table)
+                continue
+            local_fks = [fk for fk in table.foreign_key_constraints if fk.referred_table.name in SHARDED_TABLES]
+            conn.execute(CreateTable(table, include_foreign_key_constraints=local_fks))
+            for index in table.indexes:
+                conn.execute(CreateIndex(index))
+            print(f"   created {table.name} on {engine.url.database}")
+
+
+def add_missing_columns(conn, inspector, table):
+    columns = {column["name"] for column in inspector.get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in columns:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"))
+            print(f"   added {table.name}.{column.name} on {conn.engine.url.database}")
+
+    indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in indexes:
+            conn.execute(CreateIndex(index))
+            print(f"   added index {index.name} on {conn.engine.url.database}")
+
+
+# ============================================================
+# MOVING USERS
+# ============================================================
+def _user_rows(table, user_ids: list, order_ids: list):
+    if table.name == "order_items":
+        return table.c.order_id.in_(order_ids)
+    return table.c.user_id.in_(user_ids)
+
+
+def _row_counts(conn, user_ids: list, order_ids: list) -> dict:
+    return {
+        table.name: conn.execute(
+            select(func.count()).select_from(table).where(_user_rows(table, user_ids, order_ids))
+        ).scalar()
+        for table in TABLES
+    }
+
+
+def move_users(source, target, user_ids: list) -> int:
+    """
+    Copy every per-user row of these users from source to target, check the copy, then delete
+    them from source. Users without rows on source (already moved, or no data) are left alone.
+    Returns (users moved, rows moved).
+    """
+    orders = Base.metadata.tables["orders"]
+    with source.connect() as src:
+        present = set()
+        for table in TABLES:
+            if "user_id" in table.c:
+                present.update(row.user_id for row in src.execute(
+                    select(table.c.user_id).where(table.c.user_id.in_(user_ids)).distinct()
+                ))
+        user_ids = [user_id for user_id in user_ids if user_id in present]
+        if not user_ids:
+            return 0, 0
+
+        order_ids = [row.order_id for row in src.execute(
+            select(orders.c.order_id).where(orders.c.user_id.in_(user_ids))
+        )]
+        rows = {
+            table.name: [dict(row._mapping) for row in src.execute(
+                select(table).where(_user_rows(table, user_ids, order_ids))
+            )]
+            for table in TABLES
+        }
+
+    expected = {name: len(table_rows) for name, table_rows in rows.items()}
+    with target.begin() as dst:
+        # The source still has these users, so anything on the target is an unfinished earlier copy
+        for table in reversed(TABLES):
+            dst.execute(delete(table).where(_user_rows(table, user_ids, order_ids)))
+        for table in TABLES:
+            if rows[table.name]:
+                # Row ids are per database; let the target assign new ones
+                dst.execute(table.insert(), [
+                    {key: value for key, value in row.items() if key != "id"}
+                    for row in rows[table.name]
+                ])
+        copied = _row_counts(dst, user_ids, order_ids)
+        if copied != expected:
+            raise RuntimeError(f"Copy check failed for users {user_ids[0]}..{user_ids[-1]}: {copied} != {expected}")
+
+    with source.begin() as src:
+        for table in reversed(TABLES):
+            src.execute(delete(table).where(_user_rows(table, user_ids, order_ids)))
+
+    return len(user_ids), sum(expected.values())
+
+
+def plan_moves(new_ring: ShardRing, batch_size: int = BATCH_SIZE, old_ring: ShardRing = None):
+    """Yields (old shard, new shard, user ids) batches for users whose shard changes"""
+    old_ring = old_ring or shard_ring
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            user_ids = [row.id for row in db.query(User.id).filter(
+                User.id > last_id
+            ).order_by(User.id).limit(batch_size).all()]
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            moves = {}
+            for user_id in user_ids:
+                old, new = old_ring.shard_for(user_id), new_ring.shard_for(user_id)
+                if old != new:
+                    moves.setdefault((old, new), []).append(user_id)
+
+            for (old, new), moved in moves.items():
+                yield old, new, moved
+    finally:
+        db.close()
+
+
+def set_write_freeze(enabled: bool):
+    db = SessionLocal()
+    try:
+        db.merge(MaintenanceFlag(name=SHARD_WRITE_FREEZE, enabled=enabled))
+        db.commit()
+    finally:
+        db.close()
+
+
+def move_all(old_engines: dict, new_engines: dict, new_ring: ShardRing, batch_size: int = BATCH_SIZE,
+             old_ring: ShardRing = None) -> tuple:
+    """Move every user whose shard changes; returns (users moved, rows moved)"""
+    users_moved = rows_moved = 0
+    for old, new, user_ids in plan_moves(new_ring, batch_size, old_ring):
+        users, rows = move_users(old_engines[old], new_engines[new], user_ids)
+        if users:
+            users_moved += users
+            rows_moved += rows
+            print(f"🔀 {old} -> {new}: {users} users ({users_moved} so far)")
+    return users_moved, rows_moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="User shard maintenance")
+    parser.add_argument("command", choices=["init", "plan", "move", "unfreeze"])
+    parser.add_argument("--to", help="New layout, same format as DB_SHARD_URLS")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "init":
+        for name, engine in shard_engines.items():
+            print(f"🗄️  Shard {name}")
+            create_shard_schema(engine)
+        return
+
+    if args.command == "unfreeze":
+        set_write_freeze(False)
+        print("✅ Writes to per-user tables allowed again")
+        return
+
+    if not args.to:
+        parser.error("--to is required for plan / move")
+
+    new_urls = parse_shard_urls(args.to)
+    new_engines = {
+        name: shard_engines[name] if name in shard_engines and str(shard_engines[name].url) == url
+        else create_engine(url)
+        for name, url in new_urls.items()
+    }
+    new_ring = ShardRing(new_engines)
+
+    if args.command == "plan":
+        print(f"{sum(len(user_ids) for _, _, user_ids in plan_moves(new_ring, args.batch))} users would move")
+        return
+
+    for name, engine in new_engines.items():
+        create_shard_schema(engine)
+
+    # Every app process sees the freeze within WRITE_FREEZE_CHECK_SECONDS; give in-flight requests time to finish
+    set_write_freeze(True)
+    print(f"🧊 Writes to per-user tables frozen, waiting {WRITE_FREEZE_CHECK_SECONDS + 5:.0f}s for running requests")
+    time.sleep(WRITE_FREEZE_CHECK_SECONDS + 5)
+
+    users_moved, rows_moved = move_all(shard_engines, new_engines, new_ring, args.batch)
+
+    # Ledger ids changed for moved users: make the leaderboards rebuild from source
+    db = SessionLocal()
+    try:
+        db.query(LeaderboardCheckpoint).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ Moved {users_moved} users ({rows_moved} rows).")
+    print(f"   Writes stay frozen: set DB_SHARD_URLS=\"{args.to}\", restart, then run `python reshard.py unfreeze`.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Daily / monthly activity rollups per user, distributor and region (performance dashboard).
+
+Counters are incremented in the transaction of the wallet change that caused them. Two limits
+of that design:
+- Every change of a region's (or distributor's) users increments the same REGION / DISTRIBUTOR
+  rows, so those rows are locked until the caller commits. Rows are always written in key order,
+  so concurrent transactions queue on them instead of deadlocking.
+- With user shards (DB_SHARD_URLS) the rollups stay on the primary while the ledger is on the
+  user's shard. The session commits the two databases one after the other, not atomically: a
+  failure between the two commits leaves the rollups off by that change.
+"""
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import mysql, sqlite
+from models import User, PerformanceRollup
+from datetime import date, datetime
+
+# Wallet entry types that are not real activity
+IGNORED_ENTRY_TYPES = {"OPENING_BALANCE"}
+
+ORDER_ENTRY_TYPES = {"PRODUCT"}
+TRANSFER_ENTRY_TYPES = {"BANK_TRANSFER", "UPI_TRANSFER", "CASHOUT"}
+
+COUNTERS = ("points_earned", "points_redeemed", "orders_count", "transfers_count")
+KEY_COLUMNS = ("scope", "scope_key", "period_type", "period_start")
+
+
+def _increment(db: Session, rows: list):
+    """INSERT each rollup row or add its counters to the existing one (one executemany)"""
+    if not rows:
+        return
+
+    # Same lock order in every transaction
+    rows = sorted(rows, key=lambda row: tuple(str(row[name]) for name in KEY_COLUMNS))
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        stmt = mysql.insert(PerformanceRollup)
+        stmt = stmt.on_duplicate_key_update(
+            **{name: getattr(PerformanceRollup, name) + stmt.inserted[name] for name in COUNTERS}
+        )
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(PerformanceRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={name: getattr(PerformanceRollup, name) + stmt.excluded[name] for name in COUNTERS}
+        )
+    else:
+        for row in rows:
+            _increment_row(db, row)
+        return
+
+    db.execute(stmt, rows)
+
+
+def _increment_row(db: Session, row: dict):
+    """Portable upsert for databases without one: UPDATE, else INSERT (a concurrent INSERT wins -> UPDATE)"""
+    table = PerformanceRollup.__table__
+    update = table.update().where(and_(*(table.c[name] == row[name] for name in KEY_COLUMNS))).values(
+        **{name: table.c[name] + row[name] for name in COUNTERS}
+    )
+    if db.execute(update).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(table.insert(), row)
+    except IntegrityError:
+        db.execute(update)
+
+
+def _rollup_keys(user_id: int, distributor_name: str, region: str, day: date) -> list:
+    """The user's, distributor's and region's daily + monthly rollup keys"""
+    scopes = [("USER", str(user_id))]
+    if distributor_name:
+        scopes.append(("DISTRIBUTOR", distributor_name))
+    if region:
+        scopes.append(("REGION", region))
+
+    periods = [("D", day), ("M", day.replace(day=1))]
+
+    return [
+        (scope, scope_key, period_type, period_start)
+        for scope, scope_key in scopes
+        for period_type, period_start in periods
+    ]
+
+
+def _rows(totals: dict) -> list:
+    return [
+        {
+            "scope": scope,
+            "scope_key": scope_key,
+            "period_type": period_type,
+            "period_start": period_start,
+            **{name: counters.get(name, 0) for name in COUNTERS}
+        }
+        for (scope, scope_key, period_type, period_start), counters in totals.items()
+    ]
+
+
+def record_activity(
+    db: Session,
+    user_id: int,
+    points_earned: int = 0,
+    points_redeemed: int = 0,
+    orders_count: int = 0,
+    transfers_count: int = 0,
+    when: datetime = None
+):
+    """
+    Add one event to the user's, distributor's and region's daily + monthly rollups.
+    Runs in the caller's transaction. Caller commits.
+    """
+    deltas = {
+        "points_earned": points_earned,
+        "points_redeemed": points_redeemed,
+        "orders_count": orders_count,
+        "transfers_count": transfers_count
+    }
+    if not any(deltas.values()):
+        return
+
+    owner = db.query(User.distributor_name, User.region).filter(User.id == user_id).first()
+
+    keys = _rollup_keys(
+        user_id,
+        owner.distributor_name if owner else None,
+        owner.region if owner else None,
+        (when or datetime.now()).date()
+    )
+    _increment(db, _rows({key: deltas for key in keys}))
+
+
+def record_activity_bulk(db: Session, activities: list):
+    """
+    Bulk variant for imports: activities are (user_id, distributor_name, region, day, deltas) tuples.
+    Pre-aggregated per rollup row, then written with one executemany. Caller commits.
+    """
+    totals = {}
+    for user_id, distributor_name, region, day, deltas in activities:
+        for key in _rollup_keys(user_id, distributor_name, region, day):
+            counters = totals.setdefault(key, {})
+            for name, value in deltas.items():
+                counters[name] = counters.get(name, 0) + value
+
+    _increment(db, _rows(totals))
+
+
+def record_wallet_activity(db: Session, user_id: int, entry_type: str, points_delta: int, redeemed_delta: int):
+    """Translate a wallet ledger entry into rollup increments"""
+    if entry_type in IGNORED_ENTRY_TYPES:
+        return
+
+    record_activity(
+        db,
+        user_id,
+        points_earned=points_delta if points_delta > 0 else 0,
+        points_redeemed=redeemed_delta if redeemed_delta > 0 else 0,
+        orders_count=1 if entry_type in ORDER_ENTRY_TYPES else 0,
+        transfers_count=1 if entry_type in TRANSFER_ENTRY_TYPES else 0
+    )
+
+
+def serialize_rollup(row: PerformanceRollup) -> dict:
+    return {
+        "period_start": row.period_start.isoformat(),
+        **{name: getattr(row, name) for name in COUNTERS}
+    }
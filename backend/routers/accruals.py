@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy.orm import Session
+from database import get_db
+from models import AccrualBatch
+from accrual import ingest_accruals
+
+router = APIRouter(prefix="/api/accruals", tags=["Accruals"])
+
+
+# ================= UPLOAD SALES FILE =================
+@router.post("/upload")
+def upload_accruals(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Credit points from a monthly sales file (CSV or XLSX).
+    Columns: ham_code, sales_amount (or amount / points), optional date.
+    """
+    return ingest_accruals(db, file.file, file.filename or "upload.csv")
+
+
+# ================= BATCH STATUS =================
+@router.get("/batches/{batch_id}")
+def get_accrual_batch(batch_id: int, db: Session = Depends(get_db)):
+    batch = db.query(AccrualBatch).filter(AccrualBatch.id == batch_id).first()
+
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    return {
+        "batch_id": batch.id,
+        "filename": batch.filename,
+        "status": batch.status,
+        "rows_total": batch.rows_total,
+        "rows_accepted": batch.rows_accepted,
+        "rows_rejected": batch.rows_rejected,
+        "points_credited": batch.points_credited,
+        "started_at": batch.started_at.isoformat() if batch.started_at else None,
+        "finished_at": batch.finished_at.isoformat() if batch.finished_at else None
+    }
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, Body
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, Body, HTTPException, Header, Query, Response
+from sqlalchemy.orm import Session, load_only
+from database import get_db, mark_user_write, use_user_shard
 from models import User
-import random
+from otp_store import otp_store
+from security import SessionClaims, create_access_token, get_session_user
+from leaderboard import leaderboards
+from outbox import publish
+from onboarding import allocate_ham_numbers, format_ham_code
 from pydantic import BaseModel
+from typing import Annotated, List, Optional, Union
+import re
+import zlib
 
 router = APIRouter(prefix="/api", tags=["Auth"])
 
@@ -22,62 +29,127 @@ class ProfileUpdateModel(BaseModel):
     distributor_name: str = None
     target: int = None
 
+
+class ProfilePatchModel(BaseModel):
+    profile_picture: Optional[str] = None
+    be_name: Optional[str] = None
+    outlet_name: Optional[str] = None
+    region: Optional[str] = None
+    state: Optional[str] = None
+    city: Optional[str] = None
+    address: Optional[str] = None
+    pincode: Optional[str] = None
+    member_type: Optional[str] = None
+    slab: Optional[str] = None
+    distributor_name: Optional[str] = None
+    target: Optional[int] = None
+
+    model_config = {"extra": "forbid"}
+
+
+# ============================================================
+# REQUEST / RESPONSE MODELS
+# ============================================================
+class SignupRequest(BaseModel):
+    full_name: str
+    phone: str
+    email: Optional[str] = None
+
+
+class VerifyOtpRequest(BaseModel):
+    phone: str
+    otp: str
+
+
+class ErrorOut(BaseModel):
+    success: Optional[bool] = None
+    error: Optional[str] = None
+
+
+class SignupOut(BaseModel):
+    status: str
+    ham_code: Optional[str] = None
+
+
+class OtpSentOut(BaseModel):
+    message: str
+    demo_otp: str
+
+
+class VerifyOtpOut(BaseModel):
+    success: bool
+    user_id: Optional[int] = None
+    ham_code: Optional[str] = None
+    access_token: Optional[str] = None
+    token_type: Optional[str] = None
+
+
+class ProfileOut(BaseModel):
+    """Every field optional: only the requested (?fields=) ones are set and returned"""
+    id: Optional[int] = None
+    ham_code: Optional[str] = None
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    profile_picture: Optional[str] = None
+    be_name: Optional[str] = None
+    outlet_name: Optional[str] = None
+    region: Optional[str] = None
+    state: Optional[str] = None
+    city: Optional[str] = None
+    address: Optional[str] = None
+    pincode: Optional[str] = None
+    member_type: Optional[str] = None
+    slab: Optional[str] = None
+    distributor_name: Optional[str] = None
+    target: Optional[int] = None
+    is_profile_complete: Optional[bool] = None
+
+
+class ProfileUpdatedOut(BaseModel):
+    success: bool
+    message: str
+
+
+class ProfilePatchedOut(BaseModel):
+    success: bool
+    updated: List[str]
+    etag: str
+
+
 def generate_ham_code(db: Session) -> str:
     """Generate unique HAM code in format HAM002665"""
-    while True:
-        # Get the highest existing HAM code number
-        last_user = db.query(User).filter(
-            User.ham_code.isnot(None)
-        ).order_by(User.id.desc()).first()
-        
-        if last_user and last_user.ham_code:
-            # Extract number from HAM002665 format
-            try:
-                last_number = int(last_user.ham_code.replace("HAM", ""))
-                new_number = last_number + 1
-            except:
-                new_number = 1
-        else:
-            new_number = 1
-        
-        # Format as HAM000001, HAM000002, etc.
-        ham_code = f"HAM{new_number:06d}"
-        
-        # Check if this code already exists (safety check)
-        existing = db.query(User).filter(User.ham_code == ham_code).first()
-        if not existing:
-            return ham_code
-
-@router.post("/signup")
-def signup(full_name: str, phone: str, email: str = None, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.phone == phone).first()
-    if user:
-        return {"status": "exists"}
+    return format_ham_code(allocate_ham_numbers(db))
+
+@router.post("/signup", response_model=SignupOut, response_model_exclude_unset=True)
+def signup(data: Annotated[SignupRequest, Query()], db: Session = Depends(get_db)):
+    if db.query(User.id).filter(User.phone == data.phone).scalar():
+        return SignupOut(status="exists")
 
     # ✅ Generate HAM code on signup
     ham_code = generate_ham_code(db)
     
     user = User(
-        full_name=full_name, 
-        phone=phone, 
-        email=email,
+        full_name=data.full_name, 
+        phone=data.phone, 
+        email=data.email,
         ham_code=ham_code
     )
     db.add(user)
     db.commit()
-    return {"status": "created", "ham_code": ham_code}
+    return SignupOut(status="created", ham_code=ham_code)
 
 
-@router.post("/send-otp")
+@router.post("/send-otp", response_model=Union[OtpSentOut, ErrorOut], response_model_exclude_unset=True)
 def send_otp(phone: str, db: Session = Depends(get_db)):
-    otp = str(random.randint(100000, 999999))
-
-    user = db.query(User).filter(User.phone == phone).first()
-    if not user:
-        return {"error": "User not found"}
+    user_id = db.query(User.id).filter(User.phone == phone).scalar()
+    if not user_id:
+        return ErrorOut(error="User not found")
 
-    user.otp = otp
-    db.commit()
+    # OTP lives only in the TTL store (hashed) - no DB write per send
+    otp = otp_store.issue(phone)
+    if otp is None:
+        raise HTTPException(status_code=429, detail="Too many OTP requests. Please try again later.")
 
     # 🔥 DEMO MODE - Log OTP (for development)
     print("=" * 50)
@@ -86,18 +158,21 @@ def send_otp(phone: str, db: Session = Depends(get_db)):
     print("=" * 50)
     
     # Return success message only (no OTP in response)
-    return {"message": "OTP sent successfully", "demo_otp": otp}
+    return OtpSentOut(message="OTP sent successfully", demo_otp=otp)
 
 
-@router.post("/verify-otp")
-def verify_otp(phone: str, otp: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(
-        User.phone == phone,
-        User.otp == otp
-    ).first()
+@router.post("/verify-otp", response_model=VerifyOtpOut, response_model_exclude_unset=True)
+def verify_otp(data: Annotated[VerifyOtpRequest, Query()], db: Session = Depends(get_db)):
+    # Expiry, attempt limit and constant-time compare are handled by the store
+    if not otp_store.verify(data.phone, data.otp):
+        return VerifyOtpOut(success=False)
+
+    user = db.query(User).options(
+        load_only(User.id, User.ham_code, User.kyc_status, User.otp, User.otp_verified, User.version)
+    ).filter(User.phone == data.phone).first()
 
     if not user:
-        return {"success": False}
+        return VerifyOtpOut(success=False)
 
     user.otp_verified = True
     user.otp = None
@@ -105,87 +180,177 @@ def verify_otp(phone: str, otp: str, db: Session = Depends(get_db)):
     # ✅ Generate HAM code if not exists (for old users)
     if not user.ham_code:
         user.ham_code = generate_ham_code(db)
+        user.version = (user.version or 1) + 1
     
     db.commit()
 
-    return {"success": True, "user_id": user.id, "ham_code": user.ham_code}
+    # ✅ Signed session token - lets later requests skip user lookups
+    access_token = create_access_token(user.id, user.ham_code, user.kyc_status or "PENDING")
 
-@router.get("/user/profile")
-def get_user_profile(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+    return VerifyOtpOut(
+        success=True,
+        user_id=user.id,
+        ham_code=user.ham_code,
+        access_token=access_token,
+        token_type="bearer"
+    )
 
-    if not user:
-        return {"error": "User not found"}
-
-    # ✅ Check if profile is complete
-    is_complete = all([
-        user.be_name,
-        user.outlet_name,  # ✅ NEW: Include Outlet Name in completion check
-        user.member_type,
-        user.slab,
-        user.distributor_name,
-        user.target is not None,
-        user.address,
-        user.pincode,
-        user.region,
-        user.state,
-        user.city
-    ])
-
-    return {
-        "id": user.id,
-        "ham_code": user.ham_code,
-        "full_name": user.full_name,
-        "phone": user.phone,
-        "email": user.email,
-        "profile_picture": user.profile_picture,
-        "be_name": user.be_name,
-        "outlet_name": user.outlet_name,  # ✅ NEW
-        "region": user.region,
-        "state": user.state,
-        "city": user.city,
-        "address": user.address,
-        "pincode": user.pincode,
-        "member_type": user.member_type,
-        "slab": user.slab,
-        "distributor_name": user.distributor_name,
-        "target": user.target,
-        "is_profile_complete": is_complete
-    }
+# ================= PROFILE =================
+PROFILE_FIELDS = (
+    "id", "ham_code", "full_name", "phone", "email", "profile_picture", "be_name", "outlet_name",
+    "region", "state", "city", "address", "pincode", "member_type", "slab", "distributor_name", "target"
+)
 
-@router.post("/user/update-profile")
-def update_user_profile(data: ProfileUpdateModel, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == data.user_id).first()
-    
-    if not user:
-        return {"success": False, "error": "User not found"}
-    
-    # Update existing fields
-    if data.profile_picture:
-        user.profile_picture = data.profile_picture
-    if data.be_name:
-        user.be_name = data.be_name
-    if data.outlet_name:  # ✅ NEW
-        user.outlet_name = data.outlet_name
-    if data.region:
-        user.region = data.region
-    if data.state:
-        user.state = data.state
-    if data.city:
-        user.city = data.city
-    if data.address:
-        user.address = data.address
-    if data.pincode:
-        user.pincode = data.pincode
-    if data.member_type:
-        user.member_type = data.member_type
-    if data.slab:
-        user.slab = data.slab
-    if data.distributor_name:
-        user.distributor_name = data.distributor_name
-    if data.target is not None:
-        user.target = data.target
-    
+ALL_FIELDS = PROFILE_FIELDS + ("is_profile_complete",)
+
+# Fields that must be filled for is_profile_complete
+COMPLETION_FIELDS = (
+    "be_name", "outlet_name", "member_type", "slab", "distributor_name",
+    "target", "address", "pincode", "region", "state", "city"
+)
+
+# Fields a user may change through the profile endpoints
+UPDATABLE_FIELDS = (
+    "profile_picture", "be_name", "outlet_name", "region", "state", "city", "address",
+    "pincode", "member_type", "slab", "distributor_name", "target"
+)
+
+
+def _profile_etag(user_id: int, version: int, fields: tuple) -> str:
+    # Each field mask is its own representation
+    mask = "" if fields == ALL_FIELDS else "-%x" % zlib.crc32(",".join(fields).encode())
+    return f'"u{user_id}-v{version}{mask}"'
+
+
+def _parse_fields(fields: Optional[str]) -> tuple:
+    if not fields:
+        return ALL_FIELDS
+
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in ALL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown profile fields: {', '.join(unknown)}")
+    return requested
+
+
+@router.get("/user/profile", response_model=Union[ProfileOut, ErrorOut], response_model_exclude_unset=True)
+def get_user_profile(
+    response: Response,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    session: SessionClaims = Depends(get_session_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ?fields=full_name,ham_code returns only those fields (profile_picture is only read when asked for).
+    Send the ETag back as If-None-Match to get 304 when nothing changed.
+    """
+    requested = _parse_fields(fields)
+
+    # Cheap version probe before touching any profile columns
+    version = db.query(User.version).filter(User.id == session.user_id).scalar()
+    if version is None:
+        return ErrorOut(error="User not found")
+
+    etag = _profile_etag(session.user_id, version, requested)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    columns = [f for f in requested if f != "is_profile_complete"]
+    if "is_profile_complete" in requested:
+        columns += [f for f in COMPLETION_FIELDS if f not in columns]
+
+    row = db.query(*[getattr(User, f) for f in columns]).filter(User.id == session.user_id).first()
+    if not row:
+        return ErrorOut(error="User not found")
+    values = row._asdict()
+
+    profile = {f: values[f] for f in requested if f != "is_profile_complete"}
+    if "is_profile_complete" in requested:
+        # ✅ Check if profile is complete
+        profile["is_profile_complete"] = all(
+            values[f] is not None if f == "target" else bool(values[f]) for f in COMPLETION_FIELDS
+        )
+
+    response.headers["ETag"] = etag
+    return ProfileOut(**profile)
+
+
+def _update_profile_fields(db: Session, user_id: int, values: dict, expected_version: int = None):
+    """
+    Targeted UPDATE of the given columns - the row (and its picture) is never loaded.
+    Bumps the row version. Returns False if nothing matched (missing user or stale version).
+    """
+    query = db.query(User).filter(User.id == user_id)
+    if expected_version is not None:
+        query = query.filter(User.version == expected_version)
+
+    updated = query.update(
+        {**{getattr(User, name): value for name, value in values.items()}, User.version: User.version + 1},
+        synchronize_session=False
+    )
+    if not updated:
+        db.rollback()
+        return False
+
+    use_user_shard(db, user_id)
+    publish(db, "user.profile_updated", user_id, fields=sorted(values))
     db.commit()
+    # Bulk UPDATE bypasses the session's write tracking
+    mark_user_write(user_id)
+
+    # Slab / region / target decide which leaderboards the user sits on
+    if {"slab", "region", "target"} & values.keys():
+        row = db.query(User.slab, User.region, User.target).filter(User.id == user_id).first()
+        leaderboards.update_profile(user_id, row.slab, row.region, row.target)
+    return True
+
+
+@router.post("/user/update-profile", response_model=Union[ProfileUpdatedOut, ErrorOut], response_model_exclude_unset=True)
+def update_user_profile(data: ProfileUpdateModel, db: Session = Depends(get_db)):
+    # Empty values leave the stored field unchanged (target may be 0)
+    values = {
+        name: getattr(data, name) for name in UPDATABLE_FIELDS
+        if (getattr(data, name) is not None if name == "target" else getattr(data, name))
+    }
+
+    if not _update_profile_fields(db, data.user_id, values):
+        return ErrorOut(success=False, error="User not found")
+
+    return ProfileUpdatedOut(success=True, message="Profile updated successfully")
+
 
-    return {"success": True, "message": "Profile updated successfully"}
\ No newline at end of file
+@router.patch("/user/profile", response_model=ProfilePatchedOut)
+def patch_user_profile(
+    data: ProfilePatchModel,
+    if_match: Optional[str] = Header(None),
+    session: SessionClaims = Depends(get_session_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Only the fields sent in the body are written (null clears a field).
+    Optional If-Match with the profile ETag rejects the write with 412 if the profile changed since;
+    If-Match: * only requires the profile to exist.
+    """
+    values = data.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    expected_version = None
+    if if_match and if_match.strip() != "*":
+        match = re.search(r'-v(\d+)', if_match)
+        if not match:
+            raise HTTPException(status_code=412, detail="Invalid If-Match")
+        expected_version = int(match.group(1))
+
+    if not _update_profile_fields(db, session.user_id, values, expected_version):
+        if expected_version is not None and db.query(User.id).filter(User.id == session.user_id).scalar():
+            raise HTTPException(status_code=412, detail="Profile was changed by another request")
+        raise HTTPException(status_code=404, detail="User not found")
+
+    version = db.query(User.version).filter(User.id == session.user_id).scalar()
+    return ProfilePatchedOut(
+        success=True,
+        updated=sorted(values),
+        etag=_profile_etag(session.user_id, version, ALL_FIELDS)
+    )
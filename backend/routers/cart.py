@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from database import get_db
-from models import Cart, Wallet, Order, OrderItem
+from sqlalchemy.exc import IntegrityError
+from database import get_db, fan_out
+from models import Cart, Order, OrderItem
+from ledger import apply_wallet_change, lock_wallet
+from outbox import publish
+from pydantic import BaseModel, ConfigDict
+from typing import Annotated, Dict, List, Optional
 from datetime import datetime
 import time
 import re
@@ -10,6 +15,84 @@ import re
 router = APIRouter(prefix="/api", tags=["Cart"])
 
 
+# ============================================================
+# REQUEST / RESPONSE MODELS
+# ============================================================
+class AddToCartRequest(BaseModel):
+    user_id: int
+    product_name: str
+    points: int
+    product_image: str = ""
+    category: str = ""
+    product_code: str = ""
+    description: str = ""
+    quantity: int = 1
+
+
+class RemoveFromCartRequest(BaseModel):
+    user_id: int
+    cart_item_id: int
+
+
+class CheckoutRequest(BaseModel):
+    user_id: int
+    delivery_address: str
+    mobile: str
+
+
+class ProductAnalyticsOut(BaseModel):
+    total_redeemed: Optional[int] = None
+    product_code: Optional[str] = None
+    brand: Optional[str] = None
+    last_redeemed: Optional[datetime] = None
+
+
+class CartItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    product_name: str
+    product_image: Optional[str] = None
+    points: int
+    quantity: int
+    category: Optional[str] = None
+    description: Optional[str] = ""
+
+
+class CartOut(BaseModel):
+    items: List[CartItemOut]
+    total_points: int
+    count: int
+
+
+class CartLineOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    product_name: str
+    quantity: int
+    points: int
+
+
+class CartUpdatedOut(BaseModel):
+    success: bool
+    message: str
+    item: CartLineOut
+
+
+class MessageOut(BaseModel):
+    success: bool
+    message: str
+
+
+class CheckoutOut(BaseModel):
+    success: bool
+    message: str
+    order_id: str
+    total_points: int
+    remaining_points: int
+
+
 # ================= HELPER: EXTRACT BRAND FROM PRODUCT NAME =================
 def extract_brand(product_name: str) -> str:
     """Extract brand name from product name (first word/brand identifier)"""
@@ -47,41 +130,52 @@ def extract_brand(product_name: str) -> str:
 
 
 # ================= GET PRODUCT ANALYTICS =================
-@router.get("/products/analytics")
+@router.get("/products/analytics", response_model=Dict[str, ProductAnalyticsOut])
 def get_product_analytics(category: str = None, db: Session = Depends(get_db)):
     """Get product redemption counts and analytics for filtering"""
-    
-    query = db.query(
-        OrderItem.product_name,
-        OrderItem.product_code,
-        OrderItem.brand,
-        func.sum(OrderItem.quantity).label('total_redeemed'),
-        func.max(OrderItem.order.created_at).label('last_redeemed')
-    ).join(Order)
-    
-    if category:
-        query = query.filter(OrderItem.category == category)
-    
-    results = query.group_by(
-        OrderItem.product_name,
-        OrderItem.product_code,
-        OrderItem.brand
-    ).all()
-    
+
+    def shard_analytics(shard_db: Session):
+        query = shard_db.query(
+            OrderItem.product_name,
+            OrderItem.product_code,
+            OrderItem.brand,
+            func.sum(OrderItem.quantity).label('total_redeemed'),
+            func.max(Order.created_at).label('last_redeemed')
+        ).join(Order, Order.order_id == OrderItem.order_id)
+
+        if category:
+            query = query.filter(OrderItem.category == category)
+
+        return query.group_by(
+            OrderItem.product_name,
+            OrderItem.product_code,
+            OrderItem.brand
+        ).all()
+
+    # Orders live on their users' shards: merge the per-shard counts
     analytics = {}
-    for row in results:
-        analytics[row.product_name] = {
-            'total_redeemed': row.total_redeemed,
-            'product_code': row.product_code,
-            'brand': row.brand,
-            'last_redeemed': row.last_redeemed.isoformat() if row.last_redeemed else None
-        }
-    
+    for results in fan_out(shard_analytics).values():
+        for row in results:
+            item = analytics.get(row.product_name)
+            if item is None:
+                analytics[row.product_name] = ProductAnalyticsOut(
+                    total_redeemed=row.total_redeemed,
+                    product_code=row.product_code,
+                    brand=row.brand,
+                    last_redeemed=row.last_redeemed
+                )
+                continue
+            item.total_redeemed = (item.total_redeemed or 0) + (row.total_redeemed or 0)
+            item.product_code = item.product_code or row.product_code
+            item.brand = item.brand or row.brand
+            if row.last_redeemed and (item.last_redeemed is None or row.last_redeemed > item.last_redeemed):
+                item.last_redeemed = row.last_redeemed
+
     return analytics
 
 
 # ================= GET CART =================
-@router.get("/cart")
+@router.get("/cart", response_model=CartOut)
 def get_cart(user_id: int, db: Session = Depends(get_db)):
     """Get all cart items for a user"""
     
@@ -91,38 +185,24 @@ def get_cart(user_id: int, db: Session = Depends(get_db)):
     total_points = 0
     
     for item in cart_items:
-        items.append({
-            "id": item.id,
-            "product_name": item.product_name,
-            "product_image": item.product_image,
-            "points": item.points,
-            "quantity": item.quantity,
-            "category": item.category,
-            "description": getattr(item, 'description', '')  # ✅ ADD THIS
-        })
+        items.append(CartItemOut.model_validate(item))
         total_points += item.points * item.quantity
     
-    return {
-        "items": items,
-        "total_points": total_points,
-        "count": len(items)
-    }
+    return CartOut(
+        items=items,
+        total_points=total_points,
+        count=len(items)
+    )
 
 
 # ================= ADD TO CART =================
-@router.post("/cart/add")
+@router.post("/cart/add", response_model=CartUpdatedOut)
 def add_to_cart(
-    user_id: int,
-    product_name: str,
-    points: int,
-    product_image: str = "",
-    category: str = "",
-    product_code: str = "",
-    description: str = "",  # ✅ ADD THIS PARAMETER
-    quantity: int = 1,
+    data: Annotated[AddToCartRequest, Query()],
     db: Session = Depends(get_db)
 ):
     """Add item to cart"""
+    user_id, product_name, quantity = data.user_id, data.product_name, data.quantity
     
     # Check if item already exists in cart
     existing = db.query(Cart).filter(
@@ -136,52 +216,54 @@ def add_to_cart(
         db.commit()
         db.refresh(existing)
         
-        return {
-            "success": True,
-            "message": "Cart updated",
-            "item": {
-                "id": existing.id,
-                "product_name": existing.product_name,
-                "quantity": existing.quantity,
-                "points": existing.points
-            }
-        }
+        return CartUpdatedOut(
+            success=True,
+            message="Cart updated",
+            item=CartLineOut.model_validate(existing)
+        )
     
     # Add new item
     cart_item = Cart(
         user_id=user_id,
         product_name=product_name,
-        product_image=product_image,
-        points=points,
+        product_image=data.product_image,
+        points=data.points,
         quantity=quantity,
-        category=category,
-        description=description  # ✅ ADD THIS
+        category=data.category,
+        description=data.description,  # ✅ ADD THIS
+        product_code=data.product_code or None
     )
     
     db.add(cart_item)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A parallel request added the same product first (one row per product) - add to it instead
+        db.rollback()
+        existing = db.query(Cart).filter(
+            Cart.user_id == user_id,
+            Cart.product_name == product_name
+        ).first()
+        existing.quantity += quantity
+        db.commit()
+        cart_item = existing
     db.refresh(cart_item)
     
-    return {
-        "success": True,
-        "message": "Item added to cart",
-        "item": {
-            "id": cart_item.id,
-            "product_name": cart_item.product_name,
-            "quantity": cart_item.quantity,
-            "points": cart_item.points
-        }
-    }
+    return CartUpdatedOut(
+        success=True,
+        message="Item added to cart",
+        item=CartLineOut.model_validate(cart_item)
+    )
 
 
 # ================= REMOVE FROM CART =================
-@router.delete("/cart/remove")
-def remove_from_cart(user_id: int, cart_item_id: int, db: Session = Depends(get_db)):
+@router.delete("/cart/remove", response_model=MessageOut)
+def remove_from_cart(data: Annotated[RemoveFromCartRequest, Query()], db: Session = Depends(get_db)):
     """Remove item from cart"""
     
     cart_item = db.query(Cart).filter(
-        Cart.id == cart_item_id,
-        Cart.user_id == user_id
+        Cart.id == data.cart_item_id,
+        Cart.user_id == data.user_id
     ).first()
     
     if not cart_item:
@@ -190,35 +272,42 @@ def remove_from_cart(user_id: int, cart_item_id: int, db: Session = Depends(get_
     db.delete(cart_item)
     db.commit()
     
-    return {"success": True, "message": "Item removed from cart"}
+    return MessageOut(success=True, message="Item removed from cart")
 
 
 # ================= CLEAR CART =================
-@router.delete("/cart/clear")
+@router.delete("/cart/clear", response_model=MessageOut)
 def clear_cart(user_id: int, db: Session = Depends(get_db)):
     """Clear all cart items"""
     
     db.query(Cart).filter(Cart.user_id == user_id).delete()
     db.commit()
     
-    return {"success": True, "message": "Cart cleared"}
+    return MessageOut(success=True, message="Cart cleared")
 
 
 # ================= CHECKOUT =================
-@router.post("/cart/checkout")
+@router.post("/cart/checkout", response_model=CheckoutOut)
 def checkout_cart(
-    user_id: int,
-    delivery_address: str,
-    mobile: str,
+    data: Annotated[CheckoutRequest, Query()],
     db: Session = Depends(get_db)
 ):
     """Checkout cart and create order"""
+    user_id = data.user_id
     
     print(f"\n{'='*50}")
     print(f"🛒 CHECKOUT STARTED")
     print(f"User ID: {user_id}")
     print(f"{'='*50}\n")
     
+    # Get wallet first and keep it locked until commit: a concurrent checkout of the same
+    # user waits here and then finds the cart already cleared
+    wallet = lock_wallet(db, user_id)
+    
+    if not wallet:
+        print(f"❌ ERROR: Wallet not found for user_id: {user_id}")
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    
     # Get cart items
     cart_items = db.query(Cart).filter(Cart.user_id == user_id).all()
     
@@ -229,13 +318,6 @@ def checkout_cart(
     total_points = sum(item.points * item.quantity for item in cart_items)
     print(f"💰 Total points to redeem: {total_points}")
     
-    # Get wallet
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
-    
-    if not wallet:
-        print(f"❌ ERROR: Wallet not found for user_id: {user_id}")
-        raise HTTPException(status_code=404, detail="Wallet not found")
-    
     print(f"💳 BEFORE - Wallet balance: {wallet.points}")
     print(f"📊 BEFORE - Total redeemed: {wallet.redeemed}")
     
@@ -243,24 +325,23 @@ def checkout_cart(
         print(f"❌ ERROR: Insufficient points")
         raise HTTPException(status_code=400, detail="Insufficient points")
     
+    # Generate unique order ID
+    order_id = f"ORD{int(time.time() * 1000) % 100000000}"
+    
     # ✅ DEDUCT POINTS FROM WALLET
-    wallet.points = wallet.points - total_points
-    wallet.redeemed = wallet.redeemed + total_points
+    apply_wallet_change(db, wallet, -total_points, total_points, "PRODUCT", order_id)
     
     print(f"\n🔄 UPDATING WALLET...")
     print(f"   New balance: {wallet.points}")
     print(f"   New redeemed: {wallet.redeemed}")
     
-    # Generate unique order ID
-    order_id = f"ORD{int(time.time() * 1000) % 100000000}"
-    
     # Create order
     order = Order(
         user_id=user_id,
         order_id=order_id,
         total_points=total_points,
-        delivery_address=delivery_address,
-        mobile=mobile,
+        delivery_address=data.delivery_address,
+        mobile=data.mobile,
         status="completed",
         transaction_type="PRODUCT",
         created_at=datetime.now()
@@ -280,7 +361,7 @@ def checkout_cart(
             points=cart_item.points,
             quantity=cart_item.quantity,
             category=cart_item.category,
-            product_code=getattr(cart_item, 'product_code', ''),
+            product_code=cart_item.product_code,
             brand=brand  # ✅ NEW: Extract and save brand
         )
         db.add(order_item)
@@ -290,6 +371,12 @@ def checkout_cart(
     # Clear cart
     db.query(Cart).filter(Cart.user_id == user_id).delete()
     print(f"🗑️  Cart cleared")
+
+    publish(
+        db, "order.placed", user_id,
+        order_id=order_id, total_points=total_points,
+        items=sum(item.quantity for item in cart_items), remaining_points=wallet.points
+    )
     
     # ✅ COMMIT ALL CHANGES
     print(f"\n💾 COMMITTING TO DATABASE...")
@@ -310,10 +397,10 @@ def checkout_cart(
     print(f"✅ CHECKOUT COMPLETE")
     print(f"{'='*50}\n")
     
-    return {
-        "success": True,
-        "message": "Order placed successfully",
-        "order_id": order_id,
-        "total_points": total_points,
-        "remaining_points": wallet.points
-    }
\ No newline at end of file
+    return CheckoutOut(
+        success=True,
+        message="Order placed successfully",
+        order_id=order_id,
+        total_points=total_points,
+        remaining_points=wallet.points
+    )
\ No newline at end of file
@@ -1,133 +1,251 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from database import get_db
+from sqlalchemy import func, or_, select
+from database import get_db, get_read_db, SessionLocal, replicas, use_user_shard
 from models import User, KYC
-from typing import List
+from security import SessionClaims, get_session_user
+from kyc_status import adjust_kyc_doc_count
+from outbox import publish
+from cache import TTLCache
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Dict, List, Optional
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
+import os
 
 router = APIRouter(prefix="/api/kyc", tags=["KYC"])
 
+# Admin dashboard refreshes every few seconds - don't re-aggregate on every hit
+summary_cache = TTLCache(ttl=float(os.getenv("KYC_SUMMARY_CACHE_SECONDS", "30")))
+
+# Rows fetched per round trip when streaming the admin export
+EXPORT_CHUNK_SIZE = int(os.getenv("KYC_EXPORT_CHUNK_SIZE", "1000"))
+
+
+# ============================================================
+# REQUEST / RESPONSE MODELS
+# ============================================================
+class StatusCountsOut(BaseModel):
+    # Statuses other than the three known ones are kept as extra keys
+    model_config = ConfigDict(extra="allow")
+
+    total: int = 0
+    PENDING: int = 0
+    PARTIAL: int = 0
+    COMPLETED: int = 0
+
+
+class RegionCountsOut(StatusCountsOut):
+    region: Optional[str] = None
+
+
+class StateCountsOut(RegionCountsOut):
+    state: Optional[str] = None
+
+
+class CityCountsOut(StateCountsOut):
+    city: Optional[str] = None
+
+
+class KycSummaryOut(BaseModel):
+    total: int
+    completed: int
+    pending: int
+    by_status: Dict[str, int]
+    by_region: List[RegionCountsOut]
+    by_state: List[StateCountsOut]
+    by_city: List[CityCountsOut]
+
+
+class KycDocumentOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    document_type: str
+    document_number: str
+    status: Optional[str] = None
+    submitted_at: Optional[datetime] = Field(None, validation_alias="created_at")
+
+
+class KycDocumentBriefOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    type: str = Field(validation_alias="document_type")
+    number: str = Field(validation_alias="document_number")
+    status: Optional[str] = None
+
+
+class MyKycOut(BaseModel):
+    user_id: int
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    kyc_status: str
+    documents_submitted: int
+    documents: List[KycDocumentBriefOut]
+
+
+class KycStatusOut(BaseModel):
+    kyc_status: str
+    documents_count: int
+
+
+class DocumentLookupOut(BaseModel):
+    found: bool
+    message: Optional[str] = None
+    document_type: Optional[str] = None
+    document_number: Optional[str] = None
+    status: Optional[str] = None
+    submitted_at: Optional[datetime] = None
+
+
+class KycActionOut(BaseModel):
+    status: str
+    message: str
+    document_type: Optional[str] = None
+    document_number: Optional[str] = None
+
+
+class CompleteKycForm(BaseModel):
+    user_id: int
+    document_type: str
+    document_number: str
+
 
 # ============================================================
 # KYC SUMMARY (FOR DASHBOARD)
 # ============================================================
-@router.get("/summary")
-def get_kyc_summary(db: Session = Depends(get_db)):
-    """Get summary statistics of all KYC submissions"""
-    
-    total_users = db.query(User).count()
-    
-    # Count users with at least 3 documents (COMPLETED)
-    completed_query = text("""
-        SELECT COUNT(DISTINCT user_id) as count
-        FROM kyc
-        GROUP BY user_id
-        HAVING COUNT(*) >= 3
-    """)
-    completed_result = db.execute(completed_query).scalar()
-    completed = completed_result if completed_result else 0
-    
-    # Pending = total - completed
-    pending = total_users - completed
-    
-    return {
-        "total": total_users,
-        "completed": completed,
-        "pending": pending
-    }
+@router.get("/summary", response_model=KycSummaryOut)
+def get_kyc_summary(db: Session = Depends(get_read_db)):
+    """
+    Summary statistics of all KYC submissions, with PENDING/PARTIAL/COMPLETED
+    breakdowns by region, state and city.
+    One GROUP BY over users (materialized kyc_status), cached for KYC_SUMMARY_CACHE_SECONDS.
+    """
+    return summary_cache.get_or_set("summary", lambda: _compute_kyc_summary(db))
+
+
+def _compute_kyc_summary(db: Session) -> KycSummaryOut:
+    rows = db.query(
+        User.region,
+        User.state,
+        User.city,
+        func.coalesce(User.kyc_status, "PENDING"),
+        func.count(User.id)
+    ).group_by(
+        User.region,
+        User.state,
+        User.city,
+        func.coalesce(User.kyc_status, "PENDING")
+    ).all()
+
+    def empty():
+        return {"total": 0, "PENDING": 0, "PARTIAL": 0, "COMPLETED": 0}
+
+    totals = empty()
+    by_region, by_state, by_city = {}, {}, {}
+
+    for region, state, city, status, count in rows:
+        for bucket in (
+            totals,
+            by_region.setdefault(region, empty()),
+            by_state.setdefault((region, state), empty()),
+            by_city.setdefault((region, state, city), empty()),
+        ):
+            bucket["total"] += count
+            bucket[status] = bucket.get(status, 0) + count
+
+    # The model (not a dict) is cached, so cache hits skip validation too
+    return KycSummaryOut(
+        total=totals["total"],
+        completed=totals["COMPLETED"],
+        # Not completed yet (PENDING + PARTIAL), as shown on the dashboard
+        pending=totals["total"] - totals["COMPLETED"],
+        by_status={
+            "PENDING": totals["PENDING"],
+            "PARTIAL": totals["PARTIAL"],
+            "COMPLETED": totals["COMPLETED"]
+        },
+        by_region=[
+            RegionCountsOut(region=region, **counts)
+            for region, counts in by_region.items()
+        ],
+        by_state=[
+            StateCountsOut(region=region, state=state, **counts)
+            for (region, state), counts in by_state.items()
+        ],
+        by_city=[
+            CityCountsOut(region=region, state=state, city=city, **counts)
+            for (region, state, city), counts in by_city.items()
+        ]
+    )
 
 
 # ============================================================
 # GET ALL SUBMITTED DOCUMENTS FOR A USER
 # ============================================================
-@router.get("/documents")
-def get_user_documents(user_id: int, db: Session = Depends(get_db)):
+@router.get("/documents", response_model=List[KycDocumentOut])
+def get_user_documents(session: SessionClaims = Depends(get_session_user), db: Session = Depends(get_db)):
     """Get all submitted KYC documents for a user"""
     
-    # Validate user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Validate user exists (signed tokens already prove it)
+    if not session.verified:
+        if not db.query(User.id).filter(User.id == session.user_id).scalar():
+            raise HTTPException(status_code=404, detail="User not found")
     
     # Get all KYC documents for this user
-    documents = db.query(KYC).filter(KYC.user_id == user_id).all()
+    documents = db.query(KYC).filter(KYC.user_id == session.user_id).all()
     
     # Return empty array if no documents (not error)
     if not documents:
         return []
     
-    return [
-        {
-            "document_type": doc.document_type,
-            "document_number": doc.document_number,
-            "status": doc.status,
-            "submitted_at": doc.created_at.isoformat() if doc.created_at else None
-        }
-        for doc in documents
-    ]
+    return [KycDocumentOut.model_validate(doc) for doc in documents]
 
 
 # ============================================================
 # USER KYC DETAILS (FOR DASHBOARD / PROFILE)
 # ============================================================
-@router.get("/me")
+@router.get("/me", response_model=MyKycOut)
 def get_my_kyc(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(
+        User.id, User.full_name, User.phone, User.kyc_status, User.kyc_doc_count
+    ).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Get all KYC documents
     kyc_documents = db.query(KYC).filter(KYC.user_id == user_id).all()
-    
-    # Determine overall KYC status
-    if not kyc_documents:
-        overall_status = "PENDING"
-    elif len(kyc_documents) >= 3:  # Address, PAN, GST all submitted
-        overall_status = "COMPLETED"
-    else:
-        overall_status = "PARTIAL"
-
-    return {
-        "user_id": user.id,
-        "full_name": user.full_name,
-        "phone": user.phone,
-        "kyc_status": overall_status,
-        "documents_submitted": len(kyc_documents),
-        "documents": [
-            {
-                "type": doc.document_type,
-                "number": doc.document_number,
-                "status": doc.status
-            }
-            for doc in kyc_documents
-        ]
-    }
+
+    return MyKycOut(
+        user_id=user.id,
+        full_name=user.full_name,
+        phone=user.phone,
+        kyc_status=user.kyc_status or "PENDING",
+        documents_submitted=user.kyc_doc_count or 0,
+        documents=[KycDocumentBriefOut.model_validate(doc) for doc in kyc_documents]
+    )
 
 
 # ============================================================
 # KYC STATUS CHECK (BANK / WALLET / GUARDS)
 # ============================================================
-@router.get("/status")
-def get_kyc_status(user_id: int, db: Session = Depends(get_db)):
-    kyc_documents = db.query(KYC).filter(KYC.user_id == user_id).all()
-    
-    if not kyc_documents:
-        status = "PENDING"
-    elif len(kyc_documents) >= 3:
-        status = "COMPLETED"
-    else:
-        status = "PARTIAL"
+@router.get("/status", response_model=KycStatusOut)
+def get_kyc_status(session: SessionClaims = Depends(get_session_user), db: Session = Depends(get_db)):
+    # Single primary-key read of the materialized status
+    row = db.query(User.kyc_status, User.kyc_doc_count).filter(User.id == session.user_id).first()
 
-    return {
-        "kyc_status": status,
-        "documents_count": len(kyc_documents)
-    }
+    return KycStatusOut(
+        kyc_status=(row.kyc_status if row else None) or "PENDING",
+        documents_count=(row.kyc_doc_count if row else None) or 0
+    )
 
 
 # ============================================================
 # DELETE A SPECIFIC DOCUMENT (OPTIONAL)
 # ============================================================
-@router.delete("/document/{document_type}")
+@router.delete("/document/{document_type}", response_model=KycActionOut, response_model_exclude_unset=True)
 def delete_document(
     user_id: int,
     document_type: str,
@@ -144,18 +262,19 @@ def delete_document(
         raise HTTPException(status_code=404, detail="Document not found")
     
     db.delete(doc)
+    adjust_kyc_doc_count(db, user_id, -1)
     db.commit()
     
-    return {
-        "status": "success",
-        "message": f"{document_type} document deleted successfully"
-    }
+    return KycActionOut(
+        status="success",
+        message=f"{document_type} document deleted successfully"
+    )
 
 
 # ============================================================
 # GET SPECIFIC DOCUMENT TYPE
 # ============================================================
-@router.get("/document/{document_type}")
+@router.get("/document/{document_type}", response_model=DocumentLookupOut, response_model_exclude_unset=True)
 def get_specific_document(
     user_id: int,
     document_type: str,
@@ -169,36 +288,37 @@ def get_specific_document(
     ).first()
     
     if not doc:
-        return {
-            "found": False,
-            "message": f"{document_type} not submitted yet"
-        }
+        return DocumentLookupOut(
+            found=False,
+            message=f"{document_type} not submitted yet"
+        )
     
-    return {
-        "found": True,
-        "document_type": doc.document_type,
-        "document_number": doc.document_number,
-        "status": doc.status,
-        "submitted_at": doc.created_at.isoformat() if doc.created_at else None
-    }
+    return DocumentLookupOut(
+        found=True,
+        document_type=doc.document_type,
+        document_number=doc.document_number,
+        status=doc.status,
+        submitted_at=doc.created_at
+    )
 
 
 # ============================================================
 # COMPLETE KYC SUBMISSION (MANUAL ENTRY)
 # ============================================================
-@router.post("/complete")
+@router.post("/complete", response_model=KycActionOut)
 def complete_kyc(
-    user_id: int = Form(...),
-    document_type: str = Form(...),
-    document_number: str = Form(...),
+    data: Annotated[CompleteKycForm, Form()],
     db: Session = Depends(get_db)
 ):
     """Submit a KYC document with manually entered number"""
+    user_id, document_type, document_number = data.user_id, data.document_type, data.document_number
     
     # Validate user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    if not db.query(User.id).filter(User.id == user_id).scalar():
         raise HTTPException(status_code=404, detail="User not found")
+
+    # user_id came in the form body, so the request dependency could not pick the shard
+    use_user_shard(db, user_id)
     
     # Check if document already exists
     existing = db.query(KYC).filter(
@@ -210,14 +330,15 @@ def complete_kyc(
         # Update existing document
         existing.document_number = document_number
         existing.status = "SUBMITTED"
+        publish(db, "kyc.submitted", user_id, document_type=document_type, resubmitted=True)
         db.commit()
         
-        return {
-            "status": "success",
-            "message": f"{document_type} updated successfully",
-            "document_type": document_type,
-            "document_number": document_number
-        }
+        return KycActionOut(
+            status="success",
+            message=f"{document_type} updated successfully",
+            document_type=document_type,
+            document_number=document_number
+        )
     
     # Create new KYC record
     new_kyc = KYC(
@@ -228,37 +349,172 @@ def complete_kyc(
     )
     
     db.add(new_kyc)
+    adjust_kyc_doc_count(db, user_id, 1)
+    publish(db, "kyc.submitted", user_id, document_type=document_type, resubmitted=False)
     db.commit()
     db.refresh(new_kyc)
     
-    return {
-        "status": "success",
-        "message": f"{document_type} submitted successfully",
-        "document_type": document_type,
-        "document_number": document_number
-    }
+    return KycActionOut(
+        status="success",
+        message=f"{document_type} submitted successfully",
+        document_type=document_type,
+        document_number=document_number
+    )
 
 
 # ============================================================
 # ADMIN – ALL USERS KYC LIST
 # ============================================================
-@router.get("/admin/users")
-def admin_kyc_users(db: Session = Depends(get_db)):
-    result = db.execute(text("""
-        SELECT 
-            u.id,
-            u.full_name,
-            u.phone,
-            COUNT(k.id) as documents_submitted,
-            CASE 
-                WHEN COUNT(k.id) = 0 THEN 'PENDING'
-                WHEN COUNT(k.id) >= 3 THEN 'COMPLETED'
-                ELSE 'PARTIAL'
-            END as kyc_status
-        FROM users u
-        LEFT JOIN kyc k ON u.id = k.user_id
-        GROUP BY u.id, u.full_name, u.phone
-        ORDER BY u.id DESC
-    """)).mappings().all()
-
-    return list(result)
\ No newline at end of file
+class AdminUserFilters(BaseModel):
+    status: Optional[str] = None
+    region: Optional[str] = None
+    state: Optional[str] = None
+    distributor: Optional[str] = None
+    created_from: Optional[date] = None
+    created_to: Optional[date] = None
+
+
+class AdminUsersQuery(AdminUserFilters):
+    cursor: Optional[int] = None
+    limit: int = Field(100, ge=1, le=1000)
+
+
+class AdminExportQuery(AdminUserFilters):
+    format: str = Field("csv", pattern="^(csv|ndjson)$")
+
+
+def _admin_users_select(filters: AdminUserFilters):
+    """Shared filtered SELECT for the admin listing and export, newest user first"""
+    query = select(
+        User.id,
+        User.full_name,
+        User.phone,
+        User.ham_code,
+        User.region,
+        User.state,
+        User.city,
+        User.distributor_name,
+        User.kyc_doc_count.label("documents_submitted"),
+        func.coalesce(User.kyc_status, "PENDING").label("kyc_status"),
+        User.created_at
+    )
+
+    if filters.status:
+        status = filters.status.upper()
+        # Same mapping as the selected column (legacy NULL rows are PENDING), written so the
+        # (kyc_status, id) index still serves it
+        if status == "PENDING":
+            query = query.where(or_(User.kyc_status == status, User.kyc_status.is_(None)))
+        else:
+            query = query.where(User.kyc_status == status)
+    if filters.region:
+        query = query.where(User.region == filters.region)
+    if filters.state:
+        query = query.where(User.state == filters.state)
+    if filters.distributor:
+        query = query.where(User.distributor_name == filters.distributor)
+    if filters.created_from:
+        query = query.where(User.created_at >= filters.created_from)
+    if filters.created_to:
+        query = query.where(User.created_at < filters.created_to + timedelta(days=1))
+
+    return query.order_by(User.id.desc())
+
+
+class AdminUserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    ham_code: Optional[str] = None
+    region: Optional[str] = None
+    state: Optional[str] = None
+    city: Optional[str] = None
+    distributor_name: Optional[str] = None
+    documents_submitted: Optional[int] = None
+    kyc_status: str
+    created_at: Optional[datetime] = None
+
+
+class AdminUsersPage(BaseModel):
+    items: List[AdminUserOut]
+    next_cursor: Optional[int] = None
+    limit: int
+
+
+def _serialize_admin_row(row) -> dict:
+    item = dict(row._mapping)
+    item["created_at"] = item["created_at"].isoformat() if item["created_at"] else None
+    return item
+
+
+@router.get("/admin/users", response_model=AdminUsersPage)
+def admin_kyc_users(
+    params: Annotated[AdminUsersQuery, Query()],
+    db: Session = Depends(get_read_db)
+):
+    """
+    Keyset-paginated admin KYC listing.
+    Pass the returned next_cursor back as ?cursor= to get the next page.
+    """
+    query = _admin_users_select(params)
+    if params.cursor:
+        query = query.where(User.id < params.cursor)
+
+    rows = db.execute(query.limit(params.limit + 1)).all()
+    has_more = len(rows) > params.limit
+    rows = rows[:params.limit]
+
+    return AdminUsersPage(
+        items=[AdminUserOut.model_validate(row) for row in rows],
+        next_cursor=rows[-1].id if has_more else None,
+        limit=params.limit
+    )
+
+
+@router.get("/admin/users/export")
+def export_admin_kyc_users(params: Annotated[AdminExportQuery, Query()]):
+    """
+    Stream every matching user as CSV or NDJSON.
+    Rows come from a server-side cursor, so memory stays constant regardless of result size.
+    """
+    query = _admin_users_select(params)
+    format = params.format
+
+    def generate():
+        # Own session: the stream outlives the request dependency scope. Served by a replica when healthy
+        db = SessionLocal()
+        db.info["replica"] = replicas.pick()
+        try:
+            result = db.execute(
+                query,
+                execution_options={"stream_results": True, "yield_per": EXPORT_CHUNK_SIZE}
+            )
+
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(list(result.keys()))
+                for partition in result.partitions():
+                    for row in partition:
+                        item = _serialize_admin_row(row)
+                        writer.writerow(list(item.values()))
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+            else:
+                for partition in result.partitions():
+                    yield "".join(
+                        json.dumps(_serialize_admin_row(row)) + "\n"
+                        for row in partition
+                    )
+        finally:
+            db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=kyc_users.{format}"}
+    )
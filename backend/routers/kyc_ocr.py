@@ -1,13 +1,37 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from openai import OpenAI
-from PIL import Image
-from pdf2image import convert_from_bytes
-import io, base64, os
+from starlette.concurrency import run_in_threadpool
+from settings import settings
+import io, base64
+
+# openai / PIL / pdf2image are imported on first use: they are most of the app's import time
 
 router = APIRouter(prefix="/api/kyc", tags=["KYC OCR"])
 
+_client = None
+
+
+def get_openai_client():
+    """Shared OpenAI client, created on the first OCR request"""
+    global _client
+    if _client is None:
+        if not settings.openai_api_key:
+            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+        from openai import OpenAI
+        _client = OpenAI(api_key=settings.openai_api_key)
+    return _client
+
+
+def _pdf_first_page(pdf_bytes: bytes):
+    from pdf2image import convert_from_bytes
+    return convert_from_bytes(pdf_bytes, first_page=1, last_page=1)[0].convert("RGB")
 
-def image_to_base64_from_pil(image: Image.Image) -> str:
+
+def _open_image(fileobj):
+    from PIL import Image
+    return Image.open(fileobj).convert("RGB")
+
+
+def image_to_base64_from_pil(image) -> str:
     buffer = io.BytesIO()
     image.save(buffer, format="JPEG")
     return base64.b64encode(buffer.getvalue()).decode()
@@ -18,25 +42,21 @@ async def extract_document_number(
     document_type: str = Form(...),
     file: UploadFile = File(...)
 ):
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client()
 
+    # Rasterizing, encoding and the OpenAI call block: run them off the event loop
     if file.content_type == "application/pdf":
         pdf_bytes = await file.read()
-        images = convert_from_bytes(pdf_bytes)
-        image = images[0].convert("RGB")
+        image = await run_in_threadpool(_pdf_first_page, pdf_bytes)
     elif file.content_type in ["image/jpeg", "image/png"]:
-        image = Image.open(file.file).convert("RGB")
+        image = await run_in_threadpool(_open_image, file.file)
     else:
         raise HTTPException(
             status_code=400,
             detail="Unsupported file type. Upload JPG, PNG, or PDF only."
         )
 
-    image_base64 = image_to_base64_from_pil(image)
+    image_base64 = await run_in_threadpool(image_to_base64_from_pil, image)
 
     prompt = f"""
     You are a KYC assistant.
@@ -52,7 +72,8 @@ async def extract_document_number(
     """
 
     try:
-        response = client.responses.create(
+        response = await run_in_threadpool(
+            client.responses.create,
             model="gpt-4.1-mini",
             input=[{
                 "role": "user",
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from database import get_db
+from models import User
+from leaderboard import leaderboards
+
+router = APIRouter(prefix="/api/leaderboard", tags=["Leaderboard"])
+
+METRIC_PATTERN = "^(redeemed|attainment)$"
+DIMENSION_PATTERN = "^(slab|region)$"
+
+
+def _ensure_loaded():
+    if not leaderboards.loaded:
+        raise HTTPException(status_code=503, detail="Leaderboards are loading, try again shortly")
+
+
+# ================= TOP N IN A SLAB / REGION =================
+@router.get("/top")
+def get_leaderboard_top(
+    partition: str,
+    metric: str = Query("redeemed", pattern=METRIC_PATTERN),
+    dimension: str = Query("region", pattern=DIMENSION_PATTERN),
+    n: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Top-N users of one slab or region, served from memory"""
+    _ensure_loaded()
+
+    top = leaderboards.top(metric, dimension, partition, n)
+
+    # Names for just these N users (primary-key lookup)
+    names = dict(db.query(User.id, User.full_name).filter(
+        User.id.in_([user_id for user_id, _ in top])
+    ).all()) if top else {}
+
+    results = []
+    for position, (user_id, score) in enumerate(top):
+        # Ties share the rank of the first user with that score
+        rank = position + 1 if position == 0 or score != top[position - 1][1] else results[-1]["rank"]
+        results.append({
+            "rank": rank,
+            "user_id": user_id,
+            "full_name": names.get(user_id),
+            "score": score
+        })
+
+    return {
+        "metric": metric,
+        "dimension": dimension,
+        "partition": partition,
+        "leaders": results
+    }
+
+
+# ================= MY RANK =================
+@router.get("/rank")
+def get_my_rank(
+    user_id: int,
+    metric: str = Query("redeemed", pattern=METRIC_PATTERN),
+    dimension: str = Query("region", pattern=DIMENSION_PATTERN)
+):
+    """The user's rank inside their own slab or region"""
+    _ensure_loaded()
+
+    result = leaderboards.rank(user_id, metric, dimension)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"User has no {dimension} leaderboard entry")
+
+    return {"user_id": user_id, "metric": metric, "dimension": dimension, **result}
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, UploadFile, File
+from sqlalchemy.orm import Session
+from database import get_db
+from onboarding import import_users
+
+router = APIRouter(prefix="/api/users", tags=["Onboarding"])
+
+
+# ================= BULK USER IMPORT =================
+@router.post("/import")
+def bulk_import_users(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Onboard retailers from a CSV or XLSX file.
+    Columns: phone, full_name and optionally email, be_name, outlet_name, member_type,
+    slab, distributor_name, target, region, state, city, address, pincode.
+    Every created user gets a HAM code and a wallet; rejected rows are reported per row.
+    """
+    return import_users(db, file.file, file.filename or "users.csv")
@@ -1,20 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, undefer
+from database import get_db, get_read_db, SHARDED, fan_out, use_user_shard
 from models import Order, OrderItem, Cart
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Optional
+from datetime import datetime
 import time
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
+TRANSACTION_LABELS = {
+    "BANK_TRANSFER": "Bank Transfer",
+    "CASHOUT": "Points Redemption",
+    "PRODUCT": "Product Redemption"
+}
+
+
+# ============================================================
+# REQUEST / RESPONSE MODELS
+# ============================================================
+class CreateOrderRequest(BaseModel):
+    user_id: int
+    total_points: int
+
+
+class OrderCreatedOut(BaseModel):
+    success: bool
+    order_id: str
+    message: str
+
+
+class OrderItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str = Field(validation_alias="product_name")
+    points: int
+    quantity: Optional[int] = None
+    image: Optional[str] = Field(None, validation_alias="product_image")
+    category: Optional[str] = None
+
+
+class OrderHistoryOut(BaseModel):
+    id: str
+    date: Optional[datetime] = None
+    total_points: int
+    status: Optional[str] = None
+    transaction_type: str
+    transaction_label: str
+    items: List[OrderItemOut]
+
+
+class OrderDetailsOut(BaseModel):
+    order_id: str
+    user_id: int
+    total_points: int
+    status: Optional[str] = None
+    transaction_type: Optional[str] = None
+    created_at: Optional[datetime] = None
+    items: List[OrderItemOut]
+
+
+def _items_by_order(db: Session, order_ids: list) -> dict:
+    """order_id -> [OrderItemOut], one query for all the orders"""
+    grouped = {}
+    if not order_ids:
+        return grouped
+
+    items = db.query(OrderItem).options(undefer(OrderItem.product_image)).filter(
+        OrderItem.order_id.in_(order_ids)
+    ).order_by(OrderItem.id).all()
+    for item in items:
+        grouped.setdefault(item.order_id, []).append(OrderItemOut.model_validate(item))
+    return grouped
+
 
 # ================= CREATE ORDER FROM CART =================
-@router.post("/create")
+@router.post("/create", response_model=OrderCreatedOut)
 def create_order(
-    user_id: int,
-    total_points: int,
+    data: Annotated[CreateOrderRequest, Query()],
     db: Session = Depends(get_db)
 ):
     """Create order from cart items"""
+    user_id = data.user_id
     
     # Generate unique order ID
     order_id = f"ORD{int(time.time() * 1000) % 100000000}"
@@ -29,7 +96,7 @@ def create_order(
     new_order = Order(
         user_id=user_id,
         order_id=order_id,
-        total_points=total_points,
+        total_points=data.total_points,
         status="completed",
         transaction_type="PRODUCT"  # ✅ Mark as product redemption
     )
@@ -53,92 +120,66 @@ def create_order(
     
     db.commit()
     
-    return {
-        "success": True,
-        "order_id": order_id,
-        "message": "Order placed successfully"
-    }
+    return OrderCreatedOut(
+        success=True,
+        order_id=order_id,
+        message="Order placed successfully"
+    )
 
 
 # ================= GET USER ORDER HISTORY =================
-@router.get("/user")
-def get_user_orders(user_id: int, db: Session = Depends(get_db)):
+@router.get("/user", response_model=List[OrderHistoryOut])
+def get_user_orders(user_id: int, db: Session = Depends(get_read_db)):
     """Get order history for a user - sorted by newest first"""
     
     orders = db.query(Order).filter(
         Order.user_id == user_id
     ).order_by(Order.created_at.desc()).all()
-    
+
+    items = _items_by_order(db, [order.order_id for order in orders])
+
     result = []
     for order in orders:
-        # Get items for this order
-        items = db.query(OrderItem).filter(
-            OrderItem.order_id == order.order_id
-        ).all()
-        
-        # ✅ Determine transaction type and label
+        # ✅ BANK_TRANSFER, CASHOUT, or PRODUCT, with a human-readable label
         transaction_type = order.transaction_type or "PRODUCT"
-        
-        if transaction_type == "BANK_TRANSFER":
-            transaction_label = "Bank Transfer"
-        elif transaction_type == "CASHOUT":
-            transaction_label = "Points Redemption"
-        else:
-            transaction_label = "Product Redemption"
-        
-        # ✅ Include transaction_type in response
-        result.append({
-            "id": order.order_id,
-            "date": order.created_at.isoformat() if order.created_at else None,
-            "total_points": order.total_points,
-            "status": order.status,
-            "transaction_type": transaction_type,  # ✅ BANK_TRANSFER, CASHOUT, or PRODUCT
-            "transaction_label": transaction_label,  # ✅ Human-readable label
-            "items": [
-                {
-                    "name": item.product_name,
-                    "points": item.points,
-                    "quantity": item.quantity,
-                    "image": item.product_image,
-                    "category": item.category
-                }
-                for item in items
-            ]
-        })
+
+        result.append(OrderHistoryOut(
+            id=order.order_id,
+            date=order.created_at,
+            total_points=order.total_points,
+            status=order.status,
+            transaction_type=transaction_type,
+            transaction_label=TRANSACTION_LABELS.get(transaction_type, "Product Redemption"),
+            items=items.get(order.order_id, [])
+        ))
     
     return result
 
 
 # ================= GET ORDER DETAILS =================
-@router.get("/{order_id}")
-def get_order_details(order_id: str, db: Session = Depends(get_db)):
+@router.get("/{order_id}", response_model=OrderDetailsOut)
+def get_order_details(order_id: str, db: Session = Depends(get_read_db)):
     """Get details of a specific order"""
+
+    # No user in the request: find the shard that holds this order
+    if SHARDED and "shard" not in db.info:
+        owners = fan_out(lambda shard_db: shard_db.query(Order.user_id).filter(Order.order_id == order_id).scalar())
+        owner = next((user_id for user_id in owners.values() if user_id is not None), None)
+        if owner is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        use_user_shard(db, owner)
     
     order = db.query(Order).filter(Order.order_id == order_id).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Get items
-    items = db.query(OrderItem).filter(
-        OrderItem.order_id == order_id
-    ).all()
-    
-    return {
-        "order_id": order.order_id,
-        "user_id": order.user_id,
-        "total_points": order.total_points,
-        "status": order.status,
-        "transaction_type": order.transaction_type,
-        "created_at": order.created_at.isoformat() if order.created_at else None,
-        "items": [
-            {
-                "name": item.product_name,
-                "points": item.points,
-                "quantity": item.quantity,
-                "image": item.product_image,
-                "category": item.category
-            }
-            for item in items
-        ]
-    }
\ No newline at end of file
+    return OrderDetailsOut(
+        order_id=order.order_id,
+        user_id=order.user_id,
+        total_points=order.total_points,
+        status=order.status,
+        transaction_type=order.transaction_type,
+        created_at=order.created_at,
+        items=_items_by_order(db, [order.order_id]).get(order.order_id, [])
+    )
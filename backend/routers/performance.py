@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from database import get_read_db
+from models import User, PerformanceRollup
+from rollups import serialize_rollup, COUNTERS
+from datetime import date
+from typing import Optional
+
+router = APIRouter(prefix="/api/performance", tags=["Performance"])
+
+
+# ================= RETAILER DASHBOARD =================
+@router.get("/dashboard")
+def get_performance_dashboard(user_id: int, year: Optional[int] = None, db: Session = Depends(get_read_db)):
+    """YTD monthly series + target attainment, served from the monthly rollups"""
+
+    user = db.query(User.id, User.target, User.slab, User.distributor_name, User.region).filter(
+        User.id == user_id
+    ).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    year = year or date.today().year
+
+    months = db.query(PerformanceRollup).filter(
+        PerformanceRollup.scope == "USER",
+        PerformanceRollup.scope_key == str(user_id),
+        PerformanceRollup.period_type == "M",
+        PerformanceRollup.period_start >= date(year, 1, 1),
+        PerformanceRollup.period_start < date(year + 1, 1, 1)
+    ).order_by(PerformanceRollup.period_start).all()
+
+    totals = {name: sum(getattr(row, name) for row in months) for name in COUNTERS}
+
+    attainment = None
+    if user.target:
+        attainment = round(totals["points_earned"] * 100 / user.target, 2)
+
+    return {
+        "user_id": user.id,
+        "year": year,
+        "target": user.target,
+        "slab": user.slab,
+        "distributor_name": user.distributor_name,
+        "region": user.region,
+        "ytd": totals,
+        "target_attainment_pct": attainment,
+        "monthly": [serialize_rollup(row) for row in months]
+    }
+
+
+# ================= DISTRIBUTOR / REGION / USER SERIES =================
+@router.get("/rollups")
+def get_rollups(
+    scope: str = Query(..., pattern="^(USER|DISTRIBUTOR|REGION)$"),
+    key: str = Query(...),
+    period: str = Query("M", pattern="^(D|M)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Daily or monthly time series for one user, distributor or region"""
+
+    query = db.query(PerformanceRollup).filter(
+        PerformanceRollup.scope == scope,
+        PerformanceRollup.scope_key == key,
+        PerformanceRollup.period_type == period
+    )
+    if start:
+        query = query.filter(PerformanceRollup.period_start >= start)
+    if end:
+        query = query.filter(PerformanceRollup.period_start <= end)
+
+    rows = query.order_by(PerformanceRollup.period_start).all()
+
+    return {
+        "scope": scope,
+        "key": key,
+        "period": period,
+        "series": [serialize_rollup(row) for row in rows]
+    }
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from push import hub, stream_frames
+from security import decode_access_token
+
+router = APIRouter(prefix="/api/push", tags=["Push"])
+
+
+# ================= WALLET / ORDER UPDATES (SERVER-SENT EVENTS) =================
+@router.get("/stream")
+async def push_stream(user_id: int, token: str):
+    """
+    Long-lived text/event-stream of this user's "wallet" and "order" deltas.
+    EventSource can't send headers: the session token comes as ?token= and must be the user's.
+    Browsers reconnect on their own (EventSource); pages refetch once after a reconnect.
+    """
+    if decode_access_token(token).user_id != user_id:
+        raise HTTPException(status_code=403, detail="Token does not match user_id")
+
+    queue = hub.connect(user_id)
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Too many open streams, poll instead")
+
+    return StreamingResponse(
+        stream_frames(user_id, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+def push_stats():
+    return {"connections": hub.connections}
@@ -1,15 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from database import get_db
-from models import Wallet, Order, OrderItem, Transaction, Bank
+from database import get_db, get_read_db
+from models import Wallet, Order, OrderItem, Transaction, Bank, WalletLedger
+from ledger import apply_wallet_change, get_ledger_balance, lock_wallet, OPENING_POINTS
+from outbox import publish
+from pydantic import BaseModel, ConfigDict
+from typing import Annotated, List, Optional
 import time
+import zlib
 from datetime import datetime
 
 router = APIRouter(prefix="/api", tags=["Wallet"])
 
 
+# ============================================================
+# REQUEST / RESPONSE MODELS
+# ============================================================
+class PointsRequest(BaseModel):
+    user_id: int
+    points: int
+
+
+class AddMoneyRequest(BaseModel):
+    user_id: int
+    amount: float
+    type: str = "DEMO_CREDIT"
+
+
+class HistoryQuery(BaseModel):
+    user_id: int
+    limit: int = 10
+
+
+class LedgerQuery(HistoryQuery):
+    limit: int = 20
+
+
+class WalletBalanceOut(BaseModel):
+    points: int
+    redeemed: int
+    balance: int
+
+
+class RedeemPointsOut(BaseModel):
+    success: bool
+    message: str
+    order_id: str
+    points: int
+    redeemed: int
+    new_balance: int
+
+
+class TransferDetailsOut(BaseModel):
+    transaction_id: str
+    payment_method: Optional[str] = None
+    payment_to: Optional[str] = None
+    points_deducted: int
+    gross_amount: int
+    tds_percentage: int
+    tds_amount: int
+    net_amount: int
+    remaining_points: int
+
+
+class BankTransferOut(BaseModel):
+    success: bool
+    message: str
+    transaction_details: TransferDetailsOut
+
+
+class AddMoneyOut(BaseModel):
+    success: bool
+    message: str
+    points_added: int
+    new_balance: int
+    total_points: int
+
+
+class LedgerEntryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    seq: int
+    entry_type: str
+    points_delta: int
+    redeemed_delta: int
+    reference: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class WalletLedgerOut(BaseModel):
+    points: int
+    redeemed: int
+    entries: List[LedgerEntryOut]
+
+
+class WalletTransactionOut(BaseModel):
+    transaction_id: str
+    order_id: str
+    product_name: str
+    voucher_code: Optional[str] = None
+    pin: Optional[str] = None
+    amount: int
+    type: str
+    status: str
+    created_at: Optional[datetime] = None
+    date_of_redemption: Optional[str] = None
+
+
 # ================= WALLET BALANCE (PRIMARY ENDPOINT) =================
-@router.get("/wallet/balance")
+@router.get("/wallet/balance", response_model=WalletBalanceOut)
 def wallet_balance(user_id: int, db: Session = Depends(get_db)):
     """Get wallet balance - creates wallet if doesn't exist"""
     
@@ -19,87 +118,81 @@ def wallet_balance(user_id: int, db: Session = Depends(get_db)):
     if not wallet:
         wallet = Wallet(
             user_id=user_id,
-            points=6000,
+            points=0,
             redeemed=0
         )
         db.add(wallet)
+        apply_wallet_change(db, wallet, OPENING_POINTS, 0, "OPENING_BALANCE")
         db.commit()
         db.refresh(wallet)
 
     balance = wallet.points
 
-    return {
-        "points": wallet.points,
-        "redeemed": wallet.redeemed,
-        "balance": balance
-    }
+    return WalletBalanceOut(
+        points=wallet.points,
+        redeemed=wallet.redeemed,
+        balance=balance
+    )
 
 
 # ================= WALLET SUMMARY (ALIAS) =================
-@router.get("/wallet/summary")
+@router.get("/wallet/summary", response_model=WalletBalanceOut)
 def wallet_summary(user_id: int, db: Session = Depends(get_db)):
     """Alias for wallet balance"""
     return wallet_balance(user_id, db)
 
 
 # ================= GET VOUCHER TRANSACTIONS =================
-@router.get("/wallet/transactions")
-def get_wallet_transactions(user_id: int, limit: int = 10, db: Session = Depends(get_db)):
+@router.get("/wallet/transactions", response_model=List[WalletTransactionOut])
+def get_wallet_transactions(query: Annotated[HistoryQuery, Query()], db: Session = Depends(get_read_db)):
     """Get voucher redemption history (eGV wallet transactions)"""
     
     orders = db.query(Order).filter(
-        Order.user_id == user_id
-    ).order_by(Order.created_at.desc()).limit(limit).all()
+        Order.user_id == query.user_id
+    ).order_by(Order.created_at.desc()).limit(query.limit).all()
+
+    # Items of all the orders in one query
+    items_by_order = {}
+    if orders:
+        for item in db.query(OrderItem).filter(
+            OrderItem.order_id.in_([order.order_id for order in orders])
+        ).order_by(OrderItem.id):
+            items_by_order.setdefault(item.order_id, []).append(item)
     
     transactions = []
     
     for order in orders:
-        items = db.query(OrderItem).filter(
-            OrderItem.order_id == order.order_id
-        ).all()
-        
-        for item in items:
+        status = order.status.upper()
+        redeemed_on = order.created_at.strftime("%d %b %Y") if order.created_at else None
+
+        for item in items_by_order.get(order.order_id, []):
             is_voucher = item.category and "voucher" in item.category.lower()
-            
-            if is_voucher:
-                voucher_code = f"VCH{order.order_id[-6:]}"
-                voucher_pin = f"{hash(order.order_id) % 10000:04d}"
-                
-                transactions.append({
-                    "transaction_id": order.order_id,
-                    "order_id": order.order_id,
-                    "product_name": item.product_name,
-                    "voucher_code": voucher_code,
-                    "pin": voucher_pin,
-                    "amount": item.points,
-                    "type": "Voucher Redemption",
-                    "status": order.status.upper(),
-                    "created_at": order.created_at.isoformat() if order.created_at else None,
-                    "date_of_redemption": order.created_at.strftime("%d %b %Y") if order.created_at else None
-                })
-            else:
-                transactions.append({
-                    "transaction_id": order.order_id,
-                    "order_id": order.order_id,
-                    "product_name": item.product_name,
-                    "voucher_code": None,
-                    "pin": None,
-                    "amount": item.points,
-                    "type": "Product Redemption",
-                    "status": order.status.upper(),
-                    "created_at": order.created_at.isoformat() if order.created_at else None,
-                    "date_of_redemption": order.created_at.strftime("%d %b %Y") if order.created_at else None
-                })
+
+            transactions.append(WalletTransactionOut(
+                transaction_id=order.order_id,
+                order_id=order.order_id,
+                product_name=item.product_name,
+                # crc32, not hash(): the PIN must be the same in every worker process
+                voucher_code=f"VCH{order.order_id[-6:]}" if is_voucher else None,
+                pin=f"{zlib.crc32(order.order_id.encode()) % 10000:04d}" if is_voucher else None,
+                amount=item.points,
+                type="Voucher Redemption" if is_voucher else "Product Redemption",
+                status=status,
+                created_at=order.created_at,
+                date_of_redemption=redeemed_on
+            ))
     
     return transactions
 
 
 # ================= REDEEM POINTS (CASHOUT) =================
-@router.post("/wallet/redeem-points")
-def redeem_points(user_id: int, points: int, db: Session = Depends(get_db)):
+@router.post("/wallet/redeem-points", response_model=RedeemPointsOut)
+def redeem_points(data: Annotated[PointsRequest, Query()], db: Session = Depends(get_db)):
     """Redeem points from wallet - creates order entry for transaction history"""
+    user_id, points = data.user_id, data.points
     
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
+    # Locked until commit: the balance check below holds for the debit
+    wallet = lock_wallet(db, user_id)
 
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
@@ -110,12 +203,11 @@ def redeem_points(user_id: int, points: int, db: Session = Depends(get_db)):
     if wallet.points < points:
         raise HTTPException(status_code=400, detail="Insufficient points")
 
-    # Deduct points from wallet
-    wallet.points -= points
-    wallet.redeemed += points
-
     # CREATE ORDER ENTRY FOR CASHOUT TRANSACTION
     order_id = f"CSH{int(time.time() * 1000) % 100000000}"
+
+    # Deduct points from wallet
+    apply_wallet_change(db, wallet, -points, points, "CASHOUT", order_id)
     
     cashout_order = Order(
         user_id=user_id,
@@ -131,21 +223,20 @@ def redeem_points(user_id: int, points: int, db: Session = Depends(get_db)):
 
     new_balance = wallet.points
 
-    return {
-        "success": True,
-        "message": f"Successfully redeemed {points} points",
-        "order_id": order_id,
-        "points": wallet.points,
-        "redeemed": wallet.redeemed,
-        "new_balance": new_balance
-    }
+    return RedeemPointsOut(
+        success=True,
+        message=f"Successfully redeemed {points} points",
+        order_id=order_id,
+        points=wallet.points,
+        redeemed=wallet.redeemed,
+        new_balance=new_balance
+    )
 
 
 # ================= BANK TRANSFER WITH 15% TDS =================
-@router.post("/wallet/bank-transfer")
+@router.post("/wallet/bank-transfer", response_model=BankTransferOut)
 def bank_transfer(
-    user_id: int,
-    points: int,
+    data: Annotated[PointsRequest, Query()],
     db: Session = Depends(get_db)
 ):
     """
@@ -154,9 +245,10 @@ def bank_transfer(
     TDS = 15%
     Net Amount = Gross Amount - (Gross Amount × 15%)
     """
+    user_id, points = data.user_id, data.points
     
-    # Get wallet
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
+    # Get wallet (locked until commit, so the balance check holds for the debit)
+    wallet = lock_wallet(db, user_id)
     
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
@@ -189,13 +281,12 @@ def bank_transfer(
     tds_amount = int((gross_amount * TDS_PERCENTAGE) / 100)
     net_amount = gross_amount - tds_amount
     
-    # Deduct points from wallet
-    wallet.points -= points
-    wallet.redeemed += points
-    
     # Create transaction ID
     transaction_id = f"TXN{int(time.time() * 1000) % 100000000}"
     
+    # Deduct points from wallet
+    apply_wallet_change(db, wallet, -points, points, "BANK_TRANSFER", transaction_id)
+    
     # Get payment identifier for description
     if payment_method == "UPI":
         payment_identifier = getattr(bank, 'upi_id', 'UPI Account')
@@ -232,54 +323,81 @@ def bank_transfer(
         db.add(transaction)
     except Exception as e:
         print(f"Transaction record error: {e}")
+
+    publish(
+        db, "wallet.transferred", user_id,
+        transaction_id=transaction_id, payment_method=payment_method, points=points,
+        gross_amount=gross_amount, tds_amount=tds_amount, net_amount=net_amount,
+        remaining_points=wallet.points
+    )
     
     db.commit()
     db.refresh(wallet)
     
-    return {
-        "success": True,
-        "message": f"Transfer successful",
-        "transaction_details": {
-            "transaction_id": transaction_id,
-            "payment_method": payment_method,
-            "payment_to": payment_identifier,
-            "points_deducted": points,
-            "gross_amount": gross_amount,
-            "tds_percentage": 15,
-            "tds_amount": tds_amount,
-            "net_amount": net_amount,
-            "remaining_points": wallet.points
-        }
-    }
+    return BankTransferOut(
+        success=True,
+        message=f"Transfer successful",
+        transaction_details=TransferDetailsOut(
+            transaction_id=transaction_id,
+            payment_method=payment_method,
+            payment_to=payment_identifier,
+            points_deducted=points,
+            gross_amount=gross_amount,
+            tds_percentage=15,
+            tds_amount=tds_amount,
+            net_amount=net_amount,
+            remaining_points=wallet.points
+        )
+    )
 
 
 # ================= ADD MONEY (DEMO) =================
-@router.post("/wallet/add-money")
-def add_money(user_id: int, amount: float, type: str = "DEMO_CREDIT", db: Session = Depends(get_db)):
+@router.post("/wallet/add-money", response_model=AddMoneyOut)
+def add_money(data: Annotated[AddMoneyRequest, Query()], db: Session = Depends(get_db)):
     """Demo endpoint to add money to wallet"""
+    user_id, amount = data.user_id, data.amount
     
     wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
     
     if not wallet:
         wallet = Wallet(
             user_id=user_id,
-            points=6000,
+            points=0,
             redeemed=0
         )
         db.add(wallet)
+        apply_wallet_change(db, wallet, OPENING_POINTS, 0, "OPENING_BALANCE")
     
     points_to_add = int(amount)
-    wallet.points += points_to_add
+    apply_wallet_change(db, wallet, points_to_add, 0, data.type[:30])
     
     db.commit()
     db.refresh(wallet)
     
     new_balance = wallet.points
     
-    return {
-        "success": True,
-        "message": f"Added ₹{amount} to wallet",
-        "points_added": points_to_add,
-        "new_balance": new_balance,
-        "total_points": wallet.points
-    }
\ No newline at end of file
+    return AddMoneyOut(
+        success=True,
+        message=f"Added ₹{amount} to wallet",
+        points_added=points_to_add,
+        new_balance=new_balance,
+        total_points=wallet.points
+    )
+
+
+# ================= WALLET LEDGER (AUDIT HISTORY) =================
+@router.get("/wallet/ledger", response_model=WalletLedgerOut)
+def get_wallet_ledger(query: Annotated[LedgerQuery, Query()], db: Session = Depends(get_read_db)):
+    """Append-only wallet history with the ledger-derived balance"""
+    
+    entries = db.query(WalletLedger).filter(
+        WalletLedger.user_id == query.user_id
+    ).order_by(WalletLedger.seq.desc()).limit(query.limit).all()
+    
+    points, redeemed = get_ledger_balance(db, query.user_id)
+    
+    return WalletLedgerOut(
+        points=points,
+        redeemed=redeemed,
+        entries=[LedgerEntryOut.model_validate(entry) for entry in entries]
+    )
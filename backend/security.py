@@ -0,0 +1,95 @@
+from fastapi import Depends, HTTPException, Query
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import jwt, JWTError
+from dataclasses import dataclass
+from typing import Optional
+import os
+import secrets
+import time
+
+# =====================================
+# SESSION TOKEN CONFIG (FROM ENVIRONMENT VARIABLES)
+# =====================================
+
+# Must be set (and shared) when running more than one process, otherwise tokens
+# issued by one worker are rejected by the others and all tokens die on restart.
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY") or secrets.token_hex(32)
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+@dataclass
+class SessionClaims:
+    user_id: int
+    ham_code: Optional[str] = None
+    kyc_tier: Optional[str] = None
+    # True when the identity came from a signed token (the user is known to exist)
+    verified: bool = False
+
+
+def create_access_token(user_id: int, ham_code: str, kyc_tier: str) -> str:
+    """Signed, short-lived access token issued after OTP verification"""
+    now = int(time.time())
+    claims = {
+        "sub": str(user_id),
+        "ham": ham_code,
+        "kyc": kyc_tier,
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+    return jwt.encode(claims, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def decode_access_token(token: str) -> SessionClaims:
+    try:
+        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        return SessionClaims(
+            user_id=int(claims["sub"]),
+            ham_code=claims.get("ham"),
+            kyc_tier=claims.get("kyc"),
+            verified=True
+        )
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired session token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+# ============================================================
+# DEPENDENCIES
+# ============================================================
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> SessionClaims:
+    """Requires a valid Bearer token. No DB access."""
+    if not credentials:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return decode_access_token(credentials.credentials)
+
+
+def get_session_user(
+    user_id: Optional[int] = Query(None),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> SessionClaims:
+    """
+    Bearer token when present, otherwise the legacy ?user_id= query parameter.
+    Legacy callers get verified=False, so handlers still check the user exists for them.
+    """
+    if credentials:
+        session = decode_access_token(credentials.credentials)
+        if user_id is not None and user_id != session.user_id:
+            raise HTTPException(status_code=403, detail="Token does not match user_id")
+        return session
+
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    return SessionClaims(user_id=user_id)
@@ -0,0 +1,275 @@
+"""
+JSON serialization / compression benchmark for the large list endpoints.
+
+    python serialization_bench.py [--repeat 20] [--rows 20]
+
+For each payload (typical and worst case) compares
+  before: dicts -> jsonable_encoder -> json.dumps (FastAPI's default JSONResponse)
+  after:  response model -> pydantic serialize -> orjson (ORJSONResponse, as main.py configures)
+and the size / time of gzip and brotli at the CompressionMiddleware levels.
+
+Then the same before / after for every endpoint of the auth, wallet, cart, orders, kyc and bank
+routers, on a sample built from its response model (lists get --rows entries).
+"""
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+from types import SimpleNamespace
+from typing import List, Union, get_args, get_origin
+from datetime import date, datetime, timedelta
+from compression import GZIP_LEVEL, BROTLI_QUALITY
+import argparse
+import base64
+import gzip
+import os
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+from routers.orders import OrderHistoryOut, OrderItemOut, TRANSACTION_LABELS
+from routers.kyc import AdminUsersPage, AdminUserOut
+from routers.bank import PaymentDetailsOut
+
+ENDPOINT_MODULES = ("routers.auth", "routers.wallet", "routers.cart", "routers.orders", "routers.kyc", "routers.bank")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# ============================================================
+# PAYLOADS
+# ============================================================
+def _image(size: int) -> str:
+    return "data:image/png;base64," + base64.b64encode(os.urandom(size * 3 // 4)).decode()
+
+
+def _orders(count: int, items_per_order: int, image_size: int):
+    now = datetime(2026, 1, 1)
+    orders = [
+        SimpleNamespace(
+            order_id=f"ORD{i:08d}", created_at=now - timedelta(hours=i), total_points=250 * (i % 7 + 1),
+            status="completed", transaction_type=("PRODUCT", "CASHOUT", "BANK_TRANSFER")[i % 3]
+        )
+        for i in range(count)
+    ]
+    items = {
+        order.order_id: [
+            SimpleNamespace(
+                product_name=f"Product {i}-{j}", points=100 + j, quantity=1 + j % 3,
+                product_image=_image(image_size) if image_size else None, category="Electronics"
+            )
+            for j in range(items_per_order)
+        ]
+        for i, order in enumerate(orders)
+    }
+    return orders, items
+
+
+def orders_before(orders, items):
+    result = []
+    for order in orders:
+        transaction_type = order.transaction_type or "PRODUCT"
+        result.append({
+            "id": order.order_id,
+            "date": order.created_at.isoformat() if order.created_at else None,
+            "total_points": order.total_points,
+            "status": order.status,
+            "transaction_type": transaction_type,
+            "transaction_label": TRANSACTION_LABELS.get(transaction_type, "Product Redemption"),
+            "items": [
+                {"name": item.product_name, "points": item.points, "quantity": item.quantity,
+                 "image": item.product_image, "category": item.category}
+                for item in items[order.order_id]
+            ]
+        })
+    return result
+
+
+def orders_after(orders, items):
+    return [
+        OrderHistoryOut(
+            id=order.order_id, date=order.created_at, total_points=order.total_points, status=order.status,
+            transaction_type=order.transaction_type,
+            transaction_label=TRANSACTION_LABELS.get(order.transaction_type, "Product Redemption"),
+            items=[OrderItemOut.model_validate(item) for item in items[order.order_id]]
+        )
+        for order in orders
+    ]
+
+
+def _admin_rows(count: int):
+    return [
+        SimpleNamespace(
+            id=count - i, full_name=f"User {i}", phone=f"9{i:09d}", ham_code=f"HAM{i:06d}", region="North",
+            state="Delhi", city="New Delhi", distributor_name="Distributor", documents_submitted=i % 4,
+            kyc_status=("PENDING", "PARTIAL", "COMPLETED")[i % 3], created_at=datetime(2026, 1, 1)
+        )
+        for i in range(count)
+    ]
+
+
+def admin_before(rows):
+    items = []
+    for row in rows:
+        item = dict(vars(row))
+        item["created_at"] = item["created_at"].isoformat()
+        items.append(item)
+    return {"items": items, "next_cursor": rows[-1].id, "limit": len(rows)}
+
+
+def admin_after(rows):
+    return AdminUsersPage(
+        items=[AdminUserOut.model_validate(row) for row in rows], next_cursor=rows[-1].id, limit=len(rows)
+    )
+
+
+def _bank(image_size: int):
+    return SimpleNamespace(
+        user_id=1, payment_method="BANK", is_validated=False, validation_status="PENDING",
+        account_holder_name="Account Holder", bank_name="State Bank of India", account_number="12345678901",
+        ifsc="SBIN0000001", cheque_image=_image(image_size), upi_id="holder@okaxis",
+        upi_qr_code=_image(image_size)
+    )
+
+
+def bank_before(bank):
+    return {key: getattr(bank, key) for key in PaymentDetailsOut.model_fields}
+
+
+def bank_after(bank):
+    return PaymentDetailsOut.model_validate(bank)
+
+
+# ============================================================
+# MEASURE
+# ============================================================
+def _time(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run_case(name, model_type, build_before, build_after, repeat: int):
+    adapter = TypeAdapter(model_type)
+
+    def before():
+        # FastAPI without a response model: jsonable_encoder, then json.dumps
+        return JSONResponse(content=None).render(jsonable_encoder(build_before()))
+
+    def after():
+        # FastAPI with a response model: validate, serialize in json mode, then ORJSONResponse
+        value = adapter.validate_python(build_after())
+        return ORJSONResponse(content=None).render(adapter.dump_python(value, mode="json"))
+
+    body = after()
+    assert len(before()) > 0 and len(body) > 0
+
+    before_ms, after_ms = _time(before, repeat), _time(after, repeat)
+    gzip_ms = _time(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), repeat)
+    gzipped = len(gzip.compress(body, compresslevel=GZIP_LEVEL))
+
+    line = (
+        f"{name:<28} {len(body) / 1024:>9.1f} KB  before {before_ms:>8.2f} ms  after {after_ms:>8.2f} ms "
+        f"({before_ms / after_ms:>4.1f}x)  gzip {gzipped / 1024:>8.1f} KB {gzip_ms:>7.2f} ms"
+    )
+    if brotli is not None:
+        br_ms = _time(lambda: brotli.compress(body, quality=BROTLI_QUALITY), repeat)
+        line += f"  br {len(brotli.compress(body, quality=BROTLI_QUALITY)) / 1024:>8.1f} KB {br_ms:>7.2f} ms"
+    print(line)
+
+
+# ============================================================
+# PER-ENDPOINT
+# ============================================================
+SAMPLE_SCALARS = {
+    str: "sample value", int: 12345, float: 1234.5, bool: True,
+    datetime: datetime(2026, 1, 1, 10, 30), date: date(2026, 1, 1)
+}
+
+
+def _sample(annotation, rows: int):
+    """A value of the annotated type: first member of unions, `rows` entries for lists / dicts"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        return _sample(next(arg for arg in get_args(annotation) if arg is not type(None)), rows)
+    if origin is list:
+        return [_sample(get_args(annotation)[0], rows) for _ in range(rows)]
+    if origin is dict:
+        return {f"key {i}": _sample(get_args(annotation)[1], rows) for i in range(rows)}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation.model_construct(**{
+            name: _sample(field.annotation, rows) for name, field in annotation.model_fields.items()
+        })
+    return SAMPLE_SCALARS.get(annotation)
+
+
+def run_endpoint(route: APIRoute, rows: int, repeat: int):
+    adapter = TypeAdapter(route.response_model)
+    value = _sample(route.response_model, rows)
+    # What the handler used to return: the same data as plain dicts / lists
+    plain = adapter.dump_python(value)
+
+    def before():
+        return JSONResponse(content=None).render(jsonable_encoder(plain))
+
+    def after():
+        validated = adapter.validate_python(value)
+        content = adapter.dump_python(validated, mode="json", exclude_unset=route.response_model_exclude_unset)
+        return ORJSONResponse(content=None).render(content)
+
+    body = after()
+    before_ms, after_ms = _time(before, repeat), _time(after, repeat)
+    name = f"{','.join(sorted(route.methods))} {route.path}"
+    print(
+        f"{name:<44} {len(body) / 1024:>8.1f} KB  before {before_ms * 1000:>8.1f} µs  "
+        f"after {after_ms * 1000:>8.1f} µs ({before_ms / after_ms:>4.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization / compression benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=20, help="List entries in the per-endpoint samples")
+    args = parser.parse_args()
+
+    typical_orders = _orders(20, 2, 0)
+    worst_orders = _orders(200, 3, 40_000)
+    typical_admin = _admin_rows(100)
+    worst_admin = _admin_rows(1000)
+    typical_bank = _bank(40_000)
+    worst_bank = _bank(2_000_000)
+
+    cases = [
+        ("orders typical (20)", List[OrderHistoryOut],
+         lambda: orders_before(*typical_orders), lambda: orders_after(*typical_orders)),
+        ("orders worst (200, images)", List[OrderHistoryOut],
+         lambda: orders_before(*worst_orders), lambda: orders_after(*worst_orders)),
+        ("admin users (100)", AdminUsersPage,
+         lambda: admin_before(typical_admin), lambda: admin_after(typical_admin)),
+        ("admin users (1000)", AdminUsersPage,
+         lambda: admin_before(worst_admin), lambda: admin_after(worst_admin)),
+        ("payment details (40 KB)", PaymentDetailsOut,
+         lambda: bank_before(typical_bank), lambda: bank_after(typical_bank)),
+        ("payment details (2 MB)", PaymentDetailsOut,
+         lambda: bank_before(worst_bank), lambda: bank_after(worst_bank)),
+    ]
+
+    print(f"🏁 {args.repeat} runs each (gzip level {GZIP_LEVEL}, brotli quality {BROTLI_QUALITY})")
+    for name, model_type, build_before, build_after in cases:
+        run_case(name, model_type, build_before, build_after, args.repeat)
+
+    from main import app
+
+    print(f"\n🏁 Per endpoint ({args.rows} rows per list, {args.repeat * 10} runs each)")
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.response_model and route.endpoint.__module__ in ENDPOINT_MODULES:
+            run_endpoint(route, args.rows, args.repeat * 10)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
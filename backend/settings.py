@@ -0,0 +1,42 @@
+"""
+Process-wide settings. .env is read once, here - import this before anything that reads os.getenv.
+Feature modules keep their own tuning knobs (os.getenv constants next to the code using them).
+"""
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+
+class Settings:
+    def __init__(self):
+        # Primary database
+        self.db_user = os.getenv("DB_USER", "root")
+        self.db_password = os.getenv("DB_PASSWORD", "ayanq123")
+        self.db_host = os.getenv("DB_HOST", "localhost")
+        self.db_port = os.getenv("DB_PORT", "3306")
+        self.db_name = os.getenv("DB_NAME", "rspl_demo")
+        # Full SQLAlchemy URL; overrides the DB_* parts (tests point it at SQLite)
+        self.db_url = os.getenv("DATABASE_URL")
+
+        # Pool connections opened at startup so the first requests don't pay for the handshake
+        self.db_warmup_connections = int(os.getenv("DB_WARMUP_CONNECTIONS", "2"))
+
+        # OCR (bank cheques, KYC documents)
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+
+        self.cors_origins = [
+            "https://greaves-cotton.vercel.app",
+            "https://hamdard-udaan.vercel.app",
+            "http://localhost:3000",
+            "http://127.0.0.1:5500"
+        ] + [origin.strip() for origin in os.getenv("CORS_EXTRA_ORIGINS", "").split(",") if origin.strip()]
+
+    @property
+    def database_url(self) -> str:
+        if self.db_url:
+            return self.db_url
+        return f"mysql+pymysql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+
+
+settings = Settings()
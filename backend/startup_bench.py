@@ -0,0 +1,105 @@
+"""
+Cold-start benchmark.
+
+    python startup_bench.py
+
+1. Writes the `python -X importtime -c "import main"` report to STARTUP_IMPORTTIME_REPORT
+   and prints the slowest imports.
+2. Starts `uvicorn main:app` the way the Procfile does and times the first 200 from GET /.
+
+Exits 1 when either time is over its budget, so a regression fails the run.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Budgets (seconds) - raise them deliberately, in the same commit as the change that needs it
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET", "1.5"))
+FIRST_RESPONSE_BUDGET_SECONDS = float(os.getenv("STARTUP_FIRST_RESPONSE_BUDGET", "4.0"))
+
+# Outside the source tree by default so a run leaves nothing to commit
+REPORT_PATH = os.getenv("STARTUP_IMPORTTIME_REPORT", os.path.join(tempfile.gettempdir(), "startup_importtime.txt"))
+TOP_IMPORTS = 15
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_imports() -> float:
+    """Seconds to import main (cumulative importtime of the main module)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=HERE, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit("❌ import main failed")
+
+    lines = [line for line in result.stderr.splitlines() if line.startswith("import time:")]
+    with open(REPORT_PATH, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    rows = []
+    for line in lines[1:]:
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        rows.append((int(cumulative_us), int(self_us), name))
+
+    print(f"📄 importtime report: {REPORT_PATH}")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:TOP_IMPORTS]:
+        print(f"   {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f})  {name}")
+
+    main_us = next((cumulative for cumulative, _, name in rows if name == "main"), 0)
+    return main_us / 1_000_000
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_first_response(timeout: float = 30) -> float:
+    """Seconds from process start to the first successful GET /"""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise SystemExit("❌ uvicorn exited during startup")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise SystemExit(f"❌ No response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    import_seconds = profile_imports()
+    first_response_seconds = time_first_response()
+
+    failed = False
+    for label, value, budget in (
+        ("import main", import_seconds, IMPORT_BUDGET_SECONDS),
+        ("first response", first_response_seconds, FIRST_RESPONSE_BUDGET_SECONDS)
+    ):
+        ok = value <= budget
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {label}: {value:.2f}s (budget {budget:.2f}s)")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Serving the built frontend (build_assets.py output).
+
+Fingerprinted assets are cached for a year as immutable; pages are revalidated on every load
+(ETag / Last-Modified -> 304). Pre-compressed .br / .gz variants are served when accepted.
+"""
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from compression import accepted_encodings
+import json
+import mimetypes
+import os
+
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "dist"))
+STATIC_MOUNT_PATH = os.getenv("STATIC_MOUNT_PATH", "/app")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preference order when the client accepts several
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        with open(manifest_path) as f:
+            self.fingerprinted = {
+                os.path.normpath(os.path.join(self.directory, path))
+                for path in json.load(f).values()
+            }
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = os.path.normpath(full_path)
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+        response = None
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except FileNotFoundError:
+                continue
+            response = FileResponse(
+                full_path + suffix, status_code=status_code, stat_result=variant_stat, media_type=media_type
+            )
+            response.headers["content-encoding"] = encoding
+            break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, media_type=media_type)
+
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE if full_path in self.fingerprinted else REVALIDATE
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def mount_frontend(app):
+    """Serve the built frontend at STATIC_MOUNT_PATH, if it has been built"""
+    if not os.path.isfile(os.path.join(STATIC_DIR, "manifest.json")):
+        print(f"ℹ️ Frontend not built ({STATIC_DIR}); run `python build_assets.py` to serve it at {STATIC_MOUNT_PATH}")
+        return
+
+    app.mount(STATIC_MOUNT_PATH, PrecompressedStaticFiles(directory=STATIC_DIR, html=True), name="frontend")
@@ -0,0 +1,75 @@
+"""
+Test setup: the app on a throwaway SQLite file instead of MySQL.
+
+Environment is set before any app module is imported (settings and the feature modules read it
+at import time); background threads stay off. Run from backend/: python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp(prefix="hamdard-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'primary.db')}"
+os.environ.setdefault("DB_WARMUP_CONNECTIONS", "0")
+os.environ.setdefault("BANK_VALIDATION_WORKERS", "0")
+os.environ.setdefault("BANK_OCR_BACKEND", "stub")
+os.environ.setdefault("BANK_OCR_STUB_DELAY", "0")
+os.environ.setdefault("OUTBOX_DISPATCH_INTERVAL", "0")
+os.environ.setdefault("LEADERBOARD_CHECKPOINT_INTERVAL", "0")
+os.environ.setdefault("WALLET_RECONCILE_INTERVAL", "0")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.ext.compiler import compiles
+import pytest
+
+
+@compiles(LONGTEXT, "sqlite")
+def _longtext_on_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+
+import database
+import models
+
+models.Base.metadata.create_all(database.engine)
+
+
+def sqlite_engine(name: str):
+    """Another SQLite database in the test directory (shard / replica stand-in)"""
+    return create_engine(f"sqlite:///{os.path.join(TMP_DIR, name + '.db')}")
+
+
+def clear_tables(engine):
+    with engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    yield
+    clear_tables(database.engine)
+    database._freeze_state.update(frozen=False, checked_at=float("-inf"))
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    return TestClient(app)
@@ -0,0 +1,87 @@
+from datetime import datetime
+import io
+
+from fastapi import HTTPException
+from sqlalchemy import event
+import pytest
+
+import accrual
+from accrual import ingest_accruals
+from database import RoutingSession
+from ledger import OPENING_POINTS
+from models import AccrualBatch, User, Wallet, WalletLedger
+
+SALES = b"ham_code,points,date\nHAM1,100,2026-03-05\nHAM2,200,2026-03-06\nHAM1,50,2026-03-07\n"
+
+
+@pytest.fixture
+def users(db):
+    db.add_all([User(id=1, phone="9000000001", ham_code="HAM1"), User(id=2, phone="9000000002", ham_code="HAM2")])
+    db.add(Wallet(user_id=2, points=500, redeemed=0))
+    db.commit()
+
+
+def upload(db, content: bytes = SALES):
+    return ingest_accruals(db, io.BytesIO(content), "sales.csv", chunk_size=1)
+
+
+def test_new_wallet_opens_with_opening_points(db, users):
+    report = upload(db)
+
+    assert report["status"] == "COMPLETED" and report["points_credited"] == 350
+    assert db.query(Wallet).filter(Wallet.user_id == 1).one().points == OPENING_POINTS + 150
+    assert db.query(Wallet).filter(Wallet.user_id == 2).one().points == 500 + 200
+    entries = db.query(WalletLedger).filter(WalletLedger.user_id == 1).order_by(WalletLedger.seq).all()
+    assert [(entry.entry_type, entry.points_delta) for entry in entries] == [
+        ("OPENING_BALANCE", OPENING_POINTS), ("ACCRUAL", 100), ("ACCRUAL", 50)
+    ]
+    # Ledger entries carry the sale date, like the rollups
+    assert entries[1].created_at == datetime(2026, 3, 5)
+
+
+def test_failed_batch_resumes_on_reupload(db, users, monkeypatch):
+    apply_chunk = accrual._apply_chunk
+    calls = []
+
+    def fail_on_second_chunk(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return apply_chunk(*args, **kwargs)
+
+    monkeypatch.setattr(accrual, "_apply_chunk", fail_on_second_chunk)
+    first = upload(db)
+    assert first["status"] == "FAILED"
+
+    monkeypatch.setattr(accrual, "_apply_chunk", apply_chunk)
+    second = upload(db)
+
+    assert second["batch_id"] == first["batch_id"] and second["resumed"]
+    assert second["status"] == "COMPLETED" and second["points_credited"] == 350
+    assert db.query(Wallet).filter(Wallet.user_id == 1).one().points == OPENING_POINTS + 150
+    assert db.query(Wallet).filter(Wallet.user_id == 2).one().points == 700
+    assert db.query(WalletLedger).filter(WalletLedger.entry_type == "ACCRUAL").count() == 3
+    assert db.query(AccrualBatch).one().status == "COMPLETED"
+
+    with pytest.raises(HTTPException) as exc:
+        upload(db)
+    assert exc.value.status_code == 409
+
+
+def test_chunk_locks_wallets_before_reading_seqs(db, users):
+    reads = []
+
+    def record(state):
+        if state.is_select:
+            entity = state.statement.column_descriptions[0]["entity"]
+            reads.append((entity.__name__, state.statement._for_update_arg is not None))
+
+    event.listen(RoutingSession, "do_orm_execute", record)
+    try:
+        ingest_accruals(db, io.BytesIO(SALES), "sales.csv", chunk_size=10)
+    finally:
+        event.remove(RoutingSession, "do_orm_execute", record)
+
+    wallet_read = reads.index(("Wallet", True))
+    assert reads.index(("WalletLedger", False)) > wallet_read
+    assert ("Wallet", False) not in reads[:wallet_read]
@@ -0,0 +1,41 @@
+from models import Order, OrderItem, User, Wallet
+
+
+def add_to_cart(client, product_name: str, points: int, quantity: int = 1):
+    response = client.post("/api/cart/add", params={
+        "user_id": 1, "product_name": product_name, "points": points,
+        "category": "Electronics", "product_code": "P-" + product_name.split()[0], "quantity": quantity
+    })
+    assert response.status_code == 200
+
+
+def test_checkout_creates_order_with_brand(client, db):
+    db.add(User(id=1, phone="9000000001"))
+    db.add(Wallet(user_id=1, points=1000, redeemed=0))
+    db.commit()
+    add_to_cart(client, "BOAT Airdopes 141", 300)
+    add_to_cart(client, "JBL Go 3", 200, quantity=2)
+
+    response = client.post("/api/cart/checkout", params={"user_id": 1, "delivery_address": "Delhi", "mobile": "9000000001"})
+
+    assert response.status_code == 200
+    order = db.query(Order).one()
+    assert order.total_points == 700
+    items = {item.product_name: item for item in db.query(OrderItem).filter(OrderItem.order_id == order.order_id)}
+    assert (items["BOAT Airdopes 141"].brand, items["BOAT Airdopes 141"].product_code) == ("BOAT", "P-BOAT")
+    assert db.query(Wallet).one().points == 300
+
+
+def test_product_analytics(client, db):
+    db.add(User(id=1, phone="9000000001"))
+    db.add(Wallet(user_id=1, points=1000, redeemed=0))
+    db.commit()
+    add_to_cart(client, "JBL Go 3", 200, quantity=2)
+    client.post("/api/cart/checkout", params={"user_id": 1, "delivery_address": "Delhi", "mobile": "9000000001"})
+
+    response = client.get("/api/products/analytics", params={"category": "Electronics"})
+
+    assert response.status_code == 200
+    analytics = response.json()["JBL Go 3"]
+    assert (analytics["total_redeemed"], analytics["brand"], analytics["product_code"]) == (2, "JBL", "P-JBL")
+    assert analytics["last_redeemed"] is not None
@@ -0,0 +1,43 @@
+import pytest
+
+from fuzzy_match import FIELD_THRESHOLDS, match_bank_details, name_similarity
+
+THRESHOLD = FIELD_THRESHOLDS["account_holder_name"]
+
+
+@pytest.mark.parametrize("extracted, stored", [
+    ("MR RAJESH KUMAR SHARMA", "Rajesh Kumar Sharma"),
+    ("R K SHARMA", "Rajesh Kumar Sharma"),
+    ("RAJESH SHARMA", "Rajesh Kumar Sharma"),
+    ("SHARMA RAJESH", "Rajesh Kumar Sharma"),
+    ("R SHARMA", "Rajesh Kumar Sharma"),
+    ("SHARMA RAJESH KUMAR", "Rajesh Kumar Sharma"),
+    ("RAMKUMAR YADAV", "Ram Kumar Yadav"),
+    # One OCR slip in a long word
+    ("CHANDRASHEKHAR REDDY", "Chandrashekar Reddy"),
+])
+def test_same_person_matches(extracted, stored):
+    assert name_similarity(extracted, stored) >= THRESHOLD
+
+
+@pytest.mark.parametrize("extracted, stored", [
+    ("RAJESH SHARMA", "Ramesh Sharma"),
+    ("RAJESH KUMAR SHARMA", "Rajesh Kumar Verma"),
+    ("SUNITA DEVI", "Sunita Rani"),
+    ("SHARMA", "Rajesh Sharma"),
+    ("A SHARMA", "Anil Verma"),
+    # An extra surname is a different person, not a missing middle name
+    ("RAVI KUMAR", "Ravi Kumar Sharma"),
+    ("Ravi Kumar Sharma", "RAVI KUMAR"),
+    ("SUNITA DEVI", "Sunita Devi Gupta"),
+    ("KUMAR SHARMA", "Ravi Kumar Sharma"),
+])
+def test_different_person_fails(extracted, stored):
+    assert name_similarity(extracted, stored) < THRESHOLD
+
+
+def test_one_different_name_fails_the_cheque():
+    stored = {"account_holder_name": "Ramesh Sharma", "account_number": "123456789012", "ifsc": "SBIN0001234"}
+    result = match_bank_details({**stored, "account_holder_name": "RAJESH SHARMA"}, stored)
+    assert not result["is_valid"]
+    assert result["reason"] == "Account holder name mismatch"
@@ -0,0 +1,45 @@
+import logging
+import os
+import runpy
+
+import pytest
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+class FakeServer:
+    log = logging.getLogger("gunicorn.test")
+
+
+def load_conf(monkeypatch, **env):
+    for name in ("JWT_SECRET_KEY", "OTP_REDIS_URL", "OTP_SECRET", "PUSH_REDIS_URL"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONF_PATH)
+
+
+def test_several_workers_need_shared_settings(monkeypatch):
+    conf = load_conf(monkeypatch, WEB_CONCURRENCY="4", JWT_SECRET_KEY="k")
+    with pytest.raises(SystemExit):
+        conf["on_starting"](FakeServer())
+
+
+def test_several_workers_with_shared_settings(monkeypatch):
+    conf = load_conf(
+        monkeypatch, WEB_CONCURRENCY="4", JWT_SECRET_KEY="k", OTP_REDIS_URL="redis://localhost:6379/0", OTP_SECRET="s"
+    )
+    conf["on_starting"](FakeServer())
+
+
+def test_single_worker_starts_without_them(monkeypatch):
+    conf = load_conf(monkeypatch, WEB_CONCURRENCY="1")
+    conf["on_starting"](FakeServer())
+
+
+def test_several_workers_without_push_relay_warn(monkeypatch, caplog):
+    conf = load_conf(
+        monkeypatch, WEB_CONCURRENCY="4", JWT_SECRET_KEY="k", OTP_REDIS_URL="redis://localhost:6379/0", OTP_SECRET="s"
+    )
+    conf["on_starting"](FakeServer())
+    assert "PUSH_REDIS_URL" in caplog.text
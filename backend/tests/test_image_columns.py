@@ -0,0 +1,71 @@
+"""Bytes each endpoint fetches from the database while the user has multi-MB base64 images stored"""
+from sqlalchemy import event
+import pytest
+
+from database import RoutingSession
+from models import Bank, User
+from otp_store import otp_store
+
+IMAGE = "data:image/png;base64," + "A" * 1_000_000
+# Everything but the images of one user is far below this
+BUDGET = 10_000
+
+
+@pytest.fixture
+def fetched():
+    """Total size of the values returned by ORM statements while the test runs"""
+    total = {"bytes": 0}
+
+    def count(state):
+        frozen = state.invoke_statement().freeze()
+        for row in frozen().all():
+            total["bytes"] += sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in _values(row))
+        return frozen()
+
+    event.listen(RoutingSession, "do_orm_execute", count)
+    yield total
+    event.remove(RoutingSession, "do_orm_execute", count)
+
+
+def _values(row):
+    for value in row:
+        if hasattr(value, "__table__"):
+            # Loaded entity: only its loaded attributes were fetched
+            yield from (v for k, v in vars(value).items() if not k.startswith("_"))
+        else:
+            yield value
+
+
+@pytest.fixture
+def user(db):
+    user = User(phone="9000000001", full_name="Asha", ham_code="HAM000001", profile_picture=IMAGE)
+    db.add(user)
+    db.flush()
+    db.add(Bank(user_id=user.id, payment_method="BANK", account_holder_name="Asha", cheque_image=IMAGE, upi_qr_code=IMAGE))
+    db.commit()
+    return user.id
+
+
+@pytest.mark.parametrize("method, path", [
+    ("post", "/api/signup?phone=9000000001&full_name=Asha"),
+    ("get", "/api/kyc/me?user_id={user}"),
+    ("get", "/api/kyc/status?user_id={user}"),
+    ("get", "/api/user/profile?user_id={user}&fields=full_name,ham_code"),
+])
+def test_endpoint_skips_images(client, user, fetched, method, path):
+    response = getattr(client, method)(path.format(user=user))
+    assert response.status_code == 200
+    assert 0 < fetched["bytes"] < BUDGET
+
+
+def test_verify_otp_skips_images(client, user, fetched):
+    otp = otp_store.issue("9000000001")
+    response = client.post("/api/verify-otp", params={"phone": "9000000001", "otp": otp})
+    assert response.json()["success"] is True
+    assert 0 < fetched["bytes"] < BUDGET
+
+
+def test_payment_details_still_return_images(client, user, fetched):
+    response = client.get(f"/api/bank?user_id={user}")
+    assert response.json()["cheque_image"] == IMAGE
+    assert fetched["bytes"] > 2 * len(IMAGE)
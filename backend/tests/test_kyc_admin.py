@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from models import User
+
+
+@pytest.fixture
+def users(db):
+    db.add_all([
+        User(id=1, phone="9000000001", kyc_status="PENDING"),
+        User(id=2, phone="9000000002"),
+        User(id=3, phone="9000000003", kyc_status="COMPLETED"),
+    ])
+    db.commit()
+    # Legacy row from before the column had a default
+    db.query(User).filter(User.id == 2).update({"kyc_status": None})
+    db.commit()
+
+
+def test_pending_filter_includes_null_status(client, users):
+    response = client.get("/api/kyc/admin/users", params={"status": "pending"})
+    rows = response.json()["items"]
+    assert [(row["id"], row["kyc_status"]) for row in rows] == [(2, "PENDING"), (1, "PENDING")]
+
+    completed = client.get("/api/kyc/admin/users", params={"status": "COMPLETED"}).json()["items"]
+    assert [row["id"] for row in completed] == [3]
+
+
+def test_export_uses_the_same_filter(client, users):
+    response = client.get("/api/kyc/admin/users/export", params={"status": "PENDING", "format": "ndjson"})
+    rows = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [(row["id"], row["kyc_status"]) for row in rows] == [(2, "PENDING"), (1, "PENDING")]
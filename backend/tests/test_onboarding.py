@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+import onboarding
+from models import Counter, User
+
+
+def test_counter_seeded_from_existing_codes(db):
+    db.add_all([
+        User(phone="9000000001", ham_code="HAM000099"),
+        User(phone="9000000002", ham_code="HAM001200"),
+        User(phone="9000000003", ham_code=None),
+    ])
+    db.commit()
+
+    assert onboarding.allocate_ham_numbers(db) == 1201
+    assert onboarding.allocate_ham_numbers(db, 10) == 1202
+    assert onboarding.allocate_ham_numbers(db) == 1212
+    db.commit()
+    assert db.get(Counter, onboarding.HAM_COUNTER).value == 1212
+
+
+def test_rollback_returns_numbers(db):
+    assert onboarding.allocate_ham_numbers(db) == 1
+    db.commit()
+
+    assert onboarding.allocate_ham_numbers(db, 5) == 2
+    db.rollback()
+    assert onboarding.allocate_ham_numbers(db) == 2
+
+
+def test_unparseable_code_raises(db):
+    db.add(User(phone="9000000001", ham_code="HAM00X100"))
+    db.commit()
+
+    with pytest.raises(ValueError):
+        onboarding.allocate_ham_numbers(db)
+
+
+def test_signup_and_import_share_the_counter(client, db):
+    assert client.post("/api/signup", params={"phone": "9000000001", "full_name": "Asha"}).json() == {
+        "status": "created", "ham_code": "HAM000001"
+    }
+
+    data = "phone,full_name\n9000000002,Ravi\n9000000003,Meena\n"
+    report = onboarding.import_users(db, io.BytesIO(data.encode()), "users.csv")
+    assert report["ham_code_ranges"] == [["HAM000002", "HAM000003"]]
+    assert db.get(Counter, onboarding.HAM_COUNTER).value == 3
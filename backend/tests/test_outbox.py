@@ -0,0 +1,55 @@
+import pytest
+
+import outbox
+from models import OutboxEvent, User, Wallet
+
+
+@pytest.fixture
+def subscribers(monkeypatch):
+    monkeypatch.setattr(outbox, "SUBSCRIBERS", {})
+    monkeypatch.setattr(outbox, "RETRY_SECONDS", 0)
+
+
+def test_checkout_publishes_order_placed(client, db, subscribers):
+    received = []
+    outbox.subscribe("order.placed", name="recorder")(received.append)
+
+    db.add(User(id=1, phone="9000000001"))
+    db.add(Wallet(user_id=1, points=1000, redeemed=0))
+    db.commit()
+    client.post("/api/cart/add", params={"user_id": 1, "product_name": "JBL Go 3", "points": 200, "quantity": 2})
+    response = client.post("/api/cart/checkout", params={"user_id": 1, "delivery_address": "Delhi", "mobile": "9000000001"})
+    assert response.status_code == 200
+
+    assert outbox.dispatch_pending() == 1
+    assert [(event.event_type, event.user_id) for event in received] == [("order.placed", 1)]
+    assert received[0].payload["order_id"] == response.json()["order_id"]
+    assert received[0].payload["total_points"] == 400
+    assert db.query(OutboxEvent).one().dispatched_at is not None
+
+
+def test_failed_subscriber_is_retried_alone(db, subscribers):
+    calls = {"mailer": 0, "crm": 0}
+
+    @outbox.subscribe("kyc.submitted", name="mailer")
+    def mailer(event):
+        calls["mailer"] += 1
+
+    @outbox.subscribe("kyc.submitted", name="crm")
+    def crm(event):
+        calls["crm"] += 1
+        if calls["crm"] == 1:
+            raise RuntimeError("CRM down")
+
+    outbox.publish(db, "kyc.submitted", 1, document_type="PAN")
+    db.commit()
+
+    outbox.dispatch_pending()
+    row = db.query(OutboxEvent).one()
+    assert (row.dispatched_at, row.attempts, row.delivered_to) == (None, 1, ["mailer"])
+
+    outbox.dispatch_pending()
+    db.expire_all()
+    row = db.query(OutboxEvent).one()
+    assert row.dispatched_at is not None
+    assert calls == {"mailer": 1, "crm": 2}
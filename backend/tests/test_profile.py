@@ -0,0 +1,42 @@
+import pytest
+
+from models import User
+
+
+@pytest.fixture
+def user(db):
+    user = User(phone="9000000001", full_name="Asha", version=1)
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def patch(client, user, if_match=None, **body):
+    headers = {"If-Match": if_match} if if_match else {}
+    return client.patch(f"/api/user/profile?user_id={user}", json=body, headers=headers)
+
+
+def test_if_match_current_etag(client, user):
+    etag = client.get(f"/api/user/profile?user_id={user}").headers["ETag"]
+    response = patch(client, user, etag, city="Pune")
+    assert response.status_code == 200
+    assert response.json()["etag"] != etag
+
+    # The old ETag is stale now
+    assert patch(client, user, etag, city="Delhi").status_code == 412
+
+
+def test_if_match_star_is_unconditional(client, user):
+    patch(client, user, city="Pune")
+
+    response = patch(client, user, "*", city="Delhi")
+    assert response.status_code == 200
+    assert response.json()["updated"] == ["city"]
+
+
+def test_if_match_star_needs_the_profile(client):
+    assert patch(client, 999, "*", city="Pune").status_code == 404
+
+
+def test_if_match_garbage_is_rejected(client, user):
+    assert patch(client, user, '"nonsense"', city="Pune").status_code == 412
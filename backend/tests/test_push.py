@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import push
+from ledger import apply_wallet_change
+from models import Order, User, Wallet
+from security import create_access_token
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Every hub.publish() call: {user_id: [(event type, data), ...]}"""
+    calls = []
+
+    def publish(messages):
+        calls.append({user_id: [parse(frame) for frame in frames] for user_id, frames in messages.items()})
+
+    monkeypatch.setattr(push.hub, "publish", publish)
+    return calls
+
+
+def parse(frame: str) -> tuple:
+    lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+@pytest.fixture
+def wallet(db):
+    db.add(User(id=1, phone="9000000001"))
+    db.add(Wallet(user_id=1, points=1000, redeemed=0))
+    db.commit()
+    return db.query(Wallet).filter(Wallet.user_id == 1).one()
+
+
+def test_stream_requires_token(client):
+    assert client.get("/api/push/stream", params={"user_id": 1}).status_code == 422
+    assert client.get("/api/push/stream", params={"user_id": 1, "token": "not-a-token"}).status_code == 401
+
+
+def test_stream_rejects_other_users_token(client):
+    token = create_access_token(2, "HAM2", "BASIC")
+    assert client.get("/api/push/stream", params={"user_id": 1, "token": token}).status_code == 403
+
+
+def test_stream_accepts_own_token(client, monkeypatch):
+    # A full worker answers 503 - reached only once the token was accepted
+    monkeypatch.setattr(push, "MAX_CONNECTIONS", 0)
+    token = create_access_token(1, "HAM1", "BASIC")
+    assert client.get("/api/push/stream", params={"user_id": 1, "token": token}).status_code == 503
+
+
+def test_wallet_change_is_pushed_once_after_commit(db, wallet, published):
+    apply_wallet_change(db, wallet, -200, 200, "CASHOUT", "CSH1")
+    db.flush()
+    assert published == []
+
+    db.commit()
+
+    # The ledger opens with the pre-ledger balance; that entry is not the delta
+    assert published == [{1: [("wallet", {
+        "points": 800, "redeemed": 200, "balance": 800,
+        "delta": -200, "entry_type": "CASHOUT", "reference": "CSH1"
+    })]}]
+
+
+def test_one_publish_per_commit(db, wallet, published):
+    apply_wallet_change(db, wallet, 50, 0, "CREDIT", "A")
+    db.flush()
+    db.add(Order(user_id=1, order_id="ORD1", total_points=50, status="completed", transaction_type="PRODUCT"))
+    db.commit()
+
+    assert len(published) == 1
+    assert [event for event, _ in published[0][1]] == ["wallet", "order"]
+    assert published[0][1][1][1] == {
+        "order_id": "ORD1", "status": "completed", "total_points": 50, "transaction_type": "PRODUCT"
+    }
+
+
+def test_rollback_drops_pushes(db, wallet, published):
+    apply_wallet_change(db, wallet, -200, 200, "CASHOUT", "CSH1")
+    db.flush()
+    db.rollback()
+    assert published == []
+
+    # Nothing left over for the next transaction of the session
+    db.add(User(id=2, phone="9000000002"))
+    db.commit()
+    assert published == []
@@ -0,0 +1,87 @@
+from sqlalchemy import text
+import pytest
+
+import database
+from conftest import sqlite_engine
+from models import User
+
+
+@pytest.fixture
+def stand_ins(monkeypatch):
+    """Two SQLite 'replicas' with a users table; each one's copy of user 1 is named after it"""
+    engines = [sqlite_engine("replica_a"), sqlite_engine("replica_b")]
+    for name, engine in zip(("replica_a", "replica_b"), engines):
+        User.__table__.create(engine, checkfirst=True)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.delete())
+            conn.execute(User.__table__.insert(), {"id": 1, "phone": "9000000001", "full_name": name})
+
+    replica_set = database.ReplicaSet(engines)
+    monkeypatch.setattr(database, "replica_engines", engines)
+    monkeypatch.setattr(database, "replicas", replica_set)
+    monkeypatch.setattr(database, "_recent_writes", database._recent_writes_backend())
+    yield replica_set
+    for engine in engines:
+        engine.dispose()
+
+
+def test_reads_round_robin_over_checked_replicas(stand_ins):
+    assert stand_ins.pick() is None
+
+    stand_ins.refresh()
+    picked = {stand_ins.pick() for _ in range(4)}
+    assert picked == set(stand_ins.engines)
+
+
+def test_requests_never_measure_lag(stand_ins, monkeypatch):
+    stand_ins.refresh()
+    monkeypatch.setattr(database.ReplicaSet, "measure_lag", staticmethod(lambda engine: pytest.fail("measured on request")))
+    monkeypatch.setattr(database, "REPLICA_CHECK_SECONDS", 0)
+
+    # Checks went stale: the primary serves reads until the monitor reports again
+    assert stand_ins.pick() is None
+
+
+def test_unreachable_replica_is_skipped(stand_ins):
+    broken = database.create_engine("sqlite:////nonexistent/dir/replica.db")
+    stand_ins.engines.append(broken)
+    stand_ins.refresh()
+
+    assert broken not in {stand_ins.pick() for _ in range(6)}
+
+
+def test_reads_go_to_replica_until_own_write(stand_ins, db):
+    # Replicated long ago: not a recent write
+    with database.engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": 1, "phone": "9000000001", "full_name": "primary"})
+    stand_ins.refresh()
+
+    def read_name():
+        session = database.SessionLocal()
+        if not database.has_recent_write(1):
+            session.info["replica"] = stand_ins.pick()
+        try:
+            return session.execute(text("SELECT full_name FROM users WHERE id = 1")).scalar()
+        finally:
+            session.close()
+
+    assert read_name() in {"replica_a", "replica_b"}
+
+    user = db.get(User, 1)
+    user.full_name = "primary, renamed"
+    db.commit()
+    assert read_name() == "primary, renamed"
+
+
+def test_monitor_thread_refreshes(stand_ins, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_CHECK_SECONDS", 0.05)
+    thread = database.start_replica_monitor()
+    try:
+        for _ in range(100):
+            if stand_ins.pick() is not None:
+                break
+            thread.join(0.01)
+        assert stand_ins.pick() in stand_ins.engines
+    finally:
+        database.stop_replica_monitor()
+        thread.join(1)
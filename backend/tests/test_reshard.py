@@ -0,0 +1,133 @@
+from fastapi import HTTPException
+from sqlalchemy import func, select
+import pytest
+
+import database
+import reshard
+from models import MaintenanceFlag, User, Wallet
+from conftest import sqlite_engine
+
+USERS = range(1, 31)
+
+
+@pytest.fixture
+def shards(db):
+    """2 old shards, 4 new ones (s0 / s1 are kept); every user has a wallet, ledger entries and an order"""
+    engines = {name: sqlite_engine(name) for name in ("s0", "s1", "s2", "s3")}
+    for engine in engines.values():
+        reshard.create_shard_schema(engine)
+        clear_tables_on_shard(engine)
+
+    old_engines = {name: engines[name] for name in ("s0", "s1")}
+    old_ring = database.ShardRing(old_engines)
+    new_ring = database.ShardRing(engines)
+
+    db.add_all([User(id=user_id, phone=f"90000000{user_id:02d}") for user_id in USERS])
+    db.commit()
+
+    tables = database.Base.metadata.tables
+    for user_id in USERS:
+        with old_engines[old_ring.shard_for(user_id)].begin() as conn:
+            conn.execute(tables["wallet"].insert(), {"user_id": user_id, "points": 6000 + user_id, "redeemed": 0})
+            conn.execute(tables["wallet_ledger"].insert(), [
+                {"user_id": user_id, "seq": seq, "entry_type": "CREDIT", "points_delta": 10, "redeemed_delta": 0}
+                for seq in (1, 2)
+            ])
+            conn.execute(tables["orders"].insert(), {"user_id": user_id, "order_id": f"ORD{user_id}", "total_points": 10})
+            conn.execute(tables["order_items"].insert(), {"order_id": f"ORD{user_id}", "product_name": "Soap", "points": 10})
+
+    yield old_engines, engines, old_ring, new_ring
+
+    for engine in engines.values():
+        clear_tables_on_shard(engine)
+        engine.dispose()
+
+
+def clear_tables_on_shard(engine):
+    with engine.begin() as conn:
+        for table in reversed(reshard.TABLES):
+            conn.execute(table.delete())
+
+
+def wallet_owners(engines) -> dict:
+    """user_id -> shard names holding a wallet for that user"""
+    wallet = database.Base.metadata.tables["wallet"]
+    owners = {}
+    for name, engine in engines.items():
+        with engine.connect() as conn:
+            for row in conn.execute(select(wallet.c.user_id)):
+                owners.setdefault(row.user_id, []).append(name)
+    return owners
+
+
+def count(engine, table_name: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(database.Base.metadata.tables[table_name])).scalar()
+
+
+def assert_on_new_layout(engines, new_ring):
+    owners = wallet_owners(engines)
+    assert sorted(owners) == list(USERS)
+    for user_id, names in owners.items():
+        assert names == [new_ring.shard_for(user_id)]
+    for table_name, per_user in (("wallet_ledger", 2), ("orders", 1), ("order_items", 1)):
+        assert sum(count(engine, table_name) for engine in engines.values()) == per_user * len(USERS)
+
+
+def test_move_then_rerun_keeps_every_user(shards):
+    old_engines, engines, old_ring, new_ring = shards
+
+    users, rows = reshard.move_all(old_engines, engines, new_ring, batch_size=7, old_ring=old_ring)
+    assert users > 0 and rows == users * 5
+    assert_on_new_layout(engines, new_ring)
+
+    # A second run (operator retries, or the first one's output was lost) finds nothing to move
+    assert reshard.move_all(old_engines, engines, new_ring, batch_size=7, old_ring=old_ring) == (0, 0)
+    assert_on_new_layout(engines, new_ring)
+
+
+def test_rerun_after_copy_without_delete(shards):
+    old_engines, engines, old_ring, new_ring = shards
+    moving = [user_id for user_id in USERS if old_ring.shard_for(user_id) != new_ring.shard_for(user_id)]
+    user_id = moving[0]
+    wallet = database.Base.metadata.tables["wallet"]
+
+    # Interrupted earlier run: the target already has part of the copy, the source still has everything
+    with engines[new_ring.shard_for(user_id)].begin() as conn:
+        conn.execute(wallet.insert(), {"user_id": user_id, "points": 1, "redeemed": 0})
+
+    reshard.move_all(old_engines, engines, new_ring, old_ring=old_ring)
+    assert_on_new_layout(engines, new_ring)
+    with engines[new_ring.shard_for(user_id)].connect() as conn:
+        assert conn.execute(select(wallet.c.points).where(wallet.c.user_id == user_id)).scalar() == 6000 + user_id
+
+
+def test_failed_copy_check_leaves_source(shards, monkeypatch):
+    old_engines, engines, old_ring, new_ring = shards
+    monkeypatch.setattr(reshard, "_row_counts", lambda conn, user_ids, order_ids: {})
+
+    with pytest.raises(RuntimeError):
+        reshard.move_all(old_engines, engines, new_ring, old_ring=old_ring)
+
+    owners = wallet_owners(engines)
+    assert sorted(owners) == list(USERS)
+    for user_id, names in owners.items():
+        assert names == [old_ring.shard_for(user_id)]
+
+
+def test_write_freeze_blocks_per_user_writes(db):
+    db.add(User(id=1, phone="9000000001"))
+    db.add(MaintenanceFlag(name=database.SHARD_WRITE_FREEZE, enabled=True))
+    db.commit()
+    database._freeze_state.update(checked_at=float("-inf"))
+
+    db.add(Wallet(user_id=1, points=6000, redeemed=0))
+    with pytest.raises(HTTPException) as exc:
+        db.commit()
+    assert exc.value.status_code == 503
+    db.rollback()
+
+    # Users and reads stay available
+    db.query(User).filter(User.id == 1).update({"full_name": "Asha"})
+    db.commit()
+    assert db.query(Wallet).count() == 0
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+
+from models import PerformanceRollup, User
+from rollups import record_activity
+
+
+def rollup(db, scope: str, scope_key: str, period_type: str = "D") -> PerformanceRollup:
+    return db.query(PerformanceRollup).filter_by(scope=scope, scope_key=scope_key, period_type=period_type).one()
+
+
+def test_upsert_adds_to_existing_rows(db):
+    db.add(User(id=1, phone="9000000001", region="North", distributor_name="Asha Traders"))
+    db.commit()
+
+    record_activity(db, 1, points_earned=100, when=datetime(2026, 3, 5, 10))
+    record_activity(db, 1, points_earned=50, orders_count=1, when=datetime(2026, 3, 5, 11))
+    db.commit()
+
+    row = rollup(db, "REGION", "North")
+    assert (row.period_start, row.points_earned, row.orders_count) == (date(2026, 3, 5), 150, 1)
+    assert rollup(db, "USER", "1", "M").points_earned == 150
+
+
+def test_databases_without_upsert_use_the_portable_path(db, monkeypatch):
+    db.add(User(id=1, phone="9000000001", region="North"))
+    db.commit()
+    monkeypatch.setattr(db.get_bind().dialect, "name", "oracle")
+
+    record_activity(db, 1, points_redeemed=30, when=datetime(2026, 3, 5))
+    record_activity(db, 1, points_redeemed=20, when=datetime(2026, 3, 5))
+    db.commit()
+
+    assert rollup(db, "REGION", "North").points_redeemed == 50
+    assert db.query(PerformanceRollup).count() == 4
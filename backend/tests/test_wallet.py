@@ -0,0 +1,89 @@
+import pytest
+
+from database import SessionLocal, get_db
+from main import app
+from models import Bank, Cart, Order, User, Wallet, WalletLedger
+from ledger import OPENING_POINTS, apply_wallet_change, get_ledger_balance
+
+
+def test_add_money_opens_wallet_for_new_user(client, db):
+    db.add(User(id=1, phone="9000000001"))
+    db.commit()
+
+    response = client.post("/api/wallet/add-money", params={"user_id": 1, "amount": 250})
+
+    assert response.status_code == 200
+    assert response.json()["new_balance"] == OPENING_POINTS + 250
+    entries = db.query(WalletLedger).filter(WalletLedger.user_id == 1).order_by(WalletLedger.seq).all()
+    assert [(entry.seq, entry.entry_type, entry.points_delta) for entry in entries] == [
+        (1, "OPENING_BALANCE", OPENING_POINTS), (2, "DEMO_CREDIT", 250)
+    ]
+
+
+def test_change_uses_committed_counters(db):
+    db.add(User(id=1, phone="9000000001"))
+    db.add(Wallet(user_id=1, points=100, redeemed=0))
+    db.commit()
+    wallet = db.query(Wallet).filter(Wallet.user_id == 1).one()
+
+    # Another request changes the wallet after this one loaded it
+    other = SessionLocal()
+    other.query(Wallet).filter(Wallet.user_id == 1).update({"points": 500})
+    other.commit()
+    other.close()
+
+    apply_wallet_change(db, wallet, 10, 0, "CREDIT")
+    db.commit()
+
+    assert wallet.points == 510
+    assert get_ledger_balance(db, 1) == (510, 0)
+
+
+@pytest.fixture
+def stale_wallet(db):
+    """
+    The request's session already holds user 1's wallet at 1000 points when another
+    request spends most of it; yields a function for that other request.
+    """
+    db.add(User(id=1, phone="9000000001"))
+    db.add(Wallet(user_id=1, points=1000, redeemed=0))
+    db.add(Bank(user_id=1, payment_method="UPI", upi_id="asha@upi"))
+    db.commit()
+    # Referenced below: the session's identity map holds objects weakly
+    loaded = db.query(Wallet).filter(Wallet.user_id == 1).one()
+
+    def spend(points_left: int):
+        assert loaded.points == 1000
+        other = SessionLocal()
+        other.query(Wallet).filter(Wallet.user_id == 1).update({"points": points_left})
+        other.commit()
+        other.close()
+
+    app.dependency_overrides[get_db] = lambda: db
+    yield spend
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.mark.parametrize("path", ["/api/wallet/redeem-points", "/api/wallet/bank-transfer"])
+def test_debit_checks_the_locked_balance(client, db, stale_wallet, path):
+    stale_wallet(100)
+
+    response = client.post(path, params={"user_id": 1, "points": 500})
+
+    assert response.status_code == 400
+    db.rollback()
+    assert db.query(Wallet.points).filter(Wallet.user_id == 1).scalar() == 100
+    assert db.query(WalletLedger).count() == 0
+
+
+def test_checkout_checks_the_locked_balance(client, db, stale_wallet):
+    db.add(Cart(user_id=1, product_name="Soap", points=250, quantity=2))
+    db.commit()
+    stale_wallet(100)
+
+    response = client.post("/api/cart/checkout", params={"user_id": 1, "delivery_address": "Pune", "mobile": "9000000001"})
+
+    assert response.status_code == 400
+    db.rollback()
+    assert db.query(Order).count() == 0
+    assert db.query(Cart).count() == 1
@@ -0,0 +1,113 @@
+"""
+Worker-count sizing benchmark.
+
+    python worker_bench.py [--workers 1,2,4,8] [--path /api/wallet/balance?user_id=1] [--concurrency 32] [--seconds 10]
+
+Starts gunicorn (gunicorn.conf.py) once per worker count, drives the path with concurrent
+keep-alive clients and prints throughput and latency. Pick the smallest count past which
+requests/s stops improving; set it as WEB_CONCURRENCY.
+Errors include keep-alive connections closed by max_requests recycling (GUNICORN_MAX_REQUESTS=0 to exclude).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, server, timeout: float = 30):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise SystemExit("❌ gunicorn exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit(f"❌ gunicorn not ready within {timeout}s")
+
+
+def _client(port: int, path: str, deadline: float) -> list:
+    """One keep-alive connection issuing requests until the deadline; returns (latency, status) pairs"""
+    results = []
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            results.append((time.perf_counter() - started, response.status))
+        except OSError:
+            results.append((time.perf_counter() - started, 0))
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.close()
+    return results
+
+
+def run(workers: int, path: str, concurrency: int, seconds: float) -> dict:
+    port = _free_port()
+    env = {**os.environ, "PORT": str(port), "WEB_CONCURRENCY": str(workers)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{port}", "--access-logfile", "/dev/null"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_ready(port, server)
+        deadline = time.perf_counter() + seconds
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            batches = list(pool.map(lambda _: _client(port, path, deadline), range(concurrency)))
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = [result for batch in batches for result in batch]
+    latencies = sorted(latency for latency, status in results if 200 <= status < 500)
+    errors = len(results) - len(latencies)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "workers": workers,
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(0.50), 1),
+        "p95_ms": round(percentile(0.95), 1),
+        "p99_ms": round(percentile(0.99), 1),
+        "errors": errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker-count sizing benchmark")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--path", default="/", help="Path to request (GET)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"🏁 GET {args.path} with {args.concurrency} clients for {args.seconds:g}s per run ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        r = run(workers, args.path, args.concurrency, args.seconds)
+        print(f"{r['workers']:>8} {r['requests_per_second']:>10} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -173,6 +173,7 @@ document.addEventListener("DOMContentLoaded", () => {
       if (!data.success) return alert("Invalid OTP");
 
       localStorage.setItem("user_id", data.user_id);
+      localStorage.setItem("access_token", data.access_token);
       window.location.href = "home.html";
     });
   }
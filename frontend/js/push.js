@@ -0,0 +1,39 @@
+// =====================================================
+// LIVE WALLET / ORDER UPDATES (SERVER-SENT EVENTS)
+// =====================================================
+// handlers: { wallet(data), order(data), reconnect() } - all optional.
+// Needs the session token from login (localStorage "access_token"). Returns null without it or
+// when the browser has no EventSource; pages then keep their own refreshes.
+function openPushStream(apiBase, userId, handlers) {
+  const token = localStorage.getItem("access_token");
+  if (!window.EventSource || !userId || !token) return null;
+
+  const source = new EventSource(
+    `${apiBase}/push/stream?user_id=${userId}&token=${encodeURIComponent(token)}`
+  );
+  let opened = false;
+
+  // Rejected (e.g. expired token): EventSource gives up; try again later with the current token
+  source.onerror = () => {
+    if (source.readyState !== EventSource.CLOSED) return;
+    setTimeout(() => {
+      if (handlers.reconnect) handlers.reconnect();
+      openPushStream(apiBase, userId, handlers);
+    }, 30000);
+  };
+
+  // Updates sent while the stream was down are not replayed: refetch once
+  source.onopen = () => {
+    if (opened && handlers.reconnect) handlers.reconnect();
+    opened = true;
+  };
+
+  ["wallet", "order"].forEach(type => {
+    source.addEventListener(type, event => {
+      if (handlers[type]) handlers[type](JSON.parse(event.data));
+    });
+  });
+
+  window.addEventListener("pagehide", () => source.close());
+  return source;
+}
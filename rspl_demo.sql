@@ -1,3 +1,7 @@
+-- Legacy hand-maintained schema, kept for reference.
+-- The schema is now managed by Alembic: cd backend && alembic upgrade head
+-- (the baseline revision upgrades a database built from this file in place).
+
 -- ==============================
 -- DATABASE
 -- ==============================
@@ -247,4 +251,111 @@ ADD COLUMN net_amount INT DEFAULT 0 AFTER tds_amount;
 DESCRIBE transactions;
 
 ALTER TABLE bank_details MODIFY COLUMN cheque_image LONGTEXT;
-ALTER TABLE bank_details MODIFY COLUMN upi_qr_code LONGTEXT;
\ No newline at end of file
+ALTER TABLE bank_details MODIFY COLUMN upi_qr_code LONGTEXT;
+-- ==============================
+-- WALLET LEDGER (APPEND-ONLY) + SNAPSHOTS
+-- ==============================
+CREATE TABLE IF NOT EXISTS wallet_ledger (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    seq INT NOT NULL,
+    entry_type VARCHAR(30) NOT NULL,
+    points_delta INT NOT NULL DEFAULT 0,
+    redeemed_delta INT NOT NULL DEFAULT 0,
+    reference VARCHAR(50) NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_user_ledger_seq (user_id, seq),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS wallet_snapshots (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    seq INT NOT NULL,
+    points INT NOT NULL,
+    redeemed INT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_user_snapshot_seq (user_id, seq),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- ==============================
+-- MATERIALIZED KYC STATUS ON USERS
+-- ==============================
+ALTER TABLE users ADD COLUMN kyc_status VARCHAR(20) DEFAULT 'PENDING';
+ALTER TABLE users ADD COLUMN kyc_doc_count INT NOT NULL DEFAULT 0;
+
+-- Backfill (large tables: run `python kyc_status.py` from backend/ instead, it works in chunks)
+UPDATE users u
+LEFT JOIN (SELECT user_id, COUNT(*) AS cnt FROM kyc GROUP BY user_id) k ON k.user_id = u.id
+SET u.kyc_doc_count = COALESCE(k.cnt, 0),
+    u.kyc_status = CASE
+        WHEN COALESCE(k.cnt, 0) = 0 THEN 'PENDING'
+        WHEN k.cnt >= 3 THEN 'COMPLETED'
+        ELSE 'PARTIAL'
+    END;
+
+-- KYC dashboard summary (GROUP BY region, state, city, kyc_status)
+CREATE INDEX idx_users_kyc_location ON users (region, state, city, kyc_status);
+
+-- ==============================
+-- ADMIN KYC LISTING (KEYSET PAGINATION + FILTERS)
+-- ==============================
+CREATE INDEX idx_users_kyc_status_id ON users (kyc_status, id);
+CREATE INDEX idx_users_distributor_id ON users (distributor_name, id);
+CREATE INDEX idx_users_created_at ON users (created_at);
+
+-- ==============================
+-- PERFORMANCE ROLLUPS (USER / DISTRIBUTOR / REGION, DAILY + MONTHLY)
+-- ==============================
+CREATE TABLE IF NOT EXISTS performance_rollups (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    scope VARCHAR(20) NOT NULL,
+    scope_key VARCHAR(100) NOT NULL,
+    period_type CHAR(1) NOT NULL,
+    period_start DATE NOT NULL,
+    points_earned INT NOT NULL DEFAULT 0,
+    points_redeemed INT NOT NULL DEFAULT 0,
+    orders_count INT NOT NULL DEFAULT 0,
+    transfers_count INT NOT NULL DEFAULT 0,
+    UNIQUE KEY unique_rollup_period (scope, scope_key, period_type, period_start)
+);
+
+-- ==============================
+-- LEADERBOARD CHECKPOINT
+-- ==============================
+CREATE TABLE IF NOT EXISTS leaderboard_checkpoints (
+    user_id INT PRIMARY KEY,
+    year INT NOT NULL,
+    slab VARCHAR(50) NULL,
+    region VARCHAR(50) NULL,
+    target INT NULL,
+    redeemed INT NOT NULL DEFAULT 0,
+    earned_ytd INT NOT NULL DEFAULT 0,
+    last_entry_id INT NOT NULL DEFAULT 0,
+    ledger_watermark INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- ==============================
+-- POINTS ACCRUAL BATCHES
+-- ==============================
+CREATE TABLE IF NOT EXISTS accrual_batches (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    checksum VARCHAR(64) NOT NULL UNIQUE,
+    status VARCHAR(20) DEFAULT 'RUNNING',
+    rows_total INT DEFAULT 0,
+    rows_accepted INT DEFAULT 0,
+    rows_rejected INT DEFAULT 0,
+    points_credited INT DEFAULT 0,
+    started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL
+);
+
+-- ==============================
+-- PROFILE ROW VERSION (ETag / If-Match)
+-- ==============================
+ALTER TABLE users
+    ADD COLUMN version INT NOT NULL DEFAULT 1;